@@ -0,0 +1,21 @@
+from django.http import HttpRequest
+from django.views.decorators.http import require_GET
+from django.views.decorators.csrf import csrf_exempt
+
+from api.admin.user_data import check_admin_auth
+from api.prediction_cache import get_prediction_cache
+from api.renderers import JsonResponse
+
+
+@csrf_exempt
+@require_GET
+def get_prediction_cache_stats(request: HttpRequest):
+    """
+    Admin-only endpoint to inspect the allotment_tracker/ result cache.
+
+    Counters are per worker process: hits, misses, evictions and entries.
+    """
+    if not check_admin_auth(request):
+        return JsonResponse({"detail": "Authentication required. Must be admin/staff user."}, status=401)
+
+    return JsonResponse({"status": "ok", "cache": get_prediction_cache().stats()}, status=200)
@@ -1,8 +1,10 @@
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status, permissions
-from api.models import NeetCounsellingSeatAllotment
-import pandas as pd
+from api.models import UploadJob
+from api.upload_jobs import enqueue_upload, job_status
 
 class NeetExcelUploadAPIView(APIView):
     # permission_classes = [permissions.IsAdminUser]  # Only admin users ----- Change this after the admin is created ==Production Test==
@@ -13,31 +15,28 @@ class NeetExcelUploadAPIView(APIView):
         file = request.FILES.get('file')
         if not file:
             return Response({"error": "No file uploaded"}, status=status.HTTP_400_BAD_REQUEST)
+        # "delta" applies the sheet to the published data, writing only the rows that changed
+        mode = request.data.get('mode') or UploadJob.MODE_FULL
+        if mode not in dict(UploadJob.MODE_CHOICES):
+            return Response({"error": "mode must be 'full' or 'delta'"}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            df = pd.read_excel(file)
-        except Exception as e:
-            return Response({"error": f"Error reading Excel: {str(e)}"}, status=status.HTTP_400_BAD_REQUEST)
+        # Store the file and queue it; the process_upload_jobs worker parses it in
+        # chunks (see api/upload_jobs.py) and the job URL reports progress
+        job = enqueue_upload(file, mode)
+        status_url = reverse("upload-job-status", args=[job.pk])
+        return Response({
+            "message": "Upload queued.",
+            "job_id": job.pk,
+            "mode": job.mode,
+            "status_url": request.build_absolute_uri(status_url),
+        }, status=status.HTTP_202_ACCEPTED)
 
-        # Deactivate all existing records
-        NeetCounsellingSeatAllotment.objects.update(is_active=False)
 
-        created_count = 0
-        for _, row in df.iterrows():
-            NeetCounsellingSeatAllotment.objects.create(
-                allotment_category=row.get("ALLOTMENT_CATEGORY", ""),
-                allotment_year=row.get("ALLOTMENT_YEAR", 0),
-                rank_no=row.get("RANK_NO", 0),
-                allotted_quota=row.get("ALLOTTED_QUOTA", ""),
-                allotted_institute=row.get("ALLOTTED_INSTITUTE", ""),
-                state=row.get("STATE", ""),
-                qualifying_group_or_course=row.get("QUALIFYING_GROUP_OR_COURSE", ""),
-                speciality=row.get("SPECIALITY", ""),
-                allotted_category=row.get("ALLOTTED_CATEGORY", ""),
-                candidate_category=row.get("CANDIDATE_CATEGORY", ""),
-                remarks=row.get("REMARKS", ""),
-                is_active=row.get("IS_SHOW_YEAR", False)
-            )
-            created_count += 1
+class UploadJobStatusAPIView(APIView):
+    # Same access as the upload itself
+    permission_classes = NeetExcelUploadAPIView.permission_classes
 
-        return Response({"message": f"{created_count} records uploaded successfully."}, status=status.HTTP_201_CREATED)
+    def get(self, request, job_id):
+        """Progress of an upload: status, rows_done, rows_per_second, error_rows, error and the final stats."""
+        job = get_object_or_404(UploadJob, pk=job_id)
+        return Response(job_status(job))
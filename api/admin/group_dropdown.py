@@ -5,7 +5,32 @@ from rest_framework.response import Response
 from rest_framework import status
 from api.serializers import GroupCategorySerializer
 from api.models import GroupCategory
+from api.group_categories import invalidate_group_categories
 from django.db import IntegrityError, transaction
+from django.db.models.functions import Lower
+
+
+BATCH_SIZE = 1000
+
+
+def category_keys(queryset=None):
+    """Case-insensitive (group_name, category_type) keys of the dropdown rows."""
+    queryset = GroupCategory.objects.all() if queryset is None else queryset
+    return queryset.annotate(group_key=Lower("group_name"), category_key=Lower("category_type"))
+
+
+def rows_by_key(keys):
+    """{key: GroupCategory} for the stored rows with the given lowercased keys."""
+    keys = set(keys)
+    rows = category_keys().filter(
+        group_key__in={group for group, _ in keys}, category_key__in={category for _, category in keys}
+    )
+    return {(row.group_key, row.category_key): row for row in rows if (row.group_key, row.category_key) in keys}
+
+
+def existing_keys():
+    return set(category_keys().values_list("group_key", "category_key"))
+
 
 class GroupDropdownUploadAPIView(APIView):
     """
@@ -39,6 +64,10 @@ class GroupDropdownUploadAPIView(APIView):
         skipped = []
         errors = []
 
+        # Existing case-insensitive keys, fetched once
+        existing = existing_keys()
+
+        pending = {}  # key -> (index, group_name, category_type), in payload order
         for i, item in enumerate(items):
             serializer = GroupCategorySerializer(data=item)
             if not serializer.is_valid():
@@ -49,19 +78,34 @@ class GroupDropdownUploadAPIView(APIView):
             group_name = data["group_name"].strip()
             category_type = data["category_type"].strip()
 
-            # Prevent duplicates: check first
-            exists = GroupCategory.objects.filter(group_name__iexact=group_name,
-                                                  category_type__iexact=category_type).exists()
-            if exists:
+            # Prevent duplicates, against the table and earlier items of this payload
+            key = (group_name.lower(), category_type.lower())
+            if key in existing or key in pending:
                 skipped.append({"group_name": group_name, "category_type": category_type})
                 continue
+            pending[key] = (i, group_name, category_type)
 
+        if pending:
+            rows = [GroupCategory(group_name=g, category_type=c) for _, g, c in pending.values()]
             try:
                 with transaction.atomic():
-                    obj = GroupCategory.objects.create(group_name=group_name, category_type=category_type)
-                    created.append({"id": obj.id, "group_name": obj.group_name, "category_type": obj.category_type})
-            except IntegrityError as e:
-                errors.append({"index": i, "error": str(e)})
+                    GroupCategory.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+            except IntegrityError:
+                # A concurrent upload added some of the keys after they were read
+                created, conflicts, failed = self.insert_each(pending)
+                skipped.extend(conflicts)
+                errors.extend(failed)
+            else:
+                if any(row.pk is None for row in rows):
+                    # No RETURNING on this backend (MySQL). The insert succeeded as a
+                    # whole and the keys are unique, so these rows are this request's.
+                    inserted = rows_by_key(pending)
+                    rows = [inserted[key] for key in pending]
+                created = [{"id": row.id, "group_name": row.group_name, "category_type": row.category_type}
+                           for row in rows]
+
+        if created:
+            invalidate_group_categories()
 
         result = {
             "created_count": len(created),
@@ -71,3 +115,23 @@ class GroupDropdownUploadAPIView(APIView):
             "errors": errors
         }
         return Response(result, status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    def insert_each(self, pending):
+        """
+        Insert the pending items one at a time. Returns the created, skipped
+        and errors report entries; an item whose key another upload stored
+        is skipped.
+        """
+        created, skipped, errors = [], [], []
+        for key, (i, group_name, category_type) in pending.items():
+            try:
+                with transaction.atomic():
+                    row = GroupCategory.objects.create(group_name=group_name, category_type=category_type)
+            except IntegrityError as e:
+                if rows_by_key([key]):
+                    skipped.append({"group_name": group_name, "category_type": category_type})
+                else:
+                    errors.append({"index": i, "error": str(e)})
+            else:
+                created.append({"id": row.id, "group_name": row.group_name, "category_type": row.category_type})
+        return created, skipped, errors
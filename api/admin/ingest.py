@@ -0,0 +1,418 @@
+"""
+Streaming ingestion of counselling allotment sheets.
+
+The sheet is read in fixed-size chunks (openpyxl read-only mode for .xlsx,
+pandas chunked reader for .csv), each chunk is converted column-wise with
+pandas, its repeated text columns are encoded to dimension ids (see
+api.dimensions), and it is written with bulk_create into a new,
+unpublished DatasetVersion.
+IS_SHOW_YEAR marks the year shown for each allotment_category; it is
+recorded once per category in ActiveAllotmentYear rather than per row.
+Readers keep using the published version until loading completes and the
+pointer is swapped (see api.datasets), so a failed upload is never visible.
+
+Every row carries row_hash, a content hash of its business columns.
+ingest_delta() uses it to apply a sheet to the published version in place:
+sheet rows whose hash is already stored are left alone, changed rows are
+updated, new ones inserted and rows missing from the sheet retired
+(deleted), all in one transaction. A sheet replaces only the
+(allotment_category, allotment_year) pairs it contains.
+
+Loads are serialized by an advisory lock (see api.locks), so two uploads
+never interleave their load, summary and publish steps, even when they run
+in different worker processes.
+"""
+import hashlib
+import sys
+import time
+
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from api.chances import rebuild_chances
+from api.datasets import active_years, bump_generation, create_version, publish_version, published_version_id
+from api.dimensions import DIMENSION_FIELDS, decode_values, load_dimensions
+from api.locks import advisory_lock
+from api.models import ActiveAllotmentYear, DatasetVersion, NeetCounsellingSeatAllotment
+from api.prediction import export_snapshot
+from api.summary import rebuild_summary
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+CHUNK_SIZE = 5000   # rows parsed per chunk
+BATCH_SIZE = 1000   # rows per INSERT statement
+
+# Sheet column -> model field
+TEXT_COLUMNS = {
+    "ALLOTMENT_CATEGORY": "allotment_category",
+    "ALLOTTED_QUOTA": "allotted_quota",
+    "ALLOTTED_INSTITUTE": "allotted_institute",
+    "STATE": "state",
+    "QUALIFYING_GROUP_OR_COURSE": "qualifying_group_or_course",
+    "SPECIALITY": "speciality",
+    "ALLOTTED_CATEGORY": "allotted_category",
+    "CANDIDATE_CATEGORY": "candidate_category",
+    "REMARKS": "remarks",
+}
+INT_COLUMNS = {
+    "ALLOTMENT_YEAR": "allotment_year",
+    "RANK_NO": "rank_no",
+}
+# Fields hashed into row_hash, in a fixed order
+HASH_FIELDS = [*TEXT_COLUMNS.values(), *INT_COLUMNS.values()]
+# Fields that identify "the same allotment" when pairing a changed row with its stored version
+KEY_FIELDS = ["allotment_category", "allotment_year", "rank_no"]
+FLAG_COLUMN = "IS_SHOW_YEAR"
+TRUTHY = ("1", "true", "yes", "y")
+
+UPLOAD_LOCK = "seatpredictor.allotment_upload"
+DEFAULT_LOCK_TIMEOUT = 600  # seconds to wait for another upload to finish
+
+
+class SheetError(Exception):
+    """The uploaded file could not be read as an allotment sheet."""
+
+
+def iter_sheet_chunks(file, chunk_size=CHUNK_SIZE, name=None):
+    """Yield the uploaded sheet as DataFrames of at most chunk_size rows; name defaults to file.name."""
+    name = (name or getattr(file, "name", "") or "").lower()
+    if name.endswith(".csv"):
+        return _iter_csv_chunks(file, chunk_size)
+    return _iter_excel_chunks(file, chunk_size)
+
+
+def _iter_csv_chunks(file, chunk_size):
+    try:
+        reader = pd.read_csv(file, chunksize=chunk_size, dtype=str)
+        for chunk in reader:
+            yield chunk
+    except (ValueError, UnicodeDecodeError, pd.errors.ParserError) as e:
+        raise SheetError(str(e)) from e
+
+
+def _iter_excel_chunks(file, chunk_size):
+    try:
+        workbook = load_workbook(file, read_only=True, data_only=True)
+    except Exception as e:
+        raise SheetError(str(e)) from e
+
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = [str(c).strip() if c is not None else "" for c in header]
+        width = len(columns)
+
+        batch = []
+        for row in rows:
+            if all(value is None for value in row):
+                continue  # blank line in the sheet
+            if len(row) < width:
+                row = row + (None,) * (width - len(row))
+            batch.append(row[:width])
+            if len(batch) >= chunk_size:
+                yield pd.DataFrame.from_records(batch, columns=columns)
+                batch = []
+        if batch:
+            yield pd.DataFrame.from_records(batch, columns=columns)
+    finally:
+        workbook.close()
+
+
+def normalize_chunk(df):
+    """
+    Convert a raw sheet chunk into a DataFrame keyed by model field names,
+    plus row_hash, an is_active column from IS_SHOW_YEAR and an is_invalid
+    column for rows whose ALLOTMENT_YEAR or RANK_NO is present but not a
+    number (they are stored as 0).
+    """
+    df = df.rename(columns=lambda c: str(c).strip().upper())
+    out = pd.DataFrame(index=df.index)
+
+    for column, field in TEXT_COLUMNS.items():
+        if column in df:
+            out[field] = df[column].fillna("").astype(str).str.strip()
+        else:
+            out[field] = ""
+
+    out["is_invalid"] = False
+    for column, field in INT_COLUMNS.items():
+        if column in df:
+            values = pd.to_numeric(df[column], errors="coerce")
+            out["is_invalid"] |= values.isna() & df[column].notna()
+            out[field] = values.fillna(0).astype("int64")
+        else:
+            out[field] = 0
+
+    if FLAG_COLUMN in df:
+        flag = df[FLAG_COLUMN]
+        numeric = pd.to_numeric(flag, errors="coerce").fillna(0).ne(0)
+        text = flag.astype(str).str.strip().str.lower().isin(TRUTHY)
+        out["is_active"] = numeric | text
+    else:
+        out["is_active"] = False
+
+    out["row_hash"] = row_hashes(out[HASH_FIELDS].itertuples(index=False, name=None))
+    return out
+
+
+def row_hash(values):
+    """Content hash of one row's HASH_FIELDS values; NULL hashes like an empty string."""
+    text = "\x1f".join("" if value is None else str(value) for value in values)
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def row_hashes(rows):
+    return [row_hash(values) for values in rows]
+
+
+def model_records(df, dimensions):
+    """Model field dicts for the rows of a normalized chunk, with dimension names encoded to ids."""
+    df = df.drop(columns=["is_active", "is_invalid"])
+    for field in DIMENSION_FIELDS:
+        ids = dimensions.encode(field, df[field].unique().tolist())
+        df[f"{field}_id"] = df.pop(field).map(ids)
+    return df.to_dict("records")
+
+
+def fill_row_hashes(version_id, batch_size=BATCH_SIZE):
+    """Hash the rows of a version loaded before row_hash existed. Returns the number of rows hashed."""
+    pending = NeetCounsellingSeatAllotment.objects.filter(dataset_version_id=version_id, row_hash="")
+    hashed = 0
+    while True:
+        rows = decode_values(list(pending.values_list("id", *HASH_FIELDS)[:batch_size]), ("id", *HASH_FIELDS))
+        if not rows:
+            return hashed
+        NeetCounsellingSeatAllotment.objects.bulk_update(
+            [NeetCounsellingSeatAllotment(id=pk, row_hash=row_hash(values)) for pk, *values in rows],
+            ["row_hash"],
+        )
+        hashed += len(rows)
+
+
+def shown_years(df):
+    """{allotment_category: latest flagged allotment_year} of a normalized chunk."""
+    flagged = df[df["is_active"]]
+    return flagged.groupby("allotment_category")["allotment_year"].max().to_dict()
+
+
+def peak_memory_mb():
+    """Peak resident set size of this process in MB, or None if unavailable."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux, bytes on macOS
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / divisor, 1)
+
+
+def ingest_allotments(file, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE, publish=True, progress=None,
+                      source_name=None, started=None):
+    """
+    Load the rows of the uploaded sheet into a new DatasetVersion and, unless
+    publish is False, make it the version readers query. progress(rows,
+    error_rows), if given, is called after every chunk, and started(version_id)
+    once the version exists, so a caller can clean it up should the process
+    die mid-load. source_name (the original file name, default file.name)
+    also selects the CSV or Excel reader.
+
+    Returns a stats dict: dataset_version, rows, error_rows, seconds,
+    rows_per_second, peak_memory_mb. Raises SheetError if the file cannot
+    be parsed; the version is marked failed then and the published data is
+    untouched. Raises api.locks.LockTimeout if another upload holds the
+    lock for longer than settings.UPLOAD_LOCK_TIMEOUT.
+    """
+    timeout = getattr(settings, "UPLOAD_LOCK_TIMEOUT", DEFAULT_LOCK_TIMEOUT)
+    with advisory_lock(UPLOAD_LOCK, timeout):
+        stats = _ingest(
+            file, chunk_size, batch_size, publish, progress, source_name or getattr(file, "name", ""), started
+        )
+    if publish:
+        export_snapshot()
+    return stats
+
+
+def _ingest(file, chunk_size, batch_size, publish, progress, source_name, on_version=None):
+    started = time.perf_counter()
+    version = create_version(source_name)
+    if on_version is not None:
+        on_version(version.pk)
+    dimensions = load_dimensions()
+    rows = error_rows = 0
+    years = {}
+
+    try:
+        for chunk in iter_sheet_chunks(file, chunk_size, source_name):
+            df = normalize_chunk(chunk)
+            for category, year in shown_years(df).items():
+                years[category] = max(years.get(category, year), year)
+            error_rows += int(df["is_invalid"].sum())
+            records = model_records(df, dimensions)
+            with transaction.atomic():
+                NeetCounsellingSeatAllotment.objects.bulk_create(
+                    [
+                        NeetCounsellingSeatAllotment(dataset_version=version, **record)
+                        for record in records
+                    ],
+                    batch_size=batch_size,
+                )
+            rows += len(records)
+            if progress is not None:
+                progress(rows, error_rows)
+        # A category flagged in several years shows the latest one
+        ActiveAllotmentYear.objects.bulk_create([
+            ActiveAllotmentYear(dataset_version=version, allotment_category=category, allotment_year=int(year))
+            for category, year in years.items()
+        ])
+        rebuild_summary(version.pk)
+        rebuild_chances(version.pk)
+    except Exception:
+        DatasetVersion.objects.filter(pk=version.pk).update(status=DatasetVersion.STATUS_FAILED)
+        raise
+
+    DatasetVersion.objects.filter(pk=version.pk).update(
+        status=DatasetVersion.STATUS_READY, row_count=rows
+    )
+    if publish:
+        publish_version(version)
+
+    seconds = time.perf_counter() - started
+    return {
+        "dataset_version": version.pk,
+        "mode": "full",
+        "rows": rows,
+        "error_rows": error_rows,
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds, 1) if seconds else None,
+        "peak_memory_mb": peak_memory_mb(),
+    }
+
+
+def ingest_delta(file, chunk_size=CHUNK_SIZE, batch_size=BATCH_SIZE, progress=None, source_name=None,
+                 started=None):
+    """
+    Apply the uploaded sheet to the published version, writing only the
+    rows that changed. A sheet row whose row_hash matches a stored row of
+    the published version is unchanged; otherwise it updates the stored
+    row with the same KEY_FIELDS that is missing from the sheet, or is
+    inserted. Stored rows of the sheet's (allotment_category,
+    allotment_year) pairs left unmatched are retired. With nothing
+    published yet the sheet is loaded as a full upload, calling started()
+    like ingest_allotments().
+
+    Returns the ingest_allotments() stats plus inserted, updated, retired
+    and unchanged counts. Raises like ingest_allotments(); a failed delta
+    leaves the published data untouched.
+    """
+    timeout = getattr(settings, "UPLOAD_LOCK_TIMEOUT", DEFAULT_LOCK_TIMEOUT)
+    source_name = source_name or getattr(file, "name", "")
+    with advisory_lock(UPLOAD_LOCK, timeout):
+        version_id = published_version_id()
+        if version_id is None:
+            stats = _ingest(file, chunk_size, batch_size, True, progress, source_name, started)
+            stats.update(inserted=stats["rows"], updated=0, retired=0, unchanged=0)
+        else:
+            stats = _ingest_delta(file, version_id, chunk_size, batch_size, progress, source_name)
+    export_snapshot()
+    return stats
+
+
+def _ingest_delta(file, version_id, chunk_size, batch_size, progress, source_name):
+    started = time.perf_counter()
+    dimensions = load_dimensions()
+    fill_row_hashes(version_id, batch_size)
+    stored = NeetCounsellingSeatAllotment.objects.filter(dataset_version_id=version_id)
+
+    rows = error_rows = 0
+    years = {}
+    scope = set()      # (allotment_category, allotment_year) pairs in the sheet
+    matched = set()    # ids of stored rows the sheet repeats unchanged
+    changed = []       # records of sheet rows with no matching stored row
+    for chunk in iter_sheet_chunks(file, chunk_size, source_name):
+        df = normalize_chunk(chunk)
+        for category, year in shown_years(df).items():
+            years[category] = max(years.get(category, year), year)
+        error_rows += int(df["is_invalid"].sum())
+        scope.update(zip(df["allotment_category"], df["allotment_year"].tolist()))
+
+        # Hash lookup on seat_allot_hash_idx; a hash repeated in the sheet matches as many stored rows
+        ids_by_hash = {}
+        for digest, pk in stored.filter(row_hash__in=set(df["row_hash"])).values_list("row_hash", "id"):
+            ids_by_hash.setdefault(digest, []).append(pk)
+        for record in model_records(df, dimensions):
+            pk = next((pk for pk in ids_by_hash.get(record["row_hash"], ()) if pk not in matched), None)
+            if pk is None:
+                changed.append(record)
+            else:
+                matched.add(pk)
+        rows += len(df)
+        if progress is not None:
+            progress(rows, error_rows)
+
+    # Stored rows of the sheet's pairs that it no longer contains, by key
+    gone = {}
+    in_scope = Q()
+    for category, year in scope:
+        in_scope |= Q(allotment_category=category, allotment_year=year)
+    if scope:
+        for pk, *key in stored.filter(in_scope).values_list("id", *KEY_FIELDS).iterator(chunk_size=batch_size):
+            if pk not in matched:
+                gone.setdefault(tuple(key), []).append(pk)
+
+    inserts, updates = [], []
+    now = timezone.now()
+    for record in changed:
+        ids = gone.get(tuple(record[field] for field in KEY_FIELDS))
+        if ids:
+            updates.append(NeetCounsellingSeatAllotment(id=ids.pop(), updated_at=now, **record))
+        else:
+            inserts.append(NeetCounsellingSeatAllotment(dataset_version_id=version_id, **record))
+    retired = [pk for ids in gone.values() for pk in ids]
+    current_years = active_years(version_id)
+    years = {category: int(year) for category, year in years.items() if current_years.get(category) != year}
+
+    with transaction.atomic():
+        NeetCounsellingSeatAllotment.objects.bulk_create(inserts, batch_size=batch_size)
+        NeetCounsellingSeatAllotment.objects.bulk_update(
+            updates, [*HASH_FIELDS, "row_hash", "updated_at"], batch_size=batch_size
+        )
+        for start in range(0, len(retired), batch_size):
+            stored.filter(id__in=retired[start:start + batch_size]).delete()
+        for category, year in years.items():
+            ActiveAllotmentYear.objects.update_or_create(
+                dataset_version_id=version_id, allotment_category=category,
+                defaults={"allotment_year": year},
+            )
+        if inserts or updates or retired:
+            for category in {category for category, _ in scope}:
+                rebuild_summary(version_id, category)
+                rebuild_chances(version_id, category)
+            DatasetVersion.objects.filter(pk=version_id).update(
+                row_count=F("row_count") + len(inserts) - len(retired)
+            )
+        if inserts or updates or retired or years:
+            bump_generation()
+
+    seconds = time.perf_counter() - started
+    return {
+        "dataset_version": version_id,
+        "mode": "delta",
+        "rows": rows,
+        "error_rows": error_rows,
+        "inserted": len(inserts),
+        "updated": len(updates),
+        "retired": len(retired),
+        "unchanged": len(matched),
+        "seconds": round(seconds, 3),
+        "rows_per_second": round(rows / seconds, 1) if seconds else None,
+        "peak_memory_mb": peak_memory_mb(),
+    }
@@ -0,0 +1,23 @@
+from django.http import HttpRequest, HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET
+
+from api.admin.user_data import check_admin_auth
+from api.metrics import get_histogram, metrics_config
+from api.renderers import JsonResponse
+
+
+@csrf_exempt
+@require_GET
+def get_request_metrics(request: HttpRequest):
+    """
+    Admin-only endpoint exposing the request histogram in Prometheus text format.
+
+    Values are per worker process, counted since it started.
+    """
+    if not check_admin_auth(request):
+        return JsonResponse({"detail": "Authentication required. Must be admin/staff user."}, status=401)
+    if not metrics_config()["HISTOGRAM"]:
+        return JsonResponse({"detail": "REQUEST_METRICS['HISTOGRAM'] is disabled."}, status=404)
+
+    return HttpResponse(get_histogram().render(), content_type="text/plain; version=0.0.4; charset=utf-8")
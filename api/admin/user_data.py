@@ -1,13 +1,19 @@
-from django.http import JsonResponse, HttpRequest
+from django.http import HttpRequest, StreamingHttpResponse
 from django.views.decorators.http import require_GET
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth import authenticate
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.core.serializers import serialize
-import json
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils.dateparse import parse_date
+import csv
+import io
 import base64
 
 from api.models import NeetCounsellingSeatAllotmentTracker
+from api.renderers import COLUMNAR_FORMAT, JsonResponse, dumps, json_response, wants_columnar
+from api.tracker_stats import tracker_stats
 
 
 def check_admin_auth(request):
@@ -35,6 +41,124 @@ def check_admin_auth(request):
     return False
 
 
+TRACKER_FIELDS = (
+    'seqno', 'name', 'phone_number', 'email', 'rank_no', 'state', 'allotment_category',
+    'qualifying_group_or_course', 'specialization', 'category', 'created_at', 'updated_at',
+)
+MAX_PAGE_SIZE = 1000
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+
+def prefix_range(field, term):
+    """Q for values of `field` starting with `term`, as a range an index can serve."""
+    upper = term[:-1] + chr(ord(term[-1]) + 1)
+    return Q(**{f"{field}__gte": term, f"{field}__lt": upper})
+
+
+def search_filter(queryset, term, match='contains'):
+    """
+    Filter on name, email or phone_number. 'contains' is a substring match
+    and scans the table; 'prefix' matches only the start of the value, through
+    the tracker_*_idx indexes.
+    """
+    if match == 'contains':
+        return queryset.filter(
+            Q(name__icontains=term) | Q(email__icontains=term) | Q(phone_number__icontains=term)
+        )
+    if match != 'prefix':
+        raise ValueError("match must be 'prefix' or 'contains'")
+    key = term.lower()
+    return queryset.alias(name_key=Lower('name'), email_key=Lower('email')).filter(
+        prefix_range('name_key', key) | prefix_range('email_key', key) | prefix_range('phone_number', term)
+    )
+
+
+def tracker_queryset(params):
+    """Tracker records matching the search/allotment_category/state parameters, ordered by seqno."""
+    search_term = params.get('search', '').strip()
+    allotment_category_filter = params.get('allotment_category', '').strip()
+    state_filter = params.get('state', '').strip()
+
+    queryset = NeetCounsellingSeatAllotmentTracker.objects.all()
+    if search_term:
+        queryset = search_filter(queryset, search_term, params.get('match', 'contains'))
+    if allotment_category_filter:
+        queryset = queryset.filter(allotment_category__icontains=allotment_category_filter)
+    if state_filter:
+        queryset = queryset.filter(state__icontains=state_filter)
+
+    # Order by seqno (primary key) for consistent pagination
+    return queryset.order_by('seqno')
+
+
+def tracker_record(row):
+    record = dict(row)
+    for field in ('created_at', 'updated_at'):
+        record[field] = record[field].isoformat() if record[field] else None
+    return record
+
+
+def listing_values(queryset, columnar):
+    """Row dicts for the JSON listing, or TRACKER_FIELDS tuples for the columnar one."""
+    if columnar:
+        return queryset.values_list(*TRACKER_FIELDS)
+    return queryset.values(*TRACKER_FIELDS)
+
+
+def keyset_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Row dicts of the queryset, read a page of chunk_size at a time by seqno.
+    Unlike .iterator(), this holds one page in memory on MySQL too, where
+    the driver buffers a whole result set client-side.
+    """
+    last = 0
+    while True:
+        page = list(queryset.values(*TRACKER_FIELDS).filter(seqno__gt=last).order_by('seqno')[:chunk_size])
+        yield from page
+        if len(page) < chunk_size:
+            return
+        last = page[-1]['seqno']
+
+
+def export_rows(queryset, export_format):
+    """Encoded CSV or NDJSON lines for a streaming export, read in keyset pages."""
+    rows = keyset_rows(queryset)
+    if export_format == 'ndjson':
+        for row in rows:
+            yield dumps(tracker_record(row)) + b"\n"
+        return
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=TRACKER_FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(tracker_record(row))
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_response(queryset, export_format):
+    content_type = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    response = StreamingHttpResponse(export_rows(queryset, export_format), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="tracker-data.{export_format}"'
+    return response
+
+
+def listing_response(rows, pagination, filters_applied, columnar):
+    body = {"status": "ok"}
+    if columnar:
+        body["columns"] = TRACKER_FIELDS
+        body["data"] = list(rows)
+    else:
+        body["data"] = [tracker_record(row) for row in rows]
+    body.update(pagination=pagination, filters_applied=filters_applied)
+    return json_response(body, columnar=columnar)
+
+
 @csrf_exempt
 @require_GET
 def get_all_tracker_data(request: HttpRequest):
@@ -47,10 +171,16 @@ def get_all_tracker_data(request: HttpRequest):
 
     Query parameters:
     - page: Page number for pagination (optional, default=1)
+    - after: seqno to continue after; switches to keyset pagination (optional)
+    - include_count: with after, also return total_records (optional, default=false)
     - page_size: Number of records per page (optional, default=100, max=1000)
     - search: Search term to filter by name, email, or phone_number (optional)
+    - match: "contains" (default, substring, scans the table) or "prefix" (indexed)
     - allotment_category: Filter by allotment category (optional)
     - state: Filter by state (optional)
+    - format: "csv" or "ndjson" to stream every matching record as a download,
+      or "columnar" for data as arrays in "columns" order (also selected by
+      Accept: application/vnd.seatpredictor.columnar+json)
 
     Response format:
     {
@@ -65,6 +195,9 @@ def get_all_tracker_data(request: HttpRequest):
             "has_previous": false
         }
     }
+
+    With after, pagination is {"page_size", "has_next", "next_after"} (plus
+    "total_records" if include_count), and deep pages cost the same as the first.
     """
     # Check authentication
     if not check_admin_auth(request):
@@ -72,35 +205,41 @@ def get_all_tracker_data(request: HttpRequest):
     
     try:
         # Get query parameters
+        page_size = min(int(request.GET.get('page_size', 100)), MAX_PAGE_SIZE)  # Max 1000 records per page
+        queryset = tracker_queryset(request.GET)
+
+        columnar = wants_columnar(request)
+        export_format = request.GET.get('format', '').strip().lower()
+        if export_format and export_format != COLUMNAR_FORMAT:
+            if export_format not in EXPORT_FORMATS:
+                raise ValueError("format must be 'csv', 'ndjson' or 'columnar'")
+            return export_response(queryset, export_format)
+
+        filters_applied = {
+            "search": request.GET.get('search', '').strip() or None,
+            "allotment_category": request.GET.get('allotment_category', '').strip() or None,
+            "state": request.GET.get('state', '').strip() or None,
+        }
+
+        if 'after' in request.GET:
+            # Keyset pagination on seqno: no COUNT(*) or OFFSET
+            after = int(request.GET.get('after') or 0)
+            rows = list(listing_values(queryset.filter(seqno__gt=after), columnar)[:page_size + 1])
+            has_next = len(rows) > page_size
+            rows = rows[:page_size]
+            pagination = {
+                "page_size": page_size,
+                "has_next": has_next,
+                "next_after": (rows[-1][0] if columnar else rows[-1]['seqno']) if has_next else None,
+            }
+            if request.GET.get('include_count', '').lower() in ('1', 'true', 'yes'):
+                pagination["total_records"] = queryset.count()
+            return listing_response(rows, pagination, filters_applied, columnar)
+
         page = int(request.GET.get('page', 1))
-        page_size = min(int(request.GET.get('page_size', 100)), 1000)  # Max 1000 records per page
-        search_term = request.GET.get('search', '').strip()
-        allotment_category_filter = request.GET.get('allotment_category', '').strip()
-        state_filter = request.GET.get('state', '').strip()
-        
-        # Start with all records
-        queryset = NeetCounsellingSeatAllotmentTracker.objects.all()
-        
-        # Apply filters
-        if search_term:
-            from django.db.models import Q
-            queryset = queryset.filter(
-                Q(name__icontains=search_term) | 
-                Q(email__icontains=search_term) | 
-                Q(phone_number__icontains=search_term)
-            )
-        
-        if allotment_category_filter:
-            queryset = queryset.filter(allotment_category__icontains=allotment_category_filter)
-            
-        if state_filter:
-            queryset = queryset.filter(state__icontains=state_filter)
-        
-        # Order by seqno (primary key) for consistent pagination
-        queryset = queryset.order_by('seqno')
-        
+
         # Apply pagination
-        paginator = Paginator(queryset, page_size)
+        paginator = Paginator(listing_values(queryset, columnar), page_size)
         total_records = paginator.count
         total_pages = paginator.num_pages
         
@@ -113,41 +252,14 @@ def get_all_tracker_data(request: HttpRequest):
             page_obj = paginator.page(paginator.num_pages)
             page = paginator.num_pages
         
-        # Convert queryset to list of dictionaries
-        data = []
-        for record in page_obj:
-            data.append({
-                'seqno': record.seqno,
-                'name': record.name,
-                'phone_number': record.phone_number,
-                'email': record.email,
-                'rank_no': record.rank_no,
-                'state': record.state,
-                'allotment_category': record.allotment_category,
-                'qualifying_group_or_course': record.qualifying_group_or_course,
-                'specialization': record.specialization,
-                'category': record.category,
-                'created_at': record.created_at.isoformat() if record.created_at else None,
-                'updated_at': record.updated_at.isoformat() if record.updated_at else None,
-            })
-        
-        return JsonResponse({
-            "status": "ok",
-            "data": data,
-            "pagination": {
-                "current_page": page,
-                "total_pages": total_pages,
-                "total_records": total_records,
-                "page_size": page_size,
-                "has_next": page_obj.has_next(),
-                "has_previous": page_obj.has_previous(),
-            },
-            "filters_applied": {
-                "search": search_term or None,
-                "allotment_category": allotment_category_filter or None,
-                "state": state_filter or None,
-            }
-        }, status=200)
+        return listing_response(page_obj, {
+            "current_page": page,
+            "total_pages": total_pages,
+            "total_records": total_records,
+            "page_size": page_size,
+            "has_next": page_obj.has_next(),
+            "has_previous": page_obj.has_previous(),
+        }, filters_applied, columnar)
         
     except ValueError as e:
         return JsonResponse({"detail": f"Invalid parameter value: {str(e)}"}, status=400)
@@ -161,51 +273,29 @@ def get_tracker_stats(request: HttpRequest):
     """
     Admin-only endpoint to get statistics about NeetCounsellingSeatAllotmentTracker data.
     
-    Returns counts grouped by various fields.
+    Returns counts grouped by various fields, read from the TrackerDailyStat
+    rollup (see api/tracker_stats.py) rather than the tracker table.
+
+    Query parameters:
+    - from, to: created_at date range, YYYY-MM-DD, inclusive (optional)
+    - bucket: "day", "week" or "month" to add totals per period (optional)
     """
     # Check authentication
     if not check_admin_auth(request):
         return JsonResponse({"detail": "Authentication required. Must be admin/staff user."}, status=401)
     
     try:
-        from django.db.models import Count
-        
-        # Get total count
-        total_records = NeetCounsellingSeatAllotmentTracker.objects.count()
-        
-        # Get counts by allotment_category
-        category_stats = list(
-            NeetCounsellingSeatAllotmentTracker.objects
-            .values('allotment_category')
-            .annotate(count=Count('seqno'))
-            .order_by('-count')
-        )
-        
-        # Get counts by state
-        state_stats = list(
-            NeetCounsellingSeatAllotmentTracker.objects
-            .values('state')
-            .annotate(count=Count('seqno'))
-            .order_by('-count')
-        )
-        
-        # Get counts by category
-        category_type_stats = list(
-            NeetCounsellingSeatAllotmentTracker.objects
-            .values('category')
-            .annotate(count=Count('seqno'))
-            .order_by('-count')
-        )
-        
+        start = parse_date(request.GET['from']) if request.GET.get('from') else None
+        end = parse_date(request.GET['to']) if request.GET.get('to') else None
+        if (request.GET.get('from') and start is None) or (request.GET.get('to') and end is None):
+            raise ValueError("from and to must be dates (YYYY-MM-DD)")
+
         return JsonResponse({
             "status": "ok",
-            "statistics": {
-                "total_records": total_records,
-                "by_allotment_category": category_stats,
-                "by_state": state_stats,
-                "by_category": category_type_stats,
-            }
+            "statistics": tracker_stats(start, end, request.GET.get('bucket') or None),
         }, status=200)
-        
+
+    except ValueError as e:
+        return JsonResponse({"detail": f"Invalid parameter value: {str(e)}"}, status=400)
     except Exception as e:
-        return JsonResponse({"detail": f"Server error: {str(e)}"}, status=500)
\ No newline at end of file
+        return JsonResponse({"detail": f"Server error: {str(e)}"}, status=500)
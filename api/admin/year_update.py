@@ -1,13 +1,14 @@
-from django.http import JsonResponse, HttpRequest
+from django.http import HttpRequest
 from django.views.decorators.http import require_POST
 from django.views.decorators.csrf import csrf_exempt
-from django.db import transaction
 import json
 
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 
-from api.models import NeetCounsellingSeatAllotment
+from api.datasets import published_allotments, published_version_id, set_active_year
+from api.prediction import export_snapshot
+from api.renderers import JsonResponse
 
 @csrf_exempt
 @require_POST
@@ -50,16 +51,19 @@ def set_active_allotment_year(request: HttpRequest):
     except (TypeError, ValueError):
         return JsonResponse({"detail": "allotment_year must be an integer"}, status=400)
 
-    # --- Update DB ---
-    with transaction.atomic():
-        deactivated = NeetCounsellingSeatAllotment.objects.filter(
-            allotment_category=category
-        ).update(is_active=False)
-
-        activated = NeetCounsellingSeatAllotment.objects.filter(
-            allotment_category=category,
-            allotment_year=year,
-        ).update(is_active=True)
+    # --- Update the active year (published dataset only): a single-row write ---
+    version_id = published_version_id()
+    if version_id is not None:
+        try:
+            category = set_active_year(version_id, category, year)
+        except ValueError as e:
+            return JsonResponse({"detail": str(e)}, status=400)
+        export_snapshot()
+
+    # Report the same counts as when rows carried their own flag
+    allotments = published_allotments(version_id).filter(allotment_category=category)
+    deactivated = allotments.count()
+    activated = allotments.filter(allotment_year=year).count()
 
     return JsonResponse({
         "status": "ok",
@@ -0,0 +1,109 @@
+"""
+Async versions of the public read endpoints, for ASGI deployments.
+
+DRF's APIView has no async handlers, so these are plain Django views that
+accept the same payloads and return the same JSON as AllotmentTrackerAPIView
+and GroupCategoryListAPIView. The searches are the sync implementations run
+in a worker thread; the allotment_tracker/ lead capture runs alongside, and
+a failed lead never fails the response.
+
+api/urls.py routes to them when settings.ASYNC_VIEWS is on.
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+
+from .group_categories import group_categories_payload
+from .leads import arecord_lead
+from .renderers import json_response, wants_columnar
+from .views import TRACKER_MODES
+
+
+logger = logging.getLogger(__name__)
+
+
+def request_data(request):
+    """The request body as DRF's request.data would parse it. Raises ValueError for malformed JSON."""
+    if request.content_type != "application/json":
+        return request.POST
+    if not request.body:
+        return {}
+    try:
+        data = json.loads(request.body)
+    except ValueError as e:
+        raise ValueError(f"JSON parse error - {e}")
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    return data
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncAllotmentTrackerView(View):
+    http_method_names = ["post", "options"]
+
+    async def post(self, request):
+        try:
+            data = request_data(request)
+        except ValueError as e:
+            return json_response({"detail": str(e)}, status=400)
+
+        cursor = data.get("cursor") or request.GET.get("cursor")
+        mode = data.get("mode") or request.GET.get("mode") or "allotments"
+        if not isinstance(mode, str) or mode not in TRACKER_MODES:
+            mode = "allotments"
+        fetch_page, columns = TRACKER_MODES[mode]
+        include_count = str(data.get("include_count", True)).lower() not in ("0", "false", "no")
+        columnar = wants_columnar(request)
+        tasks = [sync_to_async(fetch_page)(
+            data,
+            cursor=cursor,
+            page_size=data.get("page_size") or request.GET.get("page_size"),
+            include_count=include_count,
+            columnar=columnar,
+        )]
+
+        # Lead capture (first page only) runs alongside the search
+        name = (data.get("name") or "").strip()
+        if name and not cursor:
+            tasks.append(arecord_lead(data))
+
+        page, *lead = await asyncio.gather(*tasks, return_exceptions=True)
+        if lead and isinstance(lead[0], Exception):
+            logger.error("Recording a tracker lead failed", exc_info=lead[0])
+        if isinstance(page, ValueError):
+            return json_response({"detail": str(page)}, status=400)
+        if isinstance(page, BaseException):
+            raise page
+
+        body = {
+            "mode": mode,
+            "filtered_results_count": page["count"],
+            "filtered_results": page["rows"],
+            "next_cursor": page["next_cursor"],
+            "page_size": page["page_size"],
+        }
+        if columnar:
+            body["columns"] = columns
+        return json_response(body, columnar=columnar)
+
+
+class AsyncGroupCategoryListView(View):
+    http_method_names = ["get", "head", "options"]
+
+    async def get(self, request):
+        """Same response and conditional handling as GroupCategoryListAPIView."""
+        body, etag, last_modified = await sync_to_async(group_categories_payload)()
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified.timestamp())
+        response = not_modified or HttpResponse(body, content_type="application/json")
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+        response["Cache-Control"] = "no-cache"  # always revalidate; a 304 is cheap
+        return response
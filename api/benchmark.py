@@ -0,0 +1,165 @@
+"""
+Helpers for the benchmark management commands.
+
+generate_allotments loads a synthetic multi-year dataset shaped like the
+NEET counselling sheets, benchmark_api times the public endpoints against
+it through the test client and benchmark_http through real WSGI and ASGI
+servers. All are seeded so runs on different commits are comparable.
+"""
+import statistics
+import subprocess
+
+import numpy as np
+import pandas as pd
+from django.db.models import Max, Min
+
+
+CATEGORIES = ("NEET_PG", "NEET_SS", "NEET_MDS")
+QUOTAS = (
+    "All India", "Open Seat Quota", "Deemed/Paid Seats Quota", "Central Institutions",
+    "Delhi University Quota", "IP University Quota", "Armed Forces Medical",
+)
+STATES = (
+    "Andhra Pradesh", "Assam", "Bihar", "Delhi", "Gujarat", "Haryana", "Karnataka", "Kerala",
+    "Madhya Pradesh", "Maharashtra", "Odisha", "Puducherry", "Punjab", "Rajasthan", "Tamil Nadu",
+    "Telangana", "Uttar Pradesh", "West Bengal",
+)
+COURSES = ("MD/MS", "DNB", "DIPLOMA", "DM/MCH", "MDS")
+SPECIALITIES = (
+    "General Medicine", "General Surgery", "Paediatrics", "Radiodiagnosis", "Dermatology",
+    "Orthopaedics", "Obstetrics and Gynaecology", "Anaesthesiology", "Psychiatry", "Ophthalmology",
+    "ENT", "Pathology", "Pharmacology", "Microbiology", "Community Medicine", "Physiology",
+    "Anatomy", "Biochemistry", "Forensic Medicine", "Respiratory Medicine", "Emergency Medicine",
+    "Radiation Oncology", "Cardiology", "Neurology", "Nephrology", "Urology", "Neurosurgery",
+    "Gastroenterology", "Orthodontics", "Prosthodontics",
+)
+ALLOTTED_CATEGORIES = ("GN", "OBC", "SC", "ST", "EWS", "GN PwD", "OBC PwD")
+# Rough share of seats per allotted category
+CATEGORY_WEIGHTS = (0.42, 0.27, 0.15, 0.075, 0.07, 0.01, 0.005)
+INSTITUTES_PER_STATE = 40
+RANKS_PER_YEAR = 250000
+
+SHEET_COLUMNS = (
+    "ALLOTMENT_CATEGORY", "ALLOTMENT_YEAR", "RANK_NO", "ALLOTTED_QUOTA", "ALLOTTED_INSTITUTE",
+    "STATE", "QUALIFYING_GROUP_OR_COURSE", "SPECIALITY", "ALLOTTED_CATEGORY",
+    "CANDIDATE_CATEGORY", "REMARKS", "IS_SHOW_YEAR",
+)
+
+
+def synthetic_chunks(rows, years, seed=0, chunk_size=100000):
+    """
+    Yield DataFrames with SHEET_COLUMNS, rows in total, spread evenly over
+    `years`. The latest year is flagged IS_SHOW_YEAR. Ranks skew towards the
+    top of the merit list, like real allotments.
+    """
+    rng = np.random.default_rng(seed)
+    years = sorted(years)
+    institutes = np.array([
+        f"{kind} Medical College {n}, {state}"
+        for state in STATES
+        for n, kind in enumerate(["Government", "Private", "Deemed", "ESIC"] * (INSTITUTES_PER_STATE // 4))
+    ])
+    institute_state = np.repeat(np.array(STATES), INSTITUTES_PER_STATE)
+
+    produced = 0
+    while produced < rows:
+        n = min(chunk_size, rows - produced)
+        year = np.array(years)[(produced + np.arange(n)) * len(years) // rows]
+        institute = rng.integers(0, len(institutes), n)
+        allotted = rng.choice(len(ALLOTTED_CATEGORIES), n, p=CATEGORY_WEIGHTS)
+        candidate = np.where(rng.random(n) < 0.8, allotted, rng.integers(0, len(ALLOTTED_CATEGORIES), n))
+        rank = np.ceil(RANKS_PER_YEAR * rng.random(n) ** 1.6).astype("int64")
+
+        yield pd.DataFrame({
+            "ALLOTMENT_CATEGORY": np.array(CATEGORIES)[rng.choice(len(CATEGORIES), n, p=(0.8, 0.12, 0.08))],
+            "ALLOTMENT_YEAR": year,
+            "RANK_NO": rank,
+            "ALLOTTED_QUOTA": np.array(QUOTAS)[rng.integers(0, len(QUOTAS), n)],
+            "ALLOTTED_INSTITUTE": institutes[institute],
+            "STATE": institute_state[institute],
+            "QUALIFYING_GROUP_OR_COURSE": np.array(COURSES)[rng.integers(0, len(COURSES), n)],
+            "SPECIALITY": np.array(SPECIALITIES)[rng.integers(0, len(SPECIALITIES), n)],
+            "ALLOTTED_CATEGORY": np.array(ALLOTTED_CATEGORIES)[allotted],
+            "CANDIDATE_CATEGORY": np.array(ALLOTTED_CATEGORIES)[candidate],
+            "REMARKS": np.where(rng.random(n) < 0.05, "Reported", ""),
+            "IS_SHOW_YEAR": (year == years[-1]).astype(int),
+        }, columns=SHEET_COLUMNS)
+        produced += n
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_sheet(path_or_buffer, rows, years, seed=0):
+    """Write a synthetic CSV sheet for the upload endpoint."""
+    for i, chunk in enumerate(synthetic_chunks(rows, years, seed)):
+        chunk.to_csv(path_or_buffer, header=i == 0, index=False)
+
+
+def sample_rows(rng, queryset, count, pk="id"):
+    """Up to `count` rows picked by seeded random primary key, so reruns use the same sample."""
+    bounds = queryset.aggregate(low=Min(pk), high=Max(pk))
+    if bounds["low"] is None:
+        return []
+    rows = []
+    for _ in range(count):
+        start = rng.randint(bounds["low"], bounds["high"])
+        row = queryset.filter(**{f"{pk}__gte": start}).order_by(pk).first()
+        if row is not None:
+            rows.append(row)
+    return rows
+
+
+def tracker_payloads(rng, rows, lookup_fields):
+    """
+    allotment_tracker/ payloads built from sampled result rows: a random
+    subset of the (request key, field) lookups, and a rank a little above the row's.
+    """
+    payloads = []
+    for row in rows:
+        chosen = rng.sample(list(lookup_fields), rng.randint(0, len(lookup_fields)))
+        payload = {key: row[field] for key, field in chosen}
+        payload["rank_no"] = max(row["rank_no"] - rng.randint(0, 5000), 1)
+        payloads.append(payload)
+    return payloads
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(timings, wall_seconds=None):
+    """Latency summary in milliseconds; with wall_seconds, throughput as well."""
+    summary = {
+        "requests": len(timings),
+        "mean_ms": round(statistics.mean(timings) * 1000, 3),
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p95_ms": round(percentile(timings, 95) * 1000, 3),
+        "p99_ms": round(percentile(timings, 99) * 1000, 3),
+        "max_ms": round(max(timings) * 1000, 3),
+    }
+    if wall_seconds:
+        summary["throughput_rps"] = round(len(timings) / wall_seconds, 1)
+    return summary
+
+
+def compare(baseline, current, metrics=("p50_ms", "p95_ms", "p99_ms", "throughput_rps")):
+    """{endpoint: {metric: percent change}} between two benchmark_api result files."""
+    changes = {}
+    for name, result in current.get("endpoints", {}).items():
+        before = baseline.get("endpoints", {}).get(name)
+        if not before:
+            continue
+        changes[name] = {
+            metric: round((result[metric] - before[metric]) / before[metric] * 100, 1)
+            for metric in metrics
+            if result.get(metric) is not None and before.get(metric)
+        }
+    return changes
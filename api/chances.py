@@ -0,0 +1,369 @@
+"""
+Multi-year admission chances ("chance" mode of allotment_tracker/).
+
+AllotmentChance holds one row per institute/speciality/quota/category of an
+allotment_category, with the closing rank of every loaded year and
+statistics over them: the lowest, highest and latest closing rank and the
+trend (least-squares slope, ranks per year; positive means the seat closes
+at later ranks over time). rebuild_chances() computes them from the
+AllotmentSummary rows after an upload, grouped with pandas.
+
+chance_page() labels the rows against a candidate's rank, where a seat is
+within reach of every rank up to its closing rank:
+
+    safe      rank <= the closing rank of every loaded year
+    moderate  rank <= the closing rank of at least one year
+    reach     rank <= the highest closing rank plus CHANCE_REACH_MARGIN
+
+Rows further away are left out. Results are ordered by (max_closing_rank,
+id), which keeps keyset paging independent of the candidate's rank: the
+seats closest to the rank come first, so the reach rows lead and the safe
+ones, with the most margin, come last. Clients that group by label use the
+"chance" column. Each worker holds the rows of the published version as
+NumPy columns (ChanceIndex), reloaded when the published generation
+changes; a request is a few array operations and never reads the allotment
+rows. While one thread reloads, the others query AllotmentChance instead.
+"""
+import math
+import threading
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, CharField, Value, When
+
+from .datasets import active_years, published_state
+from .models import AllotmentChance, AllotmentSummary
+from .prediction import apply_lookups, parse_page_size, parse_rank, prediction_lookups
+from .results import QueryResult, decode_cursor, paginate
+
+
+CHANCE_KEY_FIELDS = (
+    "allotment_category",
+    "allotted_institute",
+    "state",
+    "qualifying_group_or_course",
+    "speciality",
+    "allotted_quota",
+    "allotted_category",
+)
+CHANCE_FIELDS = CHANCE_KEY_FIELDS + (
+    "closing_ranks",
+    "min_closing_rank",
+    "max_closing_rank",
+    "latest_closing_rank",
+    "closing_rank_trend",
+    "chance",
+)
+# Columns held by ChanceIndex; "chance" is computed per request
+INDEX_FIELDS = ("id",) + CHANCE_FIELDS[:-1]
+INT_FIELDS = ("id", "min_closing_rank", "max_closing_rank", "latest_closing_rank")
+# Payload filters (see api.prediction.LOOKUP_FIELDS)
+LOOKUP_FIELDS = ("allotment_category", "qualifying_group_or_course", "state", "speciality", "allotted_category")
+
+LABELS = np.array(["safe", "moderate", "reach"], dtype=object)
+DEFAULT_REACH_MARGIN = 0.1
+BATCH_SIZE = 1000
+
+
+def chance_stats(rows):
+    """
+    AllotmentChance field dicts for (*CHANCE_KEY_FIELDS, allotment_year,
+    closing_rank) rows, one row per key and year.
+    """
+    df = pd.DataFrame.from_records(list(rows), columns=[*CHANCE_KEY_FIELDS, "allotment_year", "closing_rank"])
+    if df.empty:
+        return []
+    df = df.sort_values([*CHANCE_KEY_FIELDS, "allotment_year"], kind="stable", ignore_index=True)
+    # Years counted from the earliest keep the regression sums small
+    x = (df["allotment_year"] - df["allotment_year"].min()).astype(float)
+    y = df["closing_rank"].astype(float)
+    df = df.assign(x=x, y=y, xx=x * x, xy=x * y)
+
+    grouped = df.groupby(list(CHANCE_KEY_FIELDS), sort=False)
+    stats = grouped.agg(
+        first_year=("allotment_year", "min"),
+        last_year=("allotment_year", "max"),
+        year_count=("allotment_year", "size"),
+        min_closing_rank=("closing_rank", "min"),
+        max_closing_rank=("closing_rank", "max"),
+        latest_closing_rank=("closing_rank", "last"),
+        sx=("x", "sum"),
+        sy=("y", "sum"),
+        sxx=("xx", "sum"),
+        sxy=("xy", "sum"),
+    )
+    n = stats["year_count"].to_numpy(dtype=float)
+    denominator = n * stats["sxx"].to_numpy() - stats["sx"].to_numpy() ** 2
+    numerator = n * stats["sxy"].to_numpy() - stats["sx"].to_numpy() * stats["sy"].to_numpy()
+    # A single year has no trend
+    trend = np.where(denominator > 0, numerator / np.where(denominator > 0, denominator, 1), 0.0)
+
+    # Rows are sorted by key, so each group's years are one contiguous run
+    starts = np.flatnonzero(np.diff(grouped.ngroup().to_numpy(), prepend=-1))
+    years = np.split(df["allotment_year"].to_numpy(), starts[1:])
+    ranks = np.split(df["closing_rank"].to_numpy(), starts[1:])
+
+    keys = stats.index.tolist()
+    columns = {
+        field: stats[field].tolist()
+        for field in ("first_year", "last_year", "year_count", "min_closing_rank", "max_closing_rank",
+                      "latest_closing_rank")
+    }
+    return [
+        {
+            **dict(zip(CHANCE_KEY_FIELDS, keys[i])),
+            **{field: values[i] for field, values in columns.items()},
+            "closing_ranks": {str(year): rank for year, rank in zip(years[i].tolist(), ranks[i].tolist())},
+            "closing_rank_trend": round(float(trend[i]), 1),
+        }
+        for i in range(len(keys))
+    ]
+
+
+def rebuild_chances(version_id, allotment_category=None):
+    """
+    Recompute the chance rows of a dataset version from its summaries (so
+    after rebuild_summary()), optionally only for one allotment_category.
+    Returns the number of rows written.
+    """
+    with transaction.atomic():
+        existing = AllotmentChance.objects.filter(dataset_version_id=version_id)
+        summaries = AllotmentSummary.objects.filter(dataset_version_id=version_id)
+        if allotment_category is not None:
+            existing = existing.filter(allotment_category=allotment_category)
+            summaries = summaries.filter(allotment_category=allotment_category)
+        existing.delete()
+
+        rows = summaries.values_list(*CHANCE_KEY_FIELDS, "allotment_year", "closing_rank").order_by()
+        created = AllotmentChance.objects.bulk_create(
+            [AllotmentChance(dataset_version_id=version_id, **stats) for stats in chance_stats(rows)],
+            batch_size=BATCH_SIZE,
+        )
+    return len(created)
+
+
+class ChanceIndex:
+    """Chance rows of the active categories of a version as columns, ordered by (max_closing_rank, id)."""
+
+    def __init__(self, version_id, generation, columns, lowered):
+        self.version_id = version_id
+        self.generation = generation
+        self.columns = columns  # field -> array
+        self.lowered = lowered  # lookup field -> (codes, {lowered value: code})
+
+    def __len__(self):
+        return len(self.columns["id"])
+
+    @classmethod
+    def load(cls, version_id, generation):
+        rows = (
+            AllotmentChance.objects
+            .filter(dataset_version_id=version_id, allotment_category__in=list(active_years(version_id)))
+            .order_by("max_closing_rank", "id")
+            .values_list(*INDEX_FIELDS)
+        )
+        return cls.build(version_id, generation, list(rows))
+
+    @classmethod
+    def build(cls, version_id, generation, rows):
+        """Build from INDEX_FIELDS tuples sorted by (max_closing_rank, id)."""
+        values = list(zip(*rows)) or [()] * len(INDEX_FIELDS)
+        columns = {}
+        for field, column in zip(INDEX_FIELDS, values):
+            if field in INT_FIELDS:
+                columns[field] = np.asarray(column, dtype=np.int64)
+            elif field == "closing_rank_trend":
+                columns[field] = np.asarray(column, dtype=np.float64)
+            else:
+                array = np.empty(len(column), dtype=object)
+                array[:] = column
+                columns[field] = array
+
+        lowered = {}
+        for field in LOOKUP_FIELDS:
+            codes, uniques = pd.factorize(np.array([value.lower() for value in columns[field]], dtype=object))
+            lowered[field] = (codes, {value: code for code, value in enumerate(uniques)})
+        return cls(version_id, generation, columns, lowered)
+
+    def search(self, lookups, rank_no, margin):
+        """ChanceResult of the rows matching the lookups that are within reach of rank_no."""
+        floor = reach_floor(rank_no, margin)
+        start = int(np.searchsorted(self.columns["max_closing_rank"], floor, side="left"))
+        mask = None
+        for field, value in lookups.items():
+            codes, by_value = self.lowered[field]
+            code = by_value.get(value)
+            if code is None:
+                return ChanceResult(self, np.array([], dtype=np.int64), rank_no)
+            match = codes[start:] == code
+            mask = match if mask is None else mask & match
+        if mask is None:
+            return ChanceResult(self, np.arange(start, len(self)), rank_no)
+        return ChanceResult(self, start + np.flatnonzero(mask), rank_no)
+
+    def labels(self, indices, rank_no):
+        """safe/moderate/reach for the rows at `indices`."""
+        choice = np.select(
+            [rank_no <= self.columns["min_closing_rank"][indices], rank_no <= self.columns["max_closing_rank"][indices]],
+            [0, 1],
+            default=2,
+        )
+        return LABELS[choice]
+
+    def values(self, indices, fields, rank_no):
+        """Tuples of `fields` for the rows at `indices`."""
+        columns = [
+            self.labels(indices, rank_no).tolist() if field == "chance" else self.columns[field][indices].tolist()
+            for field in fields
+        ]
+        return list(zip(*columns))
+
+
+class ChanceResult:
+    """Matching rows of a ChanceIndex; see api.results for the interface."""
+    rank_field = "max_closing_rank"
+
+    def __init__(self, index, indices, rank_no):
+        self.index = index
+        self.indices = indices
+        self.rank_no = rank_no
+        self.ranks = index.columns["max_closing_rank"][indices]
+
+    def from_rank(self, rank_no):
+        if rank_no is None:
+            return self
+        start = int(np.searchsorted(self.ranks, rank_no, side="left"))
+        return ChanceResult(self.index, self.indices[start:], self.rank_no) if start else self
+
+    def count(self):
+        return len(self.indices)
+
+    def _start(self, after):
+        if not after:
+            return 0
+        rank, pk = after
+        lo = int(np.searchsorted(self.ranks, rank, side="left"))
+        hi = int(np.searchsorted(self.ranks, rank, side="right"))
+        ids = self.index.columns["id"][self.indices[lo:hi]]
+        return lo + int(np.searchsorted(ids, pk, side="right"))
+
+    def rows(self, indices):
+        fields = ("id",) + CHANCE_FIELDS
+        return [dict(zip(fields, values)) for values in self.index.values(indices, fields, self.rank_no)]
+
+    def page(self, after, limit):
+        start = self._start(after)
+        return self.rows(self.indices[start:start + limit])
+
+    def page_values(self, after, limit, fields):
+        start = self._start(after)
+        return self.index.values(self.indices[start:start + limit], ("id", self.rank_field, *fields), self.rank_no)
+
+    def materialize(self, limit):
+        return self.rows(self.indices) if len(self.indices) <= limit else None
+
+
+_index = None
+_lock = threading.Lock()
+
+
+def current_chance_index(version_id, generation):
+    """The cached ChanceIndex if it was loaded for (version_id, generation), else None. Never loads."""
+    index = _index
+    if index is not None and (index.version_id, index.generation) == (version_id, generation):
+        return index
+    return None
+
+
+def get_chance_index(version_id, generation):
+    """
+    The ChanceIndex of (version_id, generation), loading it if the cached one
+    is stale. Returns None while another thread is loading, so callers fall
+    back to chance_query().
+    """
+    global _index
+    index = current_chance_index(version_id, generation)
+    if index is not None:
+        return index
+    if not _lock.acquire(blocking=_index is None):
+        return None
+    try:
+        index = current_chance_index(version_id, generation)
+        if index is None:
+            index = ChanceIndex.load(version_id, generation)
+            _index = index
+        return index
+    finally:
+        _lock.release()
+
+
+def invalidate_chances():
+    global _index
+    with _lock:
+        _index = None
+
+
+def reach_margin():
+    return getattr(settings, "CHANCE_REACH_MARGIN", DEFAULT_REACH_MARGIN)
+
+
+def reach_floor(rank_no, margin):
+    """Lowest max_closing_rank within reach of rank_no."""
+    return math.ceil(rank_no / (1 + margin))
+
+
+def chance_query(version_id, lookups, rank_no, margin):
+    """QueryResult with the rows of ChanceIndex.search(), read from AllotmentChance."""
+    queryset = AllotmentChance.objects.filter(
+        dataset_version_id=version_id,
+        allotment_category__in=list(active_years(version_id)),
+        max_closing_rank__gte=reach_floor(rank_no, margin),
+    )
+    chance = Case(
+        When(min_closing_rank__gte=rank_no, then=Value("safe")),
+        When(max_closing_rank__gte=rank_no, then=Value("moderate")),
+        default=Value("reach"),
+        output_field=CharField(),
+    )
+    queryset = apply_lookups(queryset, lookups).annotate(chance=chance)
+    return QueryResult(queryset.values("id", *CHANCE_FIELDS), rank_field="max_closing_rank")
+
+
+def parse_chance_rank(data):
+    rank_no = parse_rank(data.get("rank_no"))
+    if rank_no is None:
+        raise ValueError("rank_no is required in chance mode")
+    return rank_no
+
+
+def chance_page(data, cursor=None, page_size=None, include_count=True, columnar=False):
+    """
+    One page of labelled chances for an allotment_tracker/ payload. Same
+    return shape as api.prediction.predict_page; raises ValueError without
+    a rank_no.
+    """
+    rank_no = parse_chance_rank(data)
+    page_size = parse_page_size(page_size)
+
+    state = published_state()
+    after = decode_cursor(cursor, state)
+    version_id, generation = state
+    if version_id is None:
+        return {"count": 0 if include_count else None, "rows": [], "next_cursor": None, "page_size": page_size}
+    lookups = prediction_lookups(data)
+    index = get_chance_index(version_id, generation)
+    if index is not None:
+        result = index.search(lookups, rank_no, reach_margin())
+    else:
+        result = chance_query(version_id, lookups, rank_no, reach_margin())
+
+    rows, next_cursor = paginate(result, after, page_size, CHANCE_FIELDS, columnar, state)
+    return {
+        "count": result.count() if include_count else None,
+        "rows": rows,
+        "next_cursor": next_cursor,
+        "page_size": page_size,
+    }
+
@@ -0,0 +1,181 @@
+"""
+Versioned allotment datasets.
+
+Uploads load rows into a new DatasetVersion that readers never see. Once
+loading is complete, publish_version() swaps the single PublishedDataset
+pointer, so readers move from the old rows to the new ones in one write.
+Superseded versions are deleted later, in batches, by collect_versions().
+
+Each version also records which allotment_year is shown per
+allotment_category (ActiveAllotmentYear). Readers pre-resolve that small
+table into a filter, and switching years rewrites a single row.
+"""
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+
+from .models import ActiveAllotmentYear, DatasetVersion, NeetCounsellingSeatAllotment, PublishedDataset
+
+
+GC_BATCH_SIZE = 5000
+
+
+def published_state():
+    """(version_id, generation) of the published dataset, or (None, 0) before the first upload."""
+    state = (
+        PublishedDataset.objects.filter(pk=PublishedDataset.POINTER_ID)
+        .values_list("version_id", "generation")
+        .first()
+    )
+    return state or (None, 0)
+
+
+def published_version_id():
+    """Id of the DatasetVersion readers should query, or None before the first upload."""
+    return published_state()[0]
+
+
+def published_allotments(version_id=None):
+    """Queryset of NeetCounsellingSeatAllotment rows in the published (or given) version."""
+    if version_id is None:
+        version_id = published_version_id()
+    if version_id is None:
+        return NeetCounsellingSeatAllotment.objects.none()
+    return NeetCounsellingSeatAllotment.objects.filter(dataset_version_id=version_id)
+
+
+def active_years(version_id):
+    """{allotment_category: active allotment_year} for a dataset version."""
+    if version_id is None:
+        return {}
+    return dict(
+        ActiveAllotmentYear.objects.filter(dataset_version_id=version_id)
+        .values_list("allotment_category", "allotment_year")
+    )
+
+
+def active_year_filter(version_id, allotment_category=None):
+    """
+    Q matching the active (allotment_category, allotment_year) pairs of a
+    version, or None if no year is active. allotment_category, lowercased,
+    narrows it to that category as the allotment_tracker/ filter does.
+    """
+    return _year_condition(active_years(version_id).items(), allotment_category)
+
+
+def _year_condition(pairs, allotment_category):
+    if allotment_category is not None:
+        pairs = [(category, year) for category, year in pairs if category.lower() == allotment_category]
+    condition = None
+    for category, year in pairs:
+        pair = Q(allotment_category=category, allotment_year=year)
+        condition = pair if condition is None else condition | pair
+    return condition
+
+
+def active_allotments(version_id=None, allotment_category=None):
+    """Rows of the published (or given) version in the active year of their category."""
+    if version_id is None:
+        version_id = published_version_id()
+    condition = active_year_filter(version_id, allotment_category)
+    if condition is None:
+        return NeetCounsellingSeatAllotment.objects.none()
+    return published_allotments(version_id).filter(condition)
+
+
+def resolve_category(version_id, allotment_category):
+    """The stored spelling of allotment_category in a version, matched case-insensitively, or None."""
+    names = (
+        NeetCounsellingSeatAllotment.objects.filter(dataset_version_id=version_id)
+        .alias(category_lower=Lower("allotment_category"))
+        .filter(category_lower=allotment_category.strip().lower())
+        .values_list("allotment_category", flat=True)[:1]
+    )
+    return next(iter(names), None)
+
+
+def set_active_year(version_id, allotment_category, allotment_year):
+    """
+    Show allotment_year for allotment_category in a version; one row write
+    plus the generation bump. Returns the category as stored in the version;
+    raises ValueError if the version has no such category.
+    """
+    category = resolve_category(version_id, allotment_category)
+    if category is None:
+        raise ValueError(f"Unknown allotment_category: {allotment_category}")
+    with transaction.atomic():
+        ActiveAllotmentYear.objects.update_or_create(
+            dataset_version_id=version_id,
+            allotment_category=category,
+            defaults={"allotment_year": allotment_year},
+        )
+        bump_generation()
+    return category
+
+
+def bump_generation():
+    """Mark the published data as changed; call inside the writing transaction."""
+    PublishedDataset.objects.filter(pk=PublishedDataset.POINTER_ID).update(
+        generation=F("generation") + 1
+    )
+
+
+def create_version(source_name=""):
+    return DatasetVersion.objects.create(source_name=(source_name or "")[:255])
+
+
+def publish_version(version):
+    """Point readers at `version` and retire the previously published one."""
+    with transaction.atomic():
+        pointer = (
+            PublishedDataset.objects.select_for_update()
+            .filter(pk=PublishedDataset.POINTER_ID)
+            .first()
+        )
+        previous_id = pointer.version_id if pointer else None
+
+        PublishedDataset.objects.update_or_create(
+            pk=PublishedDataset.POINTER_ID, defaults={"version": version}
+        )
+        bump_generation()
+        DatasetVersion.objects.filter(pk=version.pk).update(
+            status=DatasetVersion.STATUS_PUBLISHED, published_at=timezone.now()
+        )
+        if previous_id and previous_id != version.pk:
+            DatasetVersion.objects.filter(pk=previous_id).update(status=DatasetVersion.STATUS_RETIRED)
+
+    version.status = DatasetVersion.STATUS_PUBLISHED
+    return version
+
+
+def collect_versions(keep=1, batch_size=GC_BATCH_SIZE):
+    """
+    Delete retired and failed versions, keeping the `keep` most recently
+    retired ones for rollback. Rows are deleted in primary-key batches so no
+    single statement locks a whole version.
+
+    Returns the number of allotment rows deleted.
+    """
+    retired = list(
+        DatasetVersion.objects.filter(status=DatasetVersion.STATUS_RETIRED)
+        .order_by("-published_at", "-pk")
+        .values_list("pk", flat=True)
+    )
+    failed = list(
+        DatasetVersion.objects.filter(status=DatasetVersion.STATUS_FAILED).values_list("pk", flat=True)
+    )
+
+    deleted = 0
+    for version_id in retired[keep:] + failed:
+        while True:
+            ids = list(
+                NeetCounsellingSeatAllotment.objects.filter(dataset_version_id=version_id)
+                .values_list("pk", flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            NeetCounsellingSeatAllotment.objects.filter(pk__in=ids).delete()
+            deleted += len(ids)
+        DatasetVersion.objects.filter(pk=version_id).delete()
+    return deleted
@@ -0,0 +1,166 @@
+"""
+Dictionary encoding of the repeated text columns of the allotment table.
+
+Each of DIMENSION_FIELDS is stored on NeetCounsellingSeatAllotment as an
+integer key into AllotmentDimension, which holds one row per distinct
+(field, name). Uploads encode names to ids while loading (see
+api.admin.ingest); readers turn ids back into names, and a
+case-insensitive filter value into the ids it covers, through a
+DimensionMap cached in each worker, so neither needs a join.
+
+Dimension rows are only ever added. The cached map is reloaded when the
+published generation differs from the one it was loaded at, or when a
+row carries an id it does not know yet.
+
+Names are matched exactly in Python, not by the database: MySQL's default
+collation would fold "Delhi" and "DELHI" into one row. Uploads hold the
+upload lock while encoding, so two never add the same name.
+"""
+import threading
+
+from .models import AllotmentDimension
+
+
+DIMENSION_FIELDS = (
+    "allotted_quota",
+    "allotted_institute",
+    "state",
+    "qualifying_group_or_course",
+    "speciality",
+    "allotted_category",
+    "candidate_category",
+)
+
+
+class UnknownDimension(KeyError):
+    """A row refers to a dimension id the map was loaded without."""
+
+
+class DimensionMap:
+    def __init__(self, rows, generation=None):
+        self.generation = generation
+        self.names = {field: {} for field in DIMENSION_FIELDS}   # field -> {id: name}
+        self.ids = {field: {} for field in DIMENSION_FIELDS}     # field -> {name: id}
+        self.lowered = {field: {} for field in DIMENSION_FIELDS}  # field -> {lowered name: [ids]}
+        for pk, field, name in rows:
+            self._add(field, pk, name)
+
+    def _add(self, field, pk, name):
+        self.names[field][pk] = name
+        self.ids[field][name] = pk
+        self.lowered[field].setdefault(name.lower(), []).append(pk)
+
+    def matching_ids(self, field, value):
+        """Ids of the names of `field` equal to the lowercased `value` ignoring case."""
+        return self.lowered[field].get(value, [])
+
+    def name(self, field, pk):
+        try:
+            return self.names[field][pk]
+        except KeyError:
+            raise UnknownDimension(field, pk) from None
+
+    def encode(self, field, names):
+        """{name: id} for `names` of `field`, adding the names not stored yet. Call under the upload lock."""
+        known = self.ids[field]
+        missing = {name for name in names if name not in known}
+        if missing:
+            AllotmentDimension.objects.bulk_create(
+                [AllotmentDimension(field=field, name=name) for name in sorted(missing)]
+            )
+            # Not every backend returns ids from bulk_create; the query may also
+            # return stored names that differ only in case, which are skipped
+            added = AllotmentDimension.objects.filter(field=field, name__in=missing).values_list("id", "name")
+            for pk, name in added:
+                if name in missing and name not in known:
+                    self._add(field, pk, name)
+        return {name: known[name] for name in names}
+
+    def decode_rows(self, rows):
+        """Replace dimension ids by names in .values() dicts, in place. Returns rows."""
+        fields = [field for field in DIMENSION_FIELDS if rows and field in rows[0]]
+        # Check first, so rows are never left half decoded
+        for field in fields:
+            unknown = {row[field] for row in rows} - self.names[field].keys()
+            if unknown:
+                raise UnknownDimension(field, unknown.pop())
+        for row in rows:
+            for field in fields:
+                row[field] = self.names[field][row[field]]
+        return rows
+
+    def decode_values(self, rows, fields):
+        """.values_list() tuples in `fields` order with dimension ids replaced by names."""
+        names = [self.names.get(field) for field in fields]
+        if all(lookup is None for lookup in names):
+            return rows
+        decoded = []
+        for row in rows:
+            try:
+                decoded.append(tuple(
+                    value if lookup is None else lookup[value] for lookup, value in zip(names, row)
+                ))
+            except KeyError as e:
+                raise UnknownDimension(*e.args) from None
+        return decoded
+
+
+_dimensions = None
+_lock = threading.Lock()
+
+
+def load_dimensions(generation=None):
+    """Load the map from the database and make it the cached one."""
+    global _dimensions
+    rows = AllotmentDimension.objects.values_list("id", "field", "name")
+    dimensions = DimensionMap(rows.iterator(), generation)
+    with _lock:
+        _dimensions = dimensions
+    return dimensions
+
+
+def get_dimensions(generation=None):
+    """The cached map, reloaded if it was loaded at another published generation than `generation`."""
+    dimensions = _dimensions
+    if dimensions is None or (generation is not None and dimensions.generation != generation):
+        dimensions = load_dimensions(generation)
+    return dimensions
+
+
+def reload_dimensions():
+    """Reload the cached map, keeping the generation it was loaded at."""
+    dimensions = _dimensions
+    return load_dimensions(dimensions.generation if dimensions is not None else None)
+
+
+def invalidate_dimensions():
+    global _dimensions
+    with _lock:
+        _dimensions = None
+
+
+def decode_rows(rows):
+    """DimensionMap.decode_rows() with the cached map, reloading it once for an unknown id."""
+    try:
+        return get_dimensions().decode_rows(rows)
+    except UnknownDimension:
+        return reload_dimensions().decode_rows(rows)
+
+
+def decode_values(rows, fields):
+    """DimensionMap.decode_values() with the cached map, reloading it once for an unknown id."""
+    try:
+        return get_dimensions().decode_values(rows, fields)
+    except UnknownDimension:
+        return reload_dimensions().decode_values(rows, fields)
+
+
+def dimension_names(field, values):
+    """Names for a sequence of ids of `field`; values of other fields are returned as they are."""
+    if field not in DIMENSION_FIELDS:
+        return values
+    try:
+        return [get_dimensions().name(field, pk) for pk in values]
+    except UnknownDimension:
+        dimensions = reload_dimensions()
+        return [dimensions.name(field, pk) for pk in values]
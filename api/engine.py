@@ -0,0 +1,298 @@
+"""
+In-memory prediction engine.
+
+The active rows of the published dataset are loaded once into NumPy columns,
+grouped by the five (lowercased) categorical filters and sorted by rank_no
+within each group. A prediction is then a dictionary lookup for the matching
+groups plus a searchsorted slice per group, instead of a database query, and
+only the requested page of rows is turned into dicts.
+
+The engine is tagged with the (version, generation) it was built from and is
+rebuilt on the first request after an upload or year switch bumps either.
+A RankIndex can also be saved to a directory of .npy files and opened
+memory-mapped (see api.snapshots), so worker processes share one copy of
+the columns instead of each loading the rows from the database.
+"""
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+
+
+# Categorical group key, in the same order as api.prediction.LOOKUP_FIELDS
+KEY_FIELDS = (
+    "allotment_category",
+    "qualifying_group_or_course",
+    "state",
+    "speciality",
+    "allotted_category",
+)
+INT_FIELDS = ("id", "allotment_year", "rank_no")
+SNAPSHOT_FORMAT = 1
+
+
+class RankIndex:
+    def __init__(self, version_id, generation, fields, codes, categories, ints, groups, group_bounds, key_index):
+        self.version_id = version_id
+        self.generation = generation
+        self.fields = fields              # output field order
+        self.codes = codes                # field -> int32 codes into categories[field]
+        self.categories = categories      # field -> object array of distinct values
+        self.ints = ints                  # field -> int64 array
+        self.groups = groups              # group key tuple -> group number
+        self.group_bounds = group_bounds  # group number -> (start, stop) into the columns
+        self.key_index = key_index        # key field -> {lowered value: array of group numbers}
+
+    def __len__(self):
+        return len(self.ints["rank_no"])
+
+    @classmethod
+    def build(cls, version_id, generation, fields, rows, decode=None):
+        """
+        Build a RankIndex from an iterable of row tuples in `fields` order.
+        decode(field, values), if given, maps the distinct values of a field
+        to the ones served, such as dimension ids to names.
+        """
+        columns = {field: [] for field in fields}
+        for row in rows:
+            for field, value in zip(fields, row):
+                columns[field].append(value)
+
+        ints = {field: np.asarray(columns[field], dtype=np.int64) for field in INT_FIELDS}
+        codes, categories = {}, {}
+        for field in fields:
+            if field in INT_FIELDS:
+                continue
+            # Dictionary-encode; factorize gives None the code -1, which picks the
+            # trailing None appended to the categories.
+            field_codes, uniques = pd.factorize(np.asarray(columns[field], dtype=object))
+            if decode is not None:
+                uniques = decode(field, uniques.tolist())
+            codes[field] = field_codes.astype(np.int32)
+            categories[field] = np.append(np.asarray(uniques, dtype=object), None)
+
+        # Group key per row: one integer per lowercased key field
+        key_codes = []
+        lowered = {}
+        for field in KEY_FIELDS:
+            lower = np.array(["" if v is None else str(v).lower() for v in categories[field]], dtype=object)
+            inverse, lowered[field] = pd.factorize(lower)
+            key_codes.append(inverse[codes[field]])
+
+        # Sort by group key, then (rank_no, id)
+        order = np.lexsort([ints["id"], ints["rank_no"]] + key_codes[::-1])
+        ints = {field: array[order] for field, array in ints.items()}
+        codes = {field: array[order] for field, array in codes.items()}
+        key_codes = [array[order] for array in key_codes]
+
+        groups = {}
+        group_bounds = np.empty((0, 2), dtype=np.int64)
+        if len(order):
+            stacked = np.stack(key_codes, axis=1)
+            change = np.any(stacked[1:] != stacked[:-1], axis=1)
+            starts = np.concatenate(([0], np.flatnonzero(change) + 1))
+            stops = np.concatenate((starts[1:], [len(order)]))
+            group_bounds = np.stack((starts, stops), axis=1).astype(np.int64)
+            for number, start in enumerate(starts.tolist()):
+                key = tuple(lowered[field][stacked[start, i]] for i, field in enumerate(KEY_FIELDS))
+                groups[key] = number
+
+        return cls(
+            version_id, generation, fields, codes, categories, ints, groups, group_bounds, group_key_index(groups),
+        )
+
+    def save(self, path):
+        """
+        Write the index to the directory `path`: one .npy file per column
+        plus meta.json with the categories and group keys.
+        """
+        os.makedirs(path, exist_ok=True)
+        for field, array in self.ints.items():
+            np.save(os.path.join(path, f"int.{field}.npy"), np.ascontiguousarray(array))
+        for field, array in self.codes.items():
+            np.save(os.path.join(path, f"code.{field}.npy"), np.ascontiguousarray(array))
+        np.save(os.path.join(path, "group_bounds.npy"), np.ascontiguousarray(self.group_bounds))
+        meta = {
+            "format": SNAPSHOT_FORMAT,
+            "version_id": self.version_id,
+            "generation": self.generation,
+            "fields": list(self.fields),
+            "categories": {field: values.tolist() for field, values in self.categories.items()},
+            "groups": list(self.groups),
+        }
+        with open(os.path.join(path, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+    @classmethod
+    def open(cls, path):
+        """
+        Open an index written by save(). The columns are memory-mapped
+        read-only, so processes opening the same files share their pages.
+        Raises ValueError for a snapshot of another format.
+        """
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        if meta.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"Unsupported snapshot format {meta.get('format')!r} in {path}")
+
+        def load(name):
+            return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+        fields = tuple(meta["fields"])
+        ints = {field: load(f"int.{field}") for field in INT_FIELDS}
+        codes = {field: load(f"code.{field}") for field in fields if field not in INT_FIELDS}
+        categories = {field: np.array(values, dtype=object) for field, values in meta["categories"].items()}
+        groups = {tuple(key): number for number, key in enumerate(meta["groups"])}
+        return cls(
+            meta["version_id"], meta["generation"], fields, codes, categories, ints, groups,
+            load("group_bounds"), group_key_index(groups),
+        )
+
+    def matching_groups(self, lookups):
+        """Group numbers whose key matches every lookup (lowercased field -> value)."""
+        if all(field in lookups for field in KEY_FIELDS):
+            number = self.groups.get(tuple(lookups[field] for field in KEY_FIELDS))
+            return np.array([] if number is None else [number], dtype=np.int64)
+
+        matched = None
+        for field, value in lookups.items():
+            numbers = self.key_index.get(field, {}).get(value)
+            if numbers is None:
+                return np.array([], dtype=np.int64)
+            matched = numbers if matched is None else np.intersect1d(matched, numbers, assume_unique=True)
+        if matched is None:
+            return np.arange(len(self.groups), dtype=np.int64)
+        return matched
+
+    def search_indices(self, lookups, rank_no=None):
+        """Row positions matching the filters with rank_no >= rank_no, ordered by (rank_no, id)."""
+        ranks = self.ints["rank_no"]
+        slices = []
+        for start, stop in self.group_bounds[self.matching_groups(lookups)].tolist():
+            if rank_no is not None:
+                start += int(np.searchsorted(ranks[start:stop], rank_no, side="left"))
+            if start < stop:
+                slices.append(np.arange(start, stop))
+        if not slices:
+            return np.array([], dtype=np.int64)
+        indices = np.concatenate(slices)
+        if len(slices) > 1:
+            indices = indices[np.lexsort((self.ints["id"][indices], ranks[indices]))]
+        return indices
+
+    def rows(self, indices):
+        """Materialize result dicts for the given row positions."""
+        return [dict(zip(self.fields, values)) for values in self.values(indices, self.fields)]
+
+    def values(self, indices, fields):
+        """Tuples of `fields` for the given row positions."""
+        columns = []
+        for field in fields:
+            if field in self.ints:
+                columns.append(self.ints[field][indices].tolist())
+            else:
+                columns.append(self.categories[field][self.codes[field][indices]].tolist())
+        return list(zip(*columns))
+
+    def search(self, lookups, rank_no=None):
+        return IndexResult(self, self.search_indices(lookups, rank_no))
+
+
+def group_key_index(groups):
+    """{key field: {lowered value: array of group numbers}} for a {group key: number} dict."""
+    index = {}
+    for i, field in enumerate(KEY_FIELDS):
+        by_value = {}
+        for number, key in enumerate(groups):
+            by_value.setdefault(key[i], []).append(number)
+        index[field] = {value: np.asarray(numbers, dtype=np.int64) for value, numbers in by_value.items()}
+    return index
+
+
+class IndexResult:
+    """Matching row positions of a RankIndex; see api.results for the interface."""
+    rank_field = "rank_no"
+
+    def __init__(self, index, indices):
+        self.index = index
+        self.indices = indices
+        self.ranks = index.ints["rank_no"][indices]
+
+    def from_rank(self, rank_no):
+        if rank_no is None:
+            return self
+        start = int(np.searchsorted(self.ranks, rank_no, side="left"))
+        return IndexResult(self.index, self.indices[start:]) if start else self
+
+    def count(self):
+        return len(self.indices)
+
+    def _start(self, after):
+        if not after:
+            return 0
+        rank_no, pk = after
+        lo = int(np.searchsorted(self.ranks, rank_no, side="left"))
+        hi = int(np.searchsorted(self.ranks, rank_no, side="right"))
+        ids = self.index.ints["id"][self.indices[lo:hi]]
+        return lo + int(np.searchsorted(ids, pk, side="right"))
+
+    def page(self, after, limit):
+        start = self._start(after)
+        return self.index.rows(self.indices[start:start + limit])
+
+    def page_values(self, after, limit, fields):
+        start = self._start(after)
+        return self.index.values(self.indices[start:start + limit], ("id", self.rank_field, *fields))
+
+    def materialize(self, limit):
+        return self.index.rows(self.indices) if len(self.indices) <= limit else None
+
+
+class PredictionEngine:
+    """
+    Holds the current RankIndex and rebuilds it when the published data changes.
+    load_rows(version_id) must return the active rows as tuples in `fields`
+    order; decode is passed on to RankIndex.build(). open_snapshot(version_id,
+    generation), if given, is tried first and returns a saved RankIndex or None.
+    """
+
+    def __init__(self, fields, load_rows, decode=None, open_snapshot=None):
+        self.fields = fields
+        self.load_rows = load_rows
+        self.decode = decode
+        self.open_snapshot = open_snapshot
+        self.index = None
+        self._lock = threading.Lock()
+
+    def current_index(self, version_id, generation):
+        """RankIndex if it is built for (version_id, generation), else None. Never loads."""
+        index = self.index
+        if index is not None and (index.version_id, index.generation) == (version_id, generation):
+            return index
+        return None
+
+    def get_index(self, version_id, generation):
+        """
+        RankIndex for (version_id, generation), rebuilding if stale. Returns
+        None while another thread is rebuilding, so callers fall back to the ORM.
+        """
+        index = self.current_index(version_id, generation)
+        if index is not None:
+            return index
+        index = self.index
+        if not self._lock.acquire(blocking=index is None):
+            return None
+        try:
+            index = self.index
+            if index is None or (index.version_id, index.generation) != (version_id, generation):
+                index = self.open_snapshot(version_id, generation) if self.open_snapshot else None
+                if index is None:
+                    rows = self.load_rows(version_id)
+                    index = RankIndex.build(version_id, generation, self.fields, rows, self.decode)
+                self.index = index
+            return index
+        finally:
+            self._lock.release()
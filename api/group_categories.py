@@ -0,0 +1,105 @@
+"""
+Cached payload for group-categories/.
+
+The grouped dropdown list is serialized once to JSON bytes and stored in
+one of settings.CACHES together with a strong ETag and the time of the
+last write, so the view can answer conditional requests with a single
+primary-key read.
+Entries are keyed on GroupCategoryState.generation, which writes through
+GroupDropdownUploadAPIView (and any model save or delete) bump, so every
+worker sees a change on its next request even with a per-process cache
+such as the default LocMemCache.
+
+    GROUP_CATEGORY_CACHE = {"ALIAS": "default", "TIMEOUT": 300}
+"""
+import hashlib
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import GroupCategory, GroupCategoryState
+from .renderers import dumps
+
+
+CACHE_KEY = "group_categories:payload:{}"
+DEFAULT_ALIAS = "default"
+DEFAULT_TIMEOUT = 300
+
+
+def _config():
+    config = getattr(settings, "GROUP_CATEGORY_CACHE", {})
+    return caches[config.get("ALIAS", DEFAULT_ALIAS)], config.get("TIMEOUT", DEFAULT_TIMEOUT)
+
+
+def build_group_categories():
+    """
+    Grouped list, ordered by group_name then category_type:
+    [{"group_name": "...", "category_type": ["a", "b", ...]}, ...]
+    """
+    return _group(_category_rows().iterator())
+
+
+def _category_rows():
+    return GroupCategory.objects.values("group_name", "category_type").order_by("group_name", "category_type")
+
+
+def _group(rows):
+    return [
+        {"group_name": group_name, "category_type": [item["category_type"] for item in items]}
+        for group_name, items in groupby(rows, key=itemgetter("group_name"))
+    ]
+
+
+def _payload(groups, changed_at):
+    body = dumps(groups)
+    etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+    # HTTP dates have one-second resolution
+    return body, etag, changed_at.replace(microsecond=0)
+
+
+def _state():
+    """(generation, changed_at) of the list; the same in every worker."""
+    state = (
+        GroupCategoryState.objects.filter(pk=GroupCategoryState.STATE_ID)
+        .values_list("generation", "changed_at")
+        .first()
+    )
+    return state or (0, timezone.now())
+
+
+def group_categories_payload():
+    """(body, etag, last_modified) for group-categories/, built on a cache miss."""
+    cache, timeout = _config()
+    generation, changed_at = _state()
+    key = CACHE_KEY.format(generation)
+    payload = cache.get(key)
+    if payload is None:
+        payload = _payload(build_group_categories(), changed_at)
+        cache.set(key, payload, timeout)
+    return payload
+
+
+def invalidate_group_categories():
+    """Mark the list as changed for every worker."""
+    now = timezone.now()
+    updated = GroupCategoryState.objects.filter(pk=GroupCategoryState.STATE_ID).update(
+        generation=F("generation") + 1, changed_at=now
+    )
+    if not updated:
+        state, created = GroupCategoryState.objects.get_or_create(
+            pk=GroupCategoryState.STATE_ID, defaults={"generation": 1, "changed_at": now}
+        )
+        if not created:
+            invalidate_group_categories()
+
+
+@receiver(post_save, sender=GroupCategory)
+@receiver(post_delete, sender=GroupCategory)
+def _group_category_changed(**kwargs):
+    invalidate_group_categories()
@@ -0,0 +1,290 @@
+"""
+Buffered capture of allotment_tracker/ leads.
+
+The view hands each named request to record_lead(), which builds a
+NeetCounsellingSeatAllotmentTracker instance, validates its fields without
+touching the database and appends it to a per-process buffer. The buffer is
+written with one bulk_create by a background thread when it reaches
+MAX_SIZE records or its oldest record is MAX_DELAY seconds old, and when
+the worker exits. Appending never writes or raises, so a failing lead
+write cannot fail the prediction it came with.
+
+A batch whose write fails is retried MAX_DELAY seconds later, at most
+MAX_RETRIES times; then it is parked: appended as JSON lines to
+SPOOL_PATH, or logged when that is unset. Records beyond MAX_PENDING (a
+database outage) are parked the same way instead of growing the buffer.
+
+Configure with settings.TRACKER_BUFFER:
+
+    TRACKER_BUFFER = {
+        "ENABLED": True,       # False writes each lead synchronously
+        "MAX_SIZE": 100,
+        "MAX_DELAY": 2.0,      # seconds
+        "BACKGROUND": True,    # False: no thread, the appending thread writes (tests, scripts)
+        "MAX_RETRIES": 3,
+        "MAX_PENDING": 10000,
+        "SPOOL_PATH": None,
+    }
+"""
+import atexit
+import json
+import logging
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.signals import setting_changed
+from django.db import close_old_connections, transaction
+from django.dispatch import receiver
+
+from .models import NeetCounsellingSeatAllotmentTracker
+from .tracker_stats import record_leads
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_SIZE = 100
+DEFAULT_MAX_DELAY = 2.0
+DEFAULT_MAX_RETRIES = 3
+DEFAULT_MAX_PENDING = 10000
+
+LEAD_FIELDS = [
+    field.name
+    for field in NeetCounsellingSeatAllotmentTracker._meta.concrete_fields
+    if field.editable and not field.primary_key and field.name not in ("created_at", "updated_at")
+]
+
+
+def build_lead(data):
+    """
+    Unsaved tracker record for a request payload, or None if it does not
+    validate. Unknown keys are ignored, like the serializer did.
+    """
+    values = {}
+    for name in LEAD_FIELDS:
+        value = data.get(name)
+        if isinstance(value, str):
+            value = value.strip() or None
+        values[name] = value
+    lead = NeetCounsellingSeatAllotmentTracker(**values)
+    try:
+        lead.clean_fields(exclude=["seqno", "created_at", "updated_at"])
+    except ValidationError:
+        return None
+    return lead
+
+
+class LeadBuffer:
+    def __init__(self, max_size=DEFAULT_MAX_SIZE, max_delay=DEFAULT_MAX_DELAY, background=True,
+                 max_retries=DEFAULT_MAX_RETRIES, max_pending=DEFAULT_MAX_PENDING, spool_path=None):
+        self.max_size = max(int(max_size), 1)
+        self.max_delay = max_delay
+        self.background = background
+        self.max_retries = max(int(max_retries), 1)
+        self.max_pending = max(int(max_pending), self.max_size)
+        self.spool_path = spool_path
+        self.flushed = 0
+        self.parked = 0
+        self.failures = 0  # failed writes of the records at the head of the buffer
+        self._pending = []
+        self._oldest = None
+        self._retry_at = 0.0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread = None
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+
+    def append(self, lead):
+        """Buffer a record. Never raises; without a background thread, writes a full buffer itself."""
+        with self._lock:
+            if not self._pending:
+                self._oldest = time.monotonic()
+            self._pending.append(lead)
+            overflow = len(self._pending) - self.max_pending
+            parked = self._pending[:overflow] if overflow > 0 else []
+            del self._pending[:len(parked)]
+            due = self._due()
+        if parked:
+            self._park(parked, "buffer full")
+        if self.background:
+            self._start()
+            if due:
+                self._wake.set()
+        elif due:
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Writing buffered tracker records failed")
+
+    def _due(self):
+        now = time.monotonic()
+        return bool(self._pending) and now >= self._retry_at and (
+            len(self._pending) >= self.max_size or now - self._oldest >= self.max_delay
+        )
+
+    def flush(self):
+        """Write all buffered records. Returns the number written; raises if the write failed."""
+        with self._flush_lock:
+            with self._lock:
+                batch, self._pending, self._oldest = self._pending, [], None
+            if not batch:
+                return 0
+            try:
+                with transaction.atomic():
+                    NeetCounsellingSeatAllotmentTracker.objects.bulk_create(batch, batch_size=self.max_size)
+                    record_leads(batch)  # bulk_create sends no post_save
+            except Exception:
+                self.failures += 1
+                if self.failures >= self.max_retries:
+                    self.failures = 0
+                    self._park(batch, f"write failed {self.max_retries} times")
+                else:
+                    # Keep the records for a retry after a full delay
+                    with self._lock:
+                        self._pending[:0] = batch
+                        self._oldest = time.monotonic()
+                        self._retry_at = self._oldest + self.max_delay
+                raise
+            self.failures = 0
+            self.flushed += len(batch)
+            return len(batch)
+
+    def _park(self, records, reason):
+        """Move records out of the buffer: to the spool file, or to the log."""
+        self.parked += len(records)
+        lines = "".join(
+            json.dumps({name: getattr(lead, name) for name in LEAD_FIELDS}, default=str) + "\n"
+            for lead in records
+        )
+        if self.spool_path:
+            try:
+                with open(self.spool_path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+            except OSError:
+                logger.exception("Could not spool tracker records to %s", self.spool_path)
+            else:
+                logger.error("Spooled %d tracker records to %s (%s)", len(records), self.spool_path, reason)
+                return
+        logger.error("Dropped %d tracker records (%s):\n%s", len(records), reason, lines)
+
+    def _start(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="lead-buffer", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wake.wait(self.max_delay / 2)
+            self._wake.clear()
+            with self._lock:
+                due = self._due()
+            if due and not self._stopped.is_set():
+                try:
+                    self.flush()
+                except Exception:
+                    logger.exception("Flushing %d buffered tracker records failed", len(self))
+                finally:
+                    close_old_connections()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+        return self.flush()
+
+    def __len__(self):
+        return len(self._pending)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_lead_buffer():
+    """The process-wide LeadBuffer built from settings.TRACKER_BUFFER, or None when disabled."""
+    global _buffer
+    config = getattr(settings, "TRACKER_BUFFER", {})
+    if not config.get("ENABLED", True):
+        return None
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = LeadBuffer(
+                    config.get("MAX_SIZE", DEFAULT_MAX_SIZE),
+                    config.get("MAX_DELAY", DEFAULT_MAX_DELAY),
+                    config.get("BACKGROUND", True),
+                    config.get("MAX_RETRIES", DEFAULT_MAX_RETRIES),
+                    config.get("MAX_PENDING", DEFAULT_MAX_PENDING),
+                    config.get("SPOOL_PATH"),
+                )
+    return _buffer
+
+
+def record_lead(data):
+    """
+    Capture a lead from an allotment_tracker/ payload. Returns False if it
+    did not validate or, with the buffer disabled, could not be written;
+    never raises.
+    """
+    lead = build_lead(data)
+    if lead is None:
+        return False
+    buffer = get_lead_buffer()
+    if buffer is not None:
+        buffer.append(lead)
+        return True
+    try:
+        lead.save()
+    except Exception:
+        logger.exception("Writing a tracker record failed")
+        return False
+    return True
+
+
+async def arecord_lead(data):
+    """Async record_lead(). Without a background thread, the append runs in a worker thread."""
+    lead = build_lead(data)
+    if lead is None:
+        return False
+    buffer = get_lead_buffer()
+    if buffer is not None:
+        if buffer.background:
+            buffer.append(lead)
+        else:
+            await sync_to_async(buffer.append)(lead)
+        return True
+    try:
+        await lead.asave()
+    except Exception:
+        logger.exception("Writing a tracker record failed")
+        return False
+    return True
+
+
+def flush_leads():
+    """Write any buffered leads of this process. Returns the number written."""
+    return _buffer.flush() if _buffer is not None else 0
+
+
+@atexit.register
+def _flush_on_exit():
+    if _buffer is not None:
+        try:
+            written = _buffer.stop()
+        except Exception:
+            logger.exception("Lost %d buffered tracker records on shutdown", len(_buffer))
+        else:
+            if written:
+                logger.info("Flushed %d buffered tracker records on shutdown", written)
+
+
+@receiver(setting_changed)
+def _reset_lead_buffer(setting, **kwargs):
+    global _buffer
+    if setting == "TRACKER_BUFFER" and _buffer is not None:
+        _buffer.stop()
+        _buffer = None
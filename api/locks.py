@@ -0,0 +1,46 @@
+"""
+Named advisory locks that are held across transactions.
+
+On MySQL these are GET_LOCK/RELEASE_LOCK on the current connection, so a
+lock is shared by every worker process and host using the database, and
+MySQL releases it if the connection drops. Other backends (SQLite in tests
+and local runs) fall back to a lock within this process.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+class LockTimeout(Exception):
+    """The lock was still held by someone else when the timeout ran out."""
+
+
+_local_locks = {}
+_local_locks_lock = threading.Lock()
+
+
+@contextmanager
+def advisory_lock(name, timeout=600):
+    """Hold the lock `name` for the with block, waiting up to `timeout` seconds for it."""
+    if connection.vendor == "mysql":
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT GET_LOCK(%s, %s)", [name, timeout])
+            acquired = cursor.fetchone()[0] == 1
+        if not acquired:
+            raise LockTimeout(f"Lock {name!r} is held by another session")
+        try:
+            yield
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT RELEASE_LOCK(%s)", [name])
+        return
+
+    with _local_locks_lock:
+        lock = _local_locks.setdefault(name, threading.Lock())
+    if not lock.acquire(timeout=timeout):
+        raise LockTimeout(f"Lock {name!r} is held by another thread")
+    try:
+        yield
+    finally:
+        lock.release()
@@ -0,0 +1,152 @@
+"""
+Background mail queue.
+
+Views call enqueue_email(), which only writes a QueuedEmail row. The
+send_queued_mail management command delivers due rows in batches over a
+single backend connection (get_connection() + send_messages) and retries
+failures with exponential backoff.
+
+A batch is claimed in a short transaction that marks its rows "sending"
+with a lease (next_attempt_at = now + LEASE_SECONDS) and commits, so no
+row lock is held during SMTP I/O. The outcome of every row, including a
+failed connection open, is then saved with backoff. Rows of a worker that
+died mid-batch are claimed again once their lease expires.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import F, Q
+from django.template.loader import get_template
+from django.utils import timezone
+
+from .models import QueuedEmail
+
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 5
+BACKOFF_SECONDS = 60       # first retry delay, doubled after each failure
+MAX_BACKOFF_SECONDS = 3600
+LEASE_SECONDS = 600        # how long a claimed batch may take before other workers reclaim it
+
+RESULTS_TEMPLATE = "api/emails/results.html"
+RESULTS_MAX_ROWS = 500     # default for settings.RESULTS_EMAIL_MAX_ROWS
+
+
+def enqueue_email(to_email, subject, body, html_body=None, from_email=None):
+    return QueuedEmail.objects.create(
+        to_email=to_email,
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        from_email=from_email,
+    )
+
+
+def results_email_max_rows():
+    return getattr(settings, "RESULTS_EMAIL_MAX_ROWS", RESULTS_MAX_ROWS)
+
+
+def render_results_email(rows, total=None):
+    """
+    HTML body for a results email. rows are dicts with rank, college, state
+    and category; total is the full match count when rows were capped.
+    """
+    total = len(rows) if total is None else total
+    return get_template(RESULTS_TEMPLATE).render({
+        "rows": rows,
+        "total": total,
+        "truncated": total > len(rows),
+    })
+
+
+def build_message(queued, connection=None):
+    message = EmailMultiAlternatives(
+        subject=queued.subject,
+        body=queued.body,
+        from_email=queued.from_email,  # None -> DEFAULT_FROM_EMAIL
+        to=[queued.to_email],
+        connection=connection,
+    )
+    if queued.html_body:
+        message.attach_alternative(queued.html_body, "text/html")
+    return message
+
+
+def retry_delay(attempts):
+    """Backoff before attempt number attempts + 1."""
+    return timedelta(seconds=min(BACKOFF_SECONDS * 2 ** (attempts - 1), MAX_BACKOFF_SECONDS))
+
+
+def claim_batch(batch_size=BATCH_SIZE):
+    """
+    Mark up to batch_size due messages as sending under a lease and return
+    them, with attempts counting this one. Rows are locked only while they
+    are claimed, with SKIP LOCKED where the database supports it.
+    """
+    now = timezone.now()
+    due = Q(status=QueuedEmail.STATUS_PENDING) | Q(status=QueuedEmail.STATUS_SENDING)
+    with transaction.atomic():
+        pks = list(
+            QueuedEmail.objects.select_for_update(skip_locked=True)
+            .filter(due, next_attempt_at__lte=now)
+            .order_by("next_attempt_at", "pk")
+            .values_list("pk", flat=True)[:batch_size]
+        )
+        if not pks:
+            return []
+        QueuedEmail.objects.filter(pk__in=pks).update(
+            status=QueuedEmail.STATUS_SENDING,
+            attempts=F("attempts") + 1,
+            next_attempt_at=now + timedelta(seconds=LEASE_SECONDS),
+        )
+    return list(QueuedEmail.objects.filter(pk__in=pks).order_by("pk"))
+
+
+def record_failure(queued, error, max_attempts):
+    queued.last_error = str(error)
+    if queued.attempts >= max_attempts:
+        queued.status = QueuedEmail.STATUS_FAILED
+    else:
+        queued.status = QueuedEmail.STATUS_PENDING
+        queued.next_attempt_at = timezone.now() + retry_delay(queued.attempts)
+
+
+def send_queued_batch(batch_size=BATCH_SIZE, max_attempts=MAX_ATTEMPTS):
+    """
+    Deliver up to batch_size due messages over one connection, outside any
+    transaction. Returns (sent, failed) counts for this batch; a failed
+    message, or every message of a batch whose connection failed to open,
+    is rescheduled until max_attempts.
+    """
+    batch = claim_batch(batch_size)
+    if not batch:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:
+        for queued in batch:
+            record_failure(queued, e, max_attempts)
+        failed = len(batch)
+    else:
+        try:
+            for queued in batch:
+                try:
+                    connection.send_messages([build_message(queued, connection)])
+                except Exception as e:
+                    failed += 1
+                    record_failure(queued, e, max_attempts)
+                else:
+                    sent += 1
+                    queued.status = QueuedEmail.STATUS_SENT
+                    queued.sent_at = timezone.now()
+                    queued.last_error = None
+        finally:
+            connection.close()
+
+    QueuedEmail.objects.bulk_update(batch, ["status", "next_attempt_at", "last_error", "sent_at"])
+    return sent, failed
@@ -0,0 +1,172 @@
+import io
+import json
+import platform
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from api.benchmark import compare, git_commit, sample_rows, summarize, tracker_payloads, write_sheet
+from api.datasets import active_allotments, publish_version, published_version_id
+from api.dimensions import decode_rows
+from api.models import DatasetVersion, NeetCounsellingSeatAllotmentTracker, UploadJob
+from api.prediction import LOOKUP_FIELDS, RESULT_FIELDS
+from api.upload_jobs import process_next_job
+
+
+ENDPOINTS = ("allotment_tracker", "group_categories", "group_categories_304", "user_data", "upload")
+
+
+class Command(BaseCommand):
+    help = ("Measure latency percentiles and throughput of the public endpoints (allotment_tracker/, "
+            "group-categories/, admin/user-data/ and upload-excel/) through the full request stack, "
+            "and write the results to a JSON file. Load data first with generate_allotments.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Requests per endpoint (default 500).")
+        parser.add_argument("--concurrency", type=int, default=1, help="Client threads (default 1).")
+        parser.add_argument("--uploads", type=int, default=3, help="Sheet uploads to time (default 3, 0 to skip).")
+        parser.add_argument("--upload-rows", type=int, default=20000)
+        parser.add_argument("--endpoints", nargs="+", choices=ENDPOINTS, default=list(ENDPOINTS))
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", default="benchmark-results.json")
+        parser.add_argument("--compare", help="Earlier results file to report changes against.")
+
+    def handle(self, *args, **options):
+        if published_version_id() is None:
+            raise CommandError("No published dataset. Run generate_allotments first.")
+        self.rng = random.Random(options["seed"])
+        self.options = options
+        self.staff = User.objects.filter(username="benchmark").first() or User.objects.create_user(
+            "benchmark", password=None, is_staff=True,
+        )
+
+        results = {}
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+            for name in options["endpoints"]:
+                if name == "upload" and not options["uploads"]:
+                    continue
+                results[name] = getattr(self, f"bench_{name}")()
+                self.stdout.write(f"{name:22} {results[name]}")
+
+        report = {
+            "commit": git_commit(),
+            "created_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "allotment_rows": active_allotments().count(),
+            "tracker_rows": NeetCounsellingSeatAllotmentTracker.objects.count(),
+            "options": {key: options[key] for key in ("requests", "concurrency", "uploads", "upload_rows", "seed")},
+            "endpoints": results,
+        }
+        with open(options["output"], "w") as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+        if options["compare"]:
+            with open(options["compare"]) as f:
+                changes = compare(json.load(f), report)
+            for name, deltas in changes.items():
+                self.stdout.write(f"{name:22} " + ", ".join(f"{k} {v:+.1f}%" for k, v in deltas.items()))
+
+    def run(self, requests, concurrency=None):
+        """Time `requests` (callables taking a Client) and summarize them; any non-2xx/304 is an error."""
+        concurrency = concurrency or self.options["concurrency"]
+        local = threading.local()  # one logged-in Client per thread
+
+        def timed(request):
+            if not hasattr(local, "client"):
+                local.client = Client()
+                local.client.force_login(self.staff)
+            started = time.perf_counter()
+            response = request(local.client)
+            if hasattr(response, "streaming_content"):
+                for _ in response.streaming_content:
+                    pass
+            return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        if concurrency == 1:
+            outcomes = [timed(request) for request in requests]
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                outcomes = list(pool.map(timed, requests))
+        wall = time.perf_counter() - started
+
+        summary = summarize([seconds for seconds, _ in outcomes], wall)
+        summary["errors"] = sum(1 for _, code in outcomes if code >= 400)
+        return summary
+
+    def bench_allotment_tracker(self):
+        allotments = active_allotments().values(*RESULT_FIELDS)
+        sample = decode_rows(sample_rows(self.rng, allotments, self.options["requests"]))
+        payloads = tracker_payloads(self.rng, sample, LOOKUP_FIELDS)
+        url = reverse("allotment-tracker")
+        return self.run([
+            lambda client, payload=payload: client.post(url, payload, content_type="application/json")
+            for payload in payloads
+        ])
+
+    def bench_group_categories(self):
+        url = reverse("group-categories-list")
+        return self.run([lambda client: client.get(url)] * self.options["requests"])
+
+    def bench_group_categories_304(self):
+        url = reverse("group-categories-list")
+        etag = Client().get(url)["ETag"]
+        return self.run([lambda client: client.get(url, HTTP_IF_NONE_MATCH=etag)] * self.options["requests"])
+
+    def bench_user_data(self):
+        url = reverse("admin_get_all_tracker_data")
+        leads = NeetCounsellingSeatAllotmentTracker.objects.all()
+        last = leads.aggregate(last=Max("seqno"))["last"]
+        names = [row["name"] for row in sample_rows(self.rng, leads.values("seqno", "name"), 50, pk="seqno")]
+        requests = []
+        for _ in range(self.options["requests"]):
+            kind = self.rng.random()
+            if kind < 0.5:
+                params = {"after": self.rng.randint(0, last or 0), "page_size": 100}
+            elif kind < 0.8 and names:
+                params = {"search": self.rng.choice(names), "after": 0}
+            else:
+                params = {"page": self.rng.randint(1, 50), "page_size": 100}
+            requests.append(lambda client, params=params: client.get(url, params))
+        return self.run(requests)
+
+    def bench_upload(self):
+        """
+        Upload synthetic sheets and load each through the upload job queue, then
+        publish the benchmark dataset again.
+        """
+        previous = DatasetVersion.objects.get(pk=published_version_id())
+        url = reverse("neet-excel-upload")
+        sheets = []
+        for i in range(self.options["uploads"]):
+            buffer = io.StringIO()
+            write_sheet(buffer, self.options["upload_rows"], [2024], seed=self.options["seed"] + i)
+            sheets.append(buffer.getvalue().encode())
+
+        def upload(client, body):
+            response = client.post(url, {"file": SimpleUploadedFile("bench.csv", body)})
+            if response.status_code != 202:
+                return response
+            job = process_next_job()
+            return SimpleNamespace(status_code=200 if job.status == UploadJob.STATUS_DONE else 500)
+
+        try:
+            summary = self.run([lambda client, body=body: upload(client, body) for body in sheets], concurrency=1)
+        finally:
+            publish_version(previous)
+        summary["rows_per_upload"] = self.options["upload_rows"]
+        return summary
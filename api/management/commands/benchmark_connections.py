@@ -0,0 +1,110 @@
+import json
+import platform
+import random
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection
+from django.db.backends.signals import connection_created
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from api.benchmark import git_commit, sample_rows, summarize, tracker_payloads
+from api.datasets import active_allotments, published_version_id
+from api.dimensions import decode_rows
+from api.prediction import LOOKUP_FIELDS, RESULT_FIELDS
+
+
+class Command(BaseCommand):
+    help = ("Time allotment_tracker/ requests with a new database connection per request (CONN_MAX_AGE=0) "
+            "and with persistent, health-checked connections, and report the connects and latency saved. "
+            "--connect-delay adds a simulated handshake to each connect, for running against a local "
+            "stand-in database (DB_ENGINE=seatpredictor.db.sqlite3).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500, help="Requests per mode (default 500).")
+        parser.add_argument("--conn-max-age", type=int, default=60, help="Max age in persistent mode (default 60).")
+        parser.add_argument("--connect-delay", type=float, default=0,
+                            help="Milliseconds added to every new connection (default 0).")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", default="benchmark-connections-results.json")
+
+    def handle(self, *args, **options):
+        if published_version_id() is None:
+            raise CommandError("No published dataset. Run generate_allotments first.")
+        rng = random.Random(options["seed"])
+        sample = decode_rows(sample_rows(rng, active_allotments().values(*RESULT_FIELDS), options["requests"]))
+        payloads = tracker_payloads(rng, sample, LOOKUP_FIELDS)
+        self.delay = options["connect_delay"] / 1000
+        self.connects = 0
+
+        connection_created.connect(self.connected)
+        results = {}
+        try:
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"]):
+                self.run(payloads, options["conn_max_age"], True)  # warm the engine and prediction cache
+                for mode, max_age, health_checks in (
+                    ("per_request", 0, False),
+                    ("persistent", options["conn_max_age"], True),
+                ):
+                    results[mode] = self.run(payloads, max_age, health_checks)
+                    self.stdout.write(f"{mode:12} {results[mode]}")
+        finally:
+            connection_created.disconnect(self.connected)
+
+        before, after = results["per_request"], results["persistent"]
+        savings = {
+            metric: round(before[metric] - after[metric], 3) for metric in ("mean_ms", "p50_ms", "p95_ms")
+        }
+        self.stdout.write("saved per request: " + ", ".join(f"{k} {v}" for k, v in savings.items()))
+        report = {
+            "commit": git_commit(),
+            "created_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "options": {key: options[key] for key in ("requests", "conn_max_age", "connect_delay", "seed")},
+            "modes": results,
+            "saved_ms": savings,
+        }
+        with open(options["output"], "w") as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def connected(self, **kwargs):
+        if self.delay:
+            time.sleep(self.delay)
+        self.connects += 1
+
+    def run(self, payloads, max_age, health_checks):
+        """
+        Send the payloads one after another, closing obsolete connections at
+        the start and end of each request as Django's request handler does
+        (the test client skips that).
+        """
+        url = reverse("allotment-tracker")
+        client = Client()
+        saved = {key: connection.settings_dict[key] for key in ("CONN_MAX_AGE", "CONN_HEALTH_CHECKS")}
+        connection.settings_dict.update(CONN_MAX_AGE=max_age, CONN_HEALTH_CHECKS=health_checks)
+        connection.close()
+        self.connects = 0
+        timings = []
+        try:
+            started = time.perf_counter()
+            for payload in payloads:
+                request_started = time.perf_counter()
+                close_old_connections()
+                response = client.post(url, payload, content_type="application/json")
+                close_old_connections()
+                timings.append(time.perf_counter() - request_started)
+                if response.status_code != 200:
+                    raise CommandError(f"allotment_tracker/ returned {response.status_code}")
+            wall = time.perf_counter() - started
+        finally:
+            connection.close()
+            connection.settings_dict.update(saved)
+
+        summary = summarize(timings, wall)
+        summary["connections"] = self.connects
+        return summary
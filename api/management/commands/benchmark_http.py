@@ -0,0 +1,169 @@
+import http.client
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+
+from api.benchmark import compare, git_commit, sample_rows, summarize, tracker_payloads
+from api.datasets import active_allotments, published_version_id
+from api.dimensions import decode_rows
+from api.prediction import LOOKUP_FIELDS, RESULT_FIELDS
+
+
+# Server command lines, run with this interpreter as `python -m ...`
+SERVERS = {
+    "wsgi": ["gunicorn", "seatpredictor.wsgi:application", "--bind", "{host}:{port}",
+             "--workers", "{workers}", "--threads", "{threads}"],
+    "asgi": ["uvicorn", "seatpredictor.asgi:application", "--host", "{host}", "--port", "{port}",
+             "--workers", "{workers}", "--no-access-log"],
+}
+ENDPOINTS = ("allotment_tracker", "group_categories")
+
+
+class Command(BaseCommand):
+    help = ("Start the project under gunicorn (WSGI, sync views) and uvicorn (ASGI, ASYNC_VIEWS=1) in "
+            "turn, load allotment_tracker/ and group-categories/ over HTTP from concurrent clients and "
+            "compare latency percentiles and throughput. Needs gunicorn and uvicorn installed; load data "
+            "first with generate_allotments.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--servers", nargs="+", choices=SERVERS, default=list(SERVERS))
+        parser.add_argument("--requests", type=int, default=1000, help="Requests per endpoint (default 1000).")
+        parser.add_argument("--concurrency", type=int, default=32, help="Client connections (default 32).")
+        parser.add_argument("--workers", type=int, default=2, help="Server processes (default 2).")
+        parser.add_argument("--threads", type=int, default=8, help="Threads per gunicorn worker (default 8).")
+        parser.add_argument("--lead-share", type=float, default=0.1,
+                            help="Share of allotment_tracker/ requests that carry a lead (default 0.1).")
+        parser.add_argument("--host", default="127.0.0.1")
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", default="benchmark-http-results.json")
+
+    def handle(self, *args, **options):
+        if published_version_id() is None:
+            raise CommandError("No published dataset. Run generate_allotments first.")
+        self.options = options
+        rng = random.Random(options["seed"])
+        sample = decode_rows(sample_rows(rng, active_allotments().values(*RESULT_FIELDS), options["requests"]))
+        payloads = tracker_payloads(rng, sample, LOOKUP_FIELDS)
+        for i, payload in enumerate(payloads):
+            if rng.random() < options["lead_share"]:
+                payload.update(name=f"Benchmark {i}", email=f"benchmark{i}@example.com")
+        requests = {
+            "allotment_tracker": [("POST", reverse("allotment-tracker"), json.dumps(p)) for p in payloads],
+            "group_categories": [("GET", reverse("group-categories-list"), None)] * options["requests"],
+        }
+
+        results = {}
+        for server in options["servers"]:
+            with self.serve(server):
+                results[server] = {"endpoints": {}}
+                for name in ENDPOINTS:
+                    self.load(requests[name][:options["concurrency"]])  # warm caches and the engine
+                    summary = self.load(requests[name])
+                    results[server]["endpoints"][name] = summary
+                    self.stdout.write(f"{server:5} {name:18} {summary}")
+
+        report = {
+            "commit": git_commit(),
+            "created_at": timezone.now().isoformat(),
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "options": {key: options[key] for key in
+                        ("requests", "concurrency", "workers", "threads", "lead_share", "seed")},
+            "servers": results,
+        }
+        if "wsgi" in results and "asgi" in results:
+            report["asgi_vs_wsgi"] = compare(results["wsgi"], results["asgi"])
+            for name, deltas in report["asgi_vs_wsgi"].items():
+                self.stdout.write(f"asgi vs wsgi {name:18} " + ", ".join(f"{k} {v:+.1f}%" for k, v in deltas.items()))
+        with open(options["output"], "w") as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
+
+    def serve(self, server):
+        options = self.options
+        command = [sys.executable, "-m"] + [
+            part.format(**options) for part in SERVERS[server]
+        ]
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        env["ASYNC_VIEWS"] = "1" if server == "asgi" else ""
+        return Server(command, env, options["host"], options["port"])
+
+    def load(self, requests):
+        """Send `requests` ((method, path, body) tuples) over keep-alive connections and summarize them."""
+        local = threading.local()
+        host, port = self.options["host"], self.options["port"]
+
+        def send(request):
+            method, path, body = request
+            if not hasattr(local, "connection"):
+                local.connection = http.client.HTTPConnection(host, port, timeout=60)
+            headers = {"Content-Type": "application/json"} if body else {}
+            started = time.perf_counter()
+            try:
+                local.connection.request(method, path, body, headers)
+                response = local.connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                local.connection.close()
+                status = 599
+            return time.perf_counter() - started, status
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.options["concurrency"]) as pool:
+            outcomes = list(pool.map(send, requests))
+        wall = time.perf_counter() - started
+
+        summary = summarize([seconds for seconds, _ in outcomes], wall)
+        summary["errors"] = sum(1 for _, status in outcomes if status >= 400)
+        return summary
+
+
+class Server:
+    """A server subprocess for the duration of a with block."""
+
+    def __init__(self, command, env, host, port, startup_timeout=60):
+        self.command = command
+        self.env = env
+        self.host = host
+        self.port = port
+        self.startup_timeout = startup_timeout
+        self.process = None
+
+    def __enter__(self):
+        self.process = subprocess.Popen(
+            self.command, env=self.env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + self.startup_timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise CommandError(f"{' '.join(self.command)} exited with {self.process.returncode}")
+            try:
+                socket.create_connection((self.host, self.port), timeout=1).close()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.__exit__()
+        raise CommandError(f"{' '.join(self.command)} did not start within {self.startup_timeout}s")
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
@@ -0,0 +1,76 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import summarize
+from api.datasets import active_allotments, published_state
+from api.dimensions import decode_rows, dimension_names
+from api.engine import RankIndex
+from api.prediction import (
+    DEFAULT_PAGE_SIZE, LOOKUP_FIELDS, RESULT_FIELDS, ROW_FIELDS, load_engine_rows, orm_result,
+)
+
+
+# Filter combinations sampled for the benchmark, as subsets of LOOKUP_FIELDS model fields
+COMBINATIONS = [
+    (),
+    ("allotment_category",),
+    ("allotment_category", "qualifying_group_or_course"),
+    ("allotment_category", "qualifying_group_or_course", "state"),
+    ("allotment_category", "qualifying_group_or_course", "speciality"),
+    tuple(field for _, field in LOOKUP_FIELDS),
+]
+
+
+class Command(BaseCommand):
+    help = ("Compare the in-memory prediction engine against the ORM query path on the published dataset. "
+            "Each sample fetches the total count and the first page, as allotment_tracker/ does.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=200, help="Number of sampled predictions (default 200).")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        version_id, generation = published_state()
+        if version_id is None:
+            raise CommandError("No published dataset. Upload a sheet first.")
+
+        rng = random.Random(options["seed"])
+        active = active_allotments(version_id)
+        sample = decode_rows(list(active.values(*RESULT_FIELDS).order_by("?")[: options["requests"]]))
+        if not sample:
+            raise CommandError("The published dataset has no active rows.")
+
+        started = time.perf_counter()
+        index = RankIndex.build(version_id, generation, ROW_FIELDS, load_engine_rows(version_id), dimension_names)
+        build_seconds = time.perf_counter() - started
+        self.stdout.write(f"Built index over {len(index)} rows in {build_seconds:.2f}s")
+
+        orm_timings, engine_timings = [], []
+        for row in sample:
+            fields = rng.choice(COMBINATIONS)
+            lookups = {field: str(row[field]).lower() for field in fields}
+            rank_no = max(row["rank_no"] - rng.randint(0, 5000), 0)
+
+            started = time.perf_counter()
+            orm = orm_result(version_id, lookups, rank_no)
+            orm_count, orm_page = orm.count(), orm.page(None, DEFAULT_PAGE_SIZE)
+            orm_timings.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            engine = index.search(lookups, rank_no)
+            engine_count, engine_page = engine.count(), engine.page(None, DEFAULT_PAGE_SIZE)
+            engine_timings.append(time.perf_counter() - started)
+
+            if orm_count != engine_count or orm_page != engine_page:
+                raise CommandError(f"Result mismatch for {lookups} rank>={rank_no}: "
+                                   f"ORM {orm_count} rows, engine {engine_count} rows")
+
+        orm, engine = summarize(orm_timings), summarize(engine_timings)
+        self.stdout.write(f"ORM     {orm}")
+        self.stdout.write(f"Engine  {engine}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Engine speedup: {orm['mean_ms'] / engine['mean_ms']:.1f}x mean, "
+            f"{orm['p95_ms'] / engine['p95_ms']:.1f}x p95 over {len(sample)} requests"
+        ))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from api.datasets import GC_BATCH_SIZE, collect_versions
+
+
+class Command(BaseCommand):
+    help = "Delete retired and failed allotment dataset versions in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep", type=int, default=1,
+                            help="Number of recently retired versions to keep for rollback (default 1).")
+        parser.add_argument("--batch-size", type=int, default=GC_BATCH_SIZE,
+                            help=f"Rows deleted per statement (default {GC_BATCH_SIZE}).")
+
+    def handle(self, *args, **options):
+        deleted = collect_versions(keep=options["keep"], batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} allotment rows."))
@@ -0,0 +1,68 @@
+import os
+import tempfile
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from api.admin.ingest import ingest_allotments
+from api.benchmark import ALLOTTED_CATEGORIES, COURSES, STATES, write_sheet
+from api.group_categories import invalidate_group_categories
+from api.models import GroupCategory, NeetCounsellingSeatAllotmentTracker
+from api.tracker_stats import rebuild_tracker_stats
+
+
+class Command(BaseCommand):
+    help = ("Load a synthetic multi-year allotment dataset (through the normal upload path), plus "
+            "group dropdown entries and tracker leads, for benchmarking.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1000000, help="Allotment rows (default 1,000,000).")
+        parser.add_argument("--years", type=int, nargs="+", default=[2022, 2023, 2024])
+        parser.add_argument("--leads", type=int, default=100000, help="Tracker rows (default 100,000).")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--sheet", help="Also keep the generated CSV sheet at this path.")
+
+    def handle(self, *args, **options):
+        path = options["sheet"] or tempfile.mkstemp(suffix=".csv")[1]
+        try:
+            with open(path, "w", newline="") as sheet:
+                write_sheet(sheet, options["rows"], options["years"], options["seed"])
+            self.stdout.write(f"Wrote {options['rows']} rows to {path}")
+
+            with open(path, "rb") as sheet:
+                stats = ingest_allotments(sheet)
+            self.stdout.write(f"Loaded dataset version {stats['dataset_version']}: {stats}")
+        finally:
+            if not options["sheet"]:
+                os.remove(path)
+
+        GroupCategory.objects.bulk_create(
+            [GroupCategory(group_name=course, category_type=category)
+             for course in COURSES for category in ALLOTTED_CATEGORIES],
+            ignore_conflicts=True,
+        )
+        invalidate_group_categories()
+
+        self.create_leads(options["leads"], options["seed"])
+        self.stdout.write(self.style.SUCCESS("Synthetic dataset ready."))
+
+    def create_leads(self, count, seed, batch_size=5000):
+        rng = np.random.default_rng(seed)
+        start = NeetCounsellingSeatAllotmentTracker.objects.count()
+        for offset in range(0, count, batch_size):
+            n = min(batch_size, count - offset)
+            NeetCounsellingSeatAllotmentTracker.objects.bulk_create([
+                NeetCounsellingSeatAllotmentTracker(
+                    name=f"Student {start + offset + i}",
+                    email=f"student{start + offset + i}@example.com",
+                    phone_number=f"9{rng.integers(100000000, 999999999)}",
+                    rank_no=int(rng.integers(1, 250000)),
+                    state=STATES[rng.integers(0, len(STATES))],
+                    allotment_category="NEET_PG",
+                    qualifying_group_or_course=COURSES[rng.integers(0, len(COURSES))],
+                    category=ALLOTTED_CATEGORIES[rng.integers(0, len(ALLOTTED_CATEGORIES))],
+                )
+                for i in range(n)
+            ])
+        rebuild_tracker_stats()
+        self.stdout.write(f"Created {count} tracker leads")
@@ -0,0 +1,29 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.upload_jobs import job_status, process_next_job
+
+
+class Command(BaseCommand):
+    help = "Load queued allotment sheet uploads one at a time, recording progress on each job."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Drain the queued jobs once and exit.")
+        parser.add_argument("--interval", type=float, default=5.0,
+                            help="Seconds to sleep when the queue is empty (default 5).")
+
+    def handle(self, *args, **options):
+        while True:
+            job = process_next_job()
+            if job is not None:
+                status = job_status(job)
+                self.stdout.write(
+                    f"Job {job.pk} {job.status}: {status['rows_done']} rows, "
+                    f"{status['error_rows']} error rows, {status['rows_per_second']} rows/s"
+                    + (f" ({job.error})" if job.error else "")
+                )
+            elif options["once"]:
+                return
+            else:
+                time.sleep(options["interval"])
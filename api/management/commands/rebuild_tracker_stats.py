@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.tracker_stats import rebuild_tracker_stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the tracker statistics rollup (TrackerDailyStat) from the tracker table."
+
+    def handle(self, *args, **options):
+        rows = rebuild_tracker_stats()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {rows} tracker stat rows."))
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.mail import BATCH_SIZE, MAX_ATTEMPTS, send_queued_batch
+
+
+class Command(BaseCommand):
+    help = "Deliver queued emails in batches over one connection, retrying failures with backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Drain the due messages once and exit.")
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+        parser.add_argument("--max-attempts", type=int, default=MAX_ATTEMPTS)
+        parser.add_argument("--interval", type=float, default=5.0,
+                            help="Seconds to sleep when the queue is empty (default 5).")
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                sent, failed = send_queued_batch(options["batch_size"], options["max_attempts"])
+            except Exception as e:  # e.g. SMTP server unreachable; rows stay pending
+                self.stderr.write(f"Mail batch failed: {e}")
+                sent = failed = 0
+                if options["once"]:
+                    return
+                time.sleep(options["interval"])
+                continue
+
+            if sent or failed:
+                self.stdout.write(f"Sent {sent}, failed {failed}")
+            elif options["once"]:
+                return
+            else:
+                time.sleep(options["interval"])
@@ -0,0 +1,236 @@
+"""
+Per-request instrumentation.
+
+RequestMetricsMiddleware measures every request and labels it with the
+view that handled it. It records:
+- the number of database queries and the time spent in them, counted by a
+  connection execute wrapper;
+- serialization time, spent encoding response bodies in
+  renderers.dumps() (DRF responses, json_response()) and
+  renderers.JsonResponse, timed by serializing();
+- total latency.
+The numbers go out as a Server-Timing header and as one JSON log line on
+the "api.metrics" logger. They can also be added to an in-process
+histogram that admin/metrics/ serves in Prometheus text format.
+
+The current request's record lives in a context variable, so queries run
+by sync views under ASGI (in sync_to_async threads, which copy the
+context) are attributed to the right request.
+
+    REQUEST_METRICS = {
+        "SERVER_TIMING": True,
+        "LOG": True,
+        "HISTOGRAM": True,
+        "BUCKETS": (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    }
+"""
+import contextvars
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.dispatch import receiver
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+_current = contextvars.ContextVar("request_metrics", default=None)
+
+
+def metrics_config():
+    config = {"SERVER_TIMING": True, "LOG": True, "HISTOGRAM": True, "BUCKETS": DEFAULT_BUCKETS}
+    config.update(getattr(settings, "REQUEST_METRICS", {}))
+    return config
+
+
+class RequestRecord:
+    __slots__ = ("view", "started", "queries", "db_seconds", "serialize_seconds")
+
+    def __init__(self):
+        self.view = None
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serialize_seconds = 0.0
+
+
+def record_query(execute, sql, params, many, context):
+    """Connection execute wrapper counting queries of the current request."""
+    record = _current.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record.queries += 1
+        record.db_seconds += time.perf_counter() - started
+
+
+@contextmanager
+def serializing():
+    """Count the enclosed block as serialization time of the current request."""
+    record = _current.get()
+    if record is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record.serialize_seconds += time.perf_counter() - started
+
+
+@receiver(request_started)
+def _install_query_recorder(**kwargs):
+    # Sent from the thread that runs sync views (under ASGI too), whose
+    # connections are the ones to wrap.
+    for connection in connections.all():
+        if record_query not in connection.execute_wrappers:
+            connection.execute_wrappers.append(record_query)
+
+
+class Histogram:
+    """Request latency histogram per view, plus request and query counters, in Prometheus text format."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._views = {}     # view -> [bucket counts..., sum, count, queries, db_seconds]
+        self._statuses = {}  # (view, status) -> requests
+
+    def observe(self, view, status, seconds, queries, db_seconds):
+        with self._lock:
+            series = self._views.get(view)
+            if series is None:
+                series = self._views[view] = [0] * len(self.buckets) + [0.0, 0, 0, 0.0]
+            index = bisect_left(self.buckets, seconds)
+            if index < len(self.buckets):
+                series[index] += 1
+            n = len(self.buckets)
+            series[n] += seconds
+            series[n + 1] += 1
+            series[n + 2] += queries
+            series[n + 3] += db_seconds
+            self._statuses[(view, status)] = self._statuses.get((view, status), 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._views.clear()
+            self._statuses.clear()
+
+    def render(self):
+        n = len(self.buckets)
+        lines = [
+            "# HELP api_request_duration_seconds Request latency per view.",
+            "# TYPE api_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            views = {view: list(series) for view, series in self._views.items()}
+            statuses = dict(self._statuses)
+        for view, series in sorted(views.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'api_request_duration_seconds_bucket{{view="{view}",le="{bound}"}} {cumulative}')
+            lines.append(f'api_request_duration_seconds_bucket{{view="{view}",le="+Inf"}} {series[n + 1]}')
+            lines.append(f'api_request_duration_seconds_sum{{view="{view}"}} {series[n]:.6f}')
+            lines.append(f'api_request_duration_seconds_count{{view="{view}"}} {series[n + 1]}')
+
+        lines += ["# HELP api_requests_total Requests per view and status.", "# TYPE api_requests_total counter"]
+        for (view, status), count in sorted(statuses.items()):
+            lines.append(f'api_requests_total{{view="{view}",status="{status}"}} {count}')
+
+        lines += ["# HELP api_db_queries_total Database queries per view.", "# TYPE api_db_queries_total counter"]
+        lines += [f'api_db_queries_total{{view="{view}"}} {series[n + 2]}' for view, series in sorted(views.items())]
+        lines += ["# HELP api_db_seconds_total Database time per view.", "# TYPE api_db_seconds_total counter"]
+        lines += [f'api_db_seconds_total{{view="{view}"}} {series[n + 3]:.6f}' for view, series in sorted(views.items())]
+        return "\n".join(lines) + "\n"
+
+
+_histogram = None
+_histogram_lock = threading.Lock()
+
+
+def get_histogram():
+    global _histogram
+    if _histogram is None:
+        with _histogram_lock:
+            if _histogram is None:
+                _histogram = Histogram(metrics_config()["BUCKETS"])
+    return _histogram
+
+
+def view_label(view_func):
+    view = getattr(view_func, "view_class", None) or getattr(view_func, "cls", None) or view_func
+    return getattr(view, "__name__", type(view).__name__)
+
+
+class RequestMetricsMiddleware:
+    """Put first in MIDDLEWARE so total latency covers the rest of the stack."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.config = metrics_config()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        record = RequestRecord()
+        token = _current.set(record)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, record)
+
+    async def __acall__(self, request):
+        record = RequestRecord()
+        token = _current.set(record)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, record)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        record = _current.get()
+        if record is not None:
+            record.view = view_label(view_func)
+
+    def finish(self, request, response, record):
+        total = time.perf_counter() - record.started
+        view = record.view or "unresolved"
+        if self.config["SERVER_TIMING"]:
+            response["Server-Timing"] = ", ".join([
+                f'db;dur={record.db_seconds * 1000:.2f};desc="{record.queries} queries"',
+                f"serialize;dur={record.serialize_seconds * 1000:.2f}",
+                f"total;dur={total * 1000:.2f}",
+            ])
+        if self.config["LOG"]:
+            logger.info(json.dumps({
+                "view": view,
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "queries": record.queries,
+                "db_ms": round(record.db_seconds * 1000, 2),
+                "serialize_ms": round(record.serialize_seconds * 1000, 2),
+                "total_ms": round(total * 1000, 2),
+            }))
+        if self.config["HISTOGRAM"]:
+            get_histogram().observe(view, response.status_code, total, record.queries, record.db_seconds)
+        return response
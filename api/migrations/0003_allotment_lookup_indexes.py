@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:47
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0002_groupcategory"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="neetcounsellingseatallotment",
+            index=models.Index(fields=["rank_no"], name="seat_allot_rank_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="neetcounsellingseatallotment",
+            index=models.Index(
+                django.db.models.functions.text.Lower("allotment_category"),
+                django.db.models.functions.text.Lower("qualifying_group_or_course"),
+                django.db.models.functions.text.Lower("state"),
+                models.F("rank_no"),
+                name="seat_allot_course_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="neetcounsellingseatallotment",
+            index=models.Index(
+                django.db.models.functions.text.Lower("allotment_category"),
+                django.db.models.functions.text.Lower("speciality"),
+                django.db.models.functions.text.Lower("allotted_category"),
+                models.F("rank_no"),
+                name="seat_allot_speciality_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,153 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.utils import timezone
+
+
+def adopt_existing_rows(apps, schema_editor):
+    """Wrap rows loaded before versioning into a single published version."""
+    Allotment = apps.get_model("api", "NeetCounsellingSeatAllotment")
+    DatasetVersion = apps.get_model("api", "DatasetVersion")
+    PublishedDataset = apps.get_model("api", "PublishedDataset")
+
+    row_count = Allotment.objects.count()
+    if not row_count:
+        return
+    version = DatasetVersion.objects.create(
+        source_name="pre-versioning data",
+        status="published",
+        row_count=row_count,
+        published_at=timezone.now(),
+    )
+    Allotment.objects.update(dataset_version=version)
+    PublishedDataset.objects.create(id=1, version=version)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0003_allotment_lookup_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DatasetVersion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("source_name", models.CharField(blank=True, max_length=255)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("loading", "Loading"),
+                            ("ready", "Ready"),
+                            ("published", "Published"),
+                            ("retired", "Retired"),
+                            ("failed", "Failed"),
+                        ],
+                        default="loading",
+                        max_length=20,
+                    ),
+                ),
+                ("row_count", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("published_at", models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                "db_table": "allotment_dataset_version",
+            },
+        ),
+        migrations.CreateModel(
+            name="PublishedDataset",
+            fields=[
+                (
+                    "id",
+                    models.PositiveSmallIntegerField(
+                        default=1, primary_key=True, serialize=False
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "allotment_published_dataset",
+            },
+        ),
+        migrations.AddField(
+            model_name="publisheddataset",
+            name="version",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="+",
+                to="api.datasetversion",
+            ),
+        ),
+        migrations.AddField(
+            model_name="neetcounsellingseatallotment",
+            name="dataset_version",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="allotments",
+                to="api.datasetversion",
+            ),
+        ),
+        migrations.RunPython(adopt_existing_rows, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name="neetcounsellingseatallotment",
+            name="seat_allot_rank_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="neetcounsellingseatallotment",
+            name="seat_allot_course_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="neetcounsellingseatallotment",
+            name="seat_allot_speciality_idx",
+        ),
+        migrations.AddIndex(
+            model_name="neetcounsellingseatallotment",
+            index=models.Index(
+                fields=["dataset_version", "rank_no"], name="seat_allot_rank_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="neetcounsellingseatallotment",
+            index=models.Index(
+                models.F("dataset_version"),
+                django.db.models.functions.text.Lower("allotment_category"),
+                models.F("rank_no"),
+                name="seat_allot_category_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="neetcounsellingseatallotment",
+            index=models.Index(
+                models.F("dataset_version"),
+                django.db.models.functions.text.Lower("qualifying_group_or_course"),
+                django.db.models.functions.text.Lower("state"),
+                models.F("rank_no"),
+                name="seat_allot_course_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="neetcounsellingseatallotment",
+            index=models.Index(
+                models.F("dataset_version"),
+                django.db.models.functions.text.Lower("speciality"),
+                django.db.models.functions.text.Lower("allotted_category"),
+                models.F("rank_no"),
+                name="seat_allot_speciality_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0004_dataset_versions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="publisheddataset",
+            name="generation",
+            field=models.PositiveBigIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 4.2.30 on 2026-10-18 11:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db.models import Count, Max, Min
+
+SUMMARY_GROUP_FIELDS = (
+    "allotment_category",
+    "allotment_year",
+    "allotted_institute",
+    "state",
+    "qualifying_group_or_course",
+    "speciality",
+    "allotted_quota",
+    "allotted_category",
+)
+
+
+def build_published_summary(apps, schema_editor):
+    """Summarize the currently published dataset so summary mode works right away."""
+    Allotment = apps.get_model("api", "NeetCounsellingSeatAllotment")
+    AllotmentSummary = apps.get_model("api", "AllotmentSummary")
+    PublishedDataset = apps.get_model("api", "PublishedDataset")
+
+    pointer = PublishedDataset.objects.filter(pk=1).first()
+    if pointer is None:
+        return
+    groups = (
+        Allotment.objects.filter(dataset_version_id=pointer.version_id, is_active=True)
+        .values(*SUMMARY_GROUP_FIELDS)
+        .annotate(
+            opening_rank=Min("rank_no"),
+            closing_rank=Max("rank_no"),
+            seat_count=Count("id"),
+        )
+        .order_by()
+    )
+    AllotmentSummary.objects.bulk_create(
+        [
+            AllotmentSummary(dataset_version_id=pointer.version_id, **group)
+            for group in groups
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0005_published_dataset_generation"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AllotmentSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("allotment_category", models.CharField(max_length=255)),
+                ("allotment_year", models.PositiveIntegerField()),
+                ("allotted_institute", models.CharField(max_length=255)),
+                ("state", models.CharField(max_length=255)),
+                ("qualifying_group_or_course", models.CharField(max_length=255)),
+                ("speciality", models.CharField(max_length=255)),
+                ("allotted_quota", models.CharField(max_length=255)),
+                ("allotted_category", models.CharField(max_length=255)),
+                ("opening_rank", models.PositiveIntegerField()),
+                ("closing_rank", models.PositiveIntegerField()),
+                ("seat_count", models.PositiveIntegerField()),
+                (
+                    "dataset_version",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="summaries",
+                        to="api.datasetversion",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "neet_counselling_allotment_summary",
+                "indexes": [
+                    models.Index(
+                        fields=["dataset_version", "closing_rank"],
+                        name="allot_summary_rank_idx",
+                    ),
+                    models.Index(
+                        models.F("dataset_version"),
+                        django.db.models.functions.text.Lower(
+                            "qualifying_group_or_course"
+                        ),
+                        django.db.models.functions.text.Lower("state"),
+                        models.F("closing_rank"),
+                        name="allot_summary_course_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(build_published_summary, migrations.RunPython.noop),
+    ]
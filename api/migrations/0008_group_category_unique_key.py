@@ -0,0 +1,41 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:02
+
+from django.db import migrations, models
+import django.db.models.functions.text
+from django.db.models.functions import Lower
+
+
+def drop_duplicates(apps, schema_editor):
+    """Keep the oldest row of each case-insensitive (group_name, category_type)."""
+    GroupCategory = apps.get_model("api", "GroupCategory")
+    seen, duplicates = set(), []
+    rows = GroupCategory.objects.annotate(
+        group_key=Lower("group_name"), category_key=Lower("category_type")
+    ).order_by("pk")
+    for pk, group_key, category_key in rows.values_list(
+        "pk", "group_key", "category_key"
+    ):
+        if (group_key, category_key) in seen:
+            duplicates.append(pk)
+        else:
+            seen.add((group_key, category_key))
+    GroupCategory.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0007_queued_email"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="groupcategory",
+            constraint=models.UniqueConstraint(
+                django.db.models.functions.text.Lower("group_name"),
+                django.db.models.functions.text.Lower("category_type"),
+                name="group_category_unique_key",
+            ),
+        ),
+    ]
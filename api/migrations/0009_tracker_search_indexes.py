@@ -0,0 +1,30 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:03
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0008_group_category_unique_key"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="neetcounsellingseatallotmenttracker",
+            index=models.Index(
+                django.db.models.functions.text.Lower("name"), name="tracker_name_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="neetcounsellingseatallotmenttracker",
+            index=models.Index(
+                django.db.models.functions.text.Lower("email"), name="tracker_email_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="neetcounsellingseatallotmenttracker",
+            index=models.Index(models.F("phone_number"), name="tracker_phone_idx"),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:04
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+STAT_DIMENSIONS = ("allotment_category", "state", "category")
+
+
+def build_rollup(apps, schema_editor):
+    """Count the existing tracker rows into the new rollup."""
+    Tracker = apps.get_model("api", "NeetCounsellingSeatAllotmentTracker")
+    TrackerDailyStat = apps.get_model("api", "TrackerDailyStat")
+
+    counts = {}
+    leads = Tracker.objects.annotate(day=TruncDate("created_at"))
+    for dimension in STAT_DIMENSIONS:
+        for row in leads.values("day", dimension).annotate(n=Count("seqno")).order_by():
+            key = (row["day"], dimension, row[dimension] or "")
+            counts[key] = counts.get(key, 0) + row["n"]
+    TrackerDailyStat.objects.bulk_create(
+        [
+            TrackerDailyStat(day=day, dimension=dimension, value=value, count=n)
+            for (day, dimension, value), n in counts.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0009_tracker_search_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TrackerDailyStat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField()),
+                ("dimension", models.CharField(max_length=32)),
+                ("value", models.CharField(blank=True, default="", max_length=255)),
+                ("count", models.IntegerField(default=0)),
+            ],
+            options={
+                "db_table": "neet_counselling_tracker_daily_stat",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="trackerdailystat",
+            constraint=models.UniqueConstraint(
+                fields=("dimension", "day", "value"), name="tracker_stat_key"
+            ),
+        ),
+        migrations.RunPython(build_rollup, migrations.RunPython.noop),
+    ]
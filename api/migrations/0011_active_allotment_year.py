@@ -0,0 +1,133 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:06
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.functions.text
+from django.db.models import Count, Max, Min
+
+SUMMARY_GROUP_FIELDS = (
+    "allotment_category",
+    "allotment_year",
+    "allotted_institute",
+    "state",
+    "qualifying_group_or_course",
+    "speciality",
+    "allotted_quota",
+    "allotted_category",
+)
+
+
+def adopt_active_flags(apps, schema_editor):
+    """
+    Record the flagged year of each category per version (the latest one if
+    several were flagged) and summarize every year of the published version,
+    since summaries are no longer limited to active rows.
+    """
+    Allotment = apps.get_model("api", "NeetCounsellingSeatAllotment")
+    ActiveAllotmentYear = apps.get_model("api", "ActiveAllotmentYear")
+    AllotmentSummary = apps.get_model("api", "AllotmentSummary")
+    PublishedDataset = apps.get_model("api", "PublishedDataset")
+
+    flagged = (
+        Allotment.objects.filter(is_active=True, dataset_version__isnull=False)
+        .values("dataset_version_id", "allotment_category")
+        .annotate(year=Max("allotment_year"))
+        .order_by()
+    )
+    ActiveAllotmentYear.objects.bulk_create(
+        [
+            ActiveAllotmentYear(
+                dataset_version_id=row["dataset_version_id"],
+                allotment_category=row["allotment_category"],
+                allotment_year=row["year"],
+            )
+            for row in flagged
+        ]
+    )
+
+    pointer = PublishedDataset.objects.filter(pk=1).first()
+    if pointer is None:
+        return
+    AllotmentSummary.objects.filter(dataset_version_id=pointer.version_id).delete()
+    groups = (
+        Allotment.objects.filter(dataset_version_id=pointer.version_id)
+        .values(*SUMMARY_GROUP_FIELDS)
+        .annotate(
+            opening_rank=Min("rank_no"),
+            closing_rank=Max("rank_no"),
+            seat_count=Count("id"),
+        )
+        .order_by()
+    )
+    AllotmentSummary.objects.bulk_create(
+        [
+            AllotmentSummary(dataset_version_id=pointer.version_id, **group)
+            for group in groups
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0010_tracker_daily_stat"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ActiveAllotmentYear",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("allotment_category", models.CharField(max_length=255)),
+                ("allotment_year", models.PositiveIntegerField()),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "neet_counselling_active_year",
+            },
+        ),
+        migrations.AddField(
+            model_name="activeallotmentyear",
+            name="dataset_version",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="active_years",
+                to="api.datasetversion",
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="activeallotmentyear",
+            constraint=models.UniqueConstraint(
+                fields=("dataset_version", "allotment_category"),
+                name="active_year_category_key",
+            ),
+        ),
+        migrations.RunPython(adopt_active_flags, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name="neetcounsellingseatallotment",
+            name="seat_allot_category_idx",
+        ),
+        migrations.RemoveField(
+            model_name="neetcounsellingseatallotment",
+            name="is_active",
+        ),
+        migrations.AddIndex(
+            model_name="neetcounsellingseatallotment",
+            index=models.Index(
+                models.F("dataset_version"),
+                django.db.models.functions.text.Lower("allotment_category"),
+                models.F("allotment_year"),
+                models.F("rank_no"),
+                name="seat_allot_cat_year_idx",
+            ),
+        ),
+    ]
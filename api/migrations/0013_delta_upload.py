@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0012_upload_job"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="neetcounsellingseatallotment",
+            name="row_hash",
+            field=models.CharField(blank=True, default="", max_length=32),
+        ),
+        migrations.AddField(
+            model_name="uploadjob",
+            name="mode",
+            field=models.CharField(
+                choices=[("full", "Full"), ("delta", "Delta")],
+                default="full",
+                max_length=10,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="neetcounsellingseatallotment",
+            index=models.Index(
+                fields=["dataset_version", "row_hash"], name="seat_allot_hash_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0013_delta_upload"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AllotmentDimension",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("field", models.CharField(max_length=32)),
+                ("name", models.CharField(max_length=255)),
+            ],
+            options={
+                "db_table": "allotment_dimension",
+                "indexes": [
+                    models.Index(
+                        fields=["field", "name"], name="allotment_dimension_name_idx"
+                    )
+                ],
+            },
+        ),
+    ]
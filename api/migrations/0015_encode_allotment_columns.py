@@ -0,0 +1,121 @@
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Subquery
+
+DIMENSION_FIELDS = (
+    "allotted_quota",
+    "allotted_institute",
+    "state",
+    "qualifying_group_or_course",
+    "speciality",
+    "allotted_category",
+    "candidate_category",
+)
+
+
+def encode_columns(apps, schema_editor):
+    """
+    Add one dimension row per distinct value of each column and point the
+    allotments at it, with one UPDATE per column. The subquery uses the
+    allotment_dimension index, which is why the table is created by the
+    previous migration: indexes are only built when a migration ends.
+    Values are compared by the database here, so under a case-insensitive
+    collation names that differ only in case share the first one stored.
+    """
+    Allotment = apps.get_model("api", "NeetCounsellingSeatAllotment")
+    AllotmentDimension = apps.get_model("api", "AllotmentDimension")
+
+    for field in DIMENSION_FIELDS:
+        names = Allotment.objects.values_list(field, flat=True).distinct().order_by()
+        AllotmentDimension.objects.bulk_create(
+            [AllotmentDimension(field=field, name=name) for name in sorted(set(names))],
+            batch_size=1000,
+        )
+        dimension = AllotmentDimension.objects.filter(field=field, name=OuterRef(field))
+        Allotment.objects.update(
+            **{f"{field}_key": Subquery(dimension.values("pk")[:1])}
+        )
+
+
+def dimension_key(null):
+    return models.ForeignKey(
+        db_index=False,
+        null=null,
+        on_delete=django.db.models.deletion.PROTECT,
+        related_name="+",
+        to="api.allotmentdimension",
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0014_allotment_dimensions"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="neetcounsellingseatallotment",
+            name="seat_allot_course_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="neetcounsellingseatallotment",
+            name="seat_allot_speciality_idx",
+        ),
+        *[
+            migrations.AddField(
+                model_name="neetcounsellingseatallotment",
+                name=f"{field}_key",
+                field=dimension_key(null=True),
+            )
+            for field in DIMENSION_FIELDS
+        ],
+        migrations.RunPython(encode_columns, migrations.RunPython.noop),
+        *[
+            migrations.RemoveField(
+                model_name="neetcounsellingseatallotment",
+                name=field,
+            )
+            for field in DIMENSION_FIELDS
+        ],
+        *[
+            migrations.RenameField(
+                model_name="neetcounsellingseatallotment",
+                old_name=f"{field}_key",
+                new_name=field,
+            )
+            for field in DIMENSION_FIELDS
+        ],
+        *[
+            migrations.AlterField(
+                model_name="neetcounsellingseatallotment",
+                name=field,
+                field=dimension_key(null=False),
+            )
+            for field in DIMENSION_FIELDS
+        ],
+        migrations.AddIndex(
+            model_name="neetcounsellingseatallotment",
+            index=models.Index(
+                fields=[
+                    "dataset_version",
+                    "qualifying_group_or_course",
+                    "state",
+                    "rank_no",
+                ],
+                name="seat_allot_course_key_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="neetcounsellingseatallotment",
+            index=models.Index(
+                fields=[
+                    "dataset_version",
+                    "speciality",
+                    "allotted_category",
+                    "rank_no",
+                ],
+                name="seat_allot_speciality_key_idx",
+            ),
+        ),
+    ]
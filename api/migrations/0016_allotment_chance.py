@@ -0,0 +1,120 @@
+# Generated by Django 4.2.30 on 2026-10-18 12:54
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+CHANCE_KEY_FIELDS = (
+    "allotment_category",
+    "allotted_institute",
+    "state",
+    "qualifying_group_or_course",
+    "speciality",
+    "allotted_quota",
+    "allotted_category",
+)
+
+
+def trend(points):
+    """Least-squares slope of closing rank per year."""
+    n = len(points)
+    sx = sum(x for x, _ in points)
+    sy = sum(y for _, y in points)
+    denominator = n * sum(x * x for x, _ in points) - sx * sx
+    if denominator <= 0:
+        return 0.0
+    return round((n * sum(x * y for x, y in points) - sx * sy) / denominator, 1)
+
+
+def build_published_chances(apps, schema_editor):
+    """Compute the chances of the currently published dataset so chance mode works right away."""
+    AllotmentSummary = apps.get_model("api", "AllotmentSummary")
+    AllotmentChance = apps.get_model("api", "AllotmentChance")
+    PublishedDataset = apps.get_model("api", "PublishedDataset")
+
+    pointer = PublishedDataset.objects.filter(pk=1).first()
+    if pointer is None or pointer.version_id is None:
+        return
+    years = {}
+    rows = AllotmentSummary.objects.filter(
+        dataset_version_id=pointer.version_id
+    ).values_list(*CHANCE_KEY_FIELDS, "allotment_year", "closing_rank")
+    for *key, year, closing_rank in rows.iterator():
+        years.setdefault(tuple(key), {})[year] = closing_rank
+
+    chances = []
+    for key, ranks in years.items():
+        first_year = min(ranks)
+        chances.append(
+            AllotmentChance(
+                dataset_version_id=pointer.version_id,
+                **dict(zip(CHANCE_KEY_FIELDS, key)),
+                closing_ranks={str(year): ranks[year] for year in sorted(ranks)},
+                first_year=first_year,
+                last_year=max(ranks),
+                year_count=len(ranks),
+                min_closing_rank=min(ranks.values()),
+                max_closing_rank=max(ranks.values()),
+                latest_closing_rank=ranks[max(ranks)],
+                closing_rank_trend=trend(
+                    [(year - first_year, rank) for year, rank in ranks.items()]
+                ),
+            )
+        )
+    AllotmentChance.objects.bulk_create(chances, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0015_encode_allotment_columns"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="AllotmentChance",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("allotment_category", models.CharField(max_length=255)),
+                ("allotted_institute", models.CharField(max_length=255)),
+                ("state", models.CharField(max_length=255)),
+                ("qualifying_group_or_course", models.CharField(max_length=255)),
+                ("speciality", models.CharField(max_length=255)),
+                ("allotted_quota", models.CharField(max_length=255)),
+                ("allotted_category", models.CharField(max_length=255)),
+                ("closing_ranks", models.JSONField()),
+                ("first_year", models.PositiveIntegerField()),
+                ("last_year", models.PositiveIntegerField()),
+                ("year_count", models.PositiveIntegerField()),
+                ("min_closing_rank", models.PositiveIntegerField()),
+                ("max_closing_rank", models.PositiveIntegerField()),
+                ("latest_closing_rank", models.PositiveIntegerField()),
+                ("closing_rank_trend", models.FloatField()),
+                (
+                    "dataset_version",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="chances",
+                        to="api.datasetversion",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "neet_counselling_allotment_chance",
+                "indexes": [
+                    models.Index(
+                        fields=["dataset_version", "allotment_category"],
+                        name="allot_chance_category_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(build_published_chances, migrations.RunPython.noop),
+    ]
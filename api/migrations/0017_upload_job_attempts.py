@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0016_allotment_chance"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="uploadjob",
+            name="attempts",
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:12
+
+from django.db import migrations, models
+
+
+def create_state(apps, schema_editor):
+    GroupCategoryState = apps.get_model("api", "GroupCategoryState")
+    GroupCategoryState.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0018_queued_email_sending"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GroupCategoryState",
+            fields=[
+                (
+                    "id",
+                    models.PositiveSmallIntegerField(
+                        default=1, primary_key=True, serialize=False
+                    ),
+                ),
+                ("generation", models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                "db_table": "group_category_state",
+            },
+        ),
+        migrations.RunPython(create_state, migrations.RunPython.noop),
+    ]
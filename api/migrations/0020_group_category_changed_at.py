@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 13:29
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0019_group_category_state"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="groupcategorystate",
+            name="changed_at",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -1,4 +1,7 @@
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Lower
+from django.utils import timezone
 
 class NeetCounsellingSeatAllotmentTracker(models.Model):
     seqno = models.AutoField(primary_key=True)
@@ -17,34 +20,346 @@ class NeetCounsellingSeatAllotmentTracker(models.Model):
 
     class Meta:
         db_table = "NEET_COUNSELLING_SEAT_ALLOTMENT_TRACKER" 
+        indexes = [
+            # Prefix search of admin/user-data/ (see api/admin/user_data.py)
+            models.Index(Lower("name"), name="tracker_name_idx"),
+            models.Index(Lower("email"), name="tracker_email_idx"),
+            models.Index("phone_number", name="tracker_phone_idx"),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.rank_no})"
 
 
+class DatasetVersion(models.Model):
+    """One uploaded allotment sheet. Rows are loaded into a version, then published."""
+    STATUS_LOADING = "loading"
+    STATUS_READY = "ready"
+    STATUS_PUBLISHED = "published"
+    STATUS_RETIRED = "retired"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_LOADING, "Loading"),
+        (STATUS_READY, "Ready"),
+        (STATUS_PUBLISHED, "Published"),
+        (STATUS_RETIRED, "Retired"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    source_name = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_LOADING)
+    row_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    published_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = "allotment_dataset_version"
+
+    def __str__(self):
+        return f"v{self.pk} ({self.status})"
+
+
+class PublishedDataset(models.Model):
+    """
+    Single-row pointer to the DatasetVersion that readers query. generation is
+    bumped on every data change (publish, year switch) so per-worker caches
+    keyed on it never serve stale results.
+    """
+    POINTER_ID = 1
+
+    id = models.PositiveSmallIntegerField(primary_key=True, default=POINTER_ID)
+    version = models.ForeignKey(DatasetVersion, on_delete=models.PROTECT, related_name="+")
+    generation = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "allotment_published_dataset"
+
+
+class AllotmentDimension(models.Model):
+    """One distinct value of a dictionary-encoded allotment column; see api.dimensions."""
+    field = models.CharField(max_length=32)
+    name = models.CharField(max_length=255)
+
+    class Meta:
+        db_table = "allotment_dimension"
+        indexes = [
+            models.Index(fields=["field", "name"], name="allotment_dimension_name_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.field}: {self.name}"
+
+
 class NeetCounsellingSeatAllotment(models.Model):
+    dataset_version = models.ForeignKey(
+        DatasetVersion, on_delete=models.CASCADE, related_name="allotments", blank=True, null=True
+    )
     allotment_category = models.CharField(max_length=255)
     allotment_year = models.PositiveIntegerField()
     rank_no = models.PositiveIntegerField()
+    # Repeated text columns, dictionary-encoded (see api.dimensions). Dimension rows
+    # are never deleted and the filter indexes below lead with the filtered ones,
+    # so the keys get no index of their own.
+    allotted_quota = models.ForeignKey(AllotmentDimension, on_delete=models.PROTECT, related_name="+", db_index=False)
+    allotted_institute = models.ForeignKey(AllotmentDimension, on_delete=models.PROTECT, related_name="+", db_index=False)
+    state = models.ForeignKey(AllotmentDimension, on_delete=models.PROTECT, related_name="+", db_index=False)
+    qualifying_group_or_course = models.ForeignKey(AllotmentDimension, on_delete=models.PROTECT, related_name="+", db_index=False)
+    speciality = models.ForeignKey(AllotmentDimension, on_delete=models.PROTECT, related_name="+", db_index=False)
+    allotted_category = models.ForeignKey(AllotmentDimension, on_delete=models.PROTECT, related_name="+", db_index=False)
+    candidate_category = models.ForeignKey(AllotmentDimension, on_delete=models.PROTECT, related_name="+", db_index=False)
+    remarks = models.TextField(blank=True, null=True)
+    # Content hash of the business columns, compared by delta uploads (see api.admin.ingest)
+    row_hash = models.CharField(max_length=32, blank=True, default="")
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "neet_counselling_seat_allotment"
+        # Match the allotment_tracker/ filter path (see api.prediction): the published
+        # dataset version, equality on LOWER(allotment_category) or on the dimension
+        # ids of the other categorical columns, then a range on rank_no. A category
+        # filter is pre-resolved to that category's active year (see
+        # ActiveAllotmentYear), so the category index carries allotment_year too.
+        indexes = [
+            models.Index(fields=["dataset_version", "rank_no"], name="seat_allot_rank_idx"),
+            models.Index(
+                F("dataset_version"),
+                Lower("allotment_category"),
+                F("allotment_year"),
+                F("rank_no"),
+                name="seat_allot_cat_year_idx",
+            ),
+            models.Index(
+                fields=["dataset_version", "qualifying_group_or_course", "state", "rank_no"],
+                name="seat_allot_course_key_idx",
+            ),
+            models.Index(
+                fields=["dataset_version", "speciality", "allotted_category", "rank_no"],
+                name="seat_allot_speciality_key_idx",
+            ),
+            models.Index(fields=["dataset_version", "row_hash"], name="seat_allot_hash_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.rank_no} - {self.allotted_institute.name}"
+    
+
+
+class ActiveAllotmentYear(models.Model):
+    """
+    The allotment_year shown for one allotment_category of a dataset version.
+    Rows of other years stay in the version but are not served; switching
+    years is a write to this one row (see api.datasets.set_active_year).
+    """
+    dataset_version = models.ForeignKey(DatasetVersion, on_delete=models.CASCADE, related_name="active_years")
+    allotment_category = models.CharField(max_length=255)
+    allotment_year = models.PositiveIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "neet_counselling_active_year"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dataset_version", "allotment_category"], name="active_year_category_key"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.allotment_category}: {self.allotment_year}"
+
+
+class AllotmentSummary(models.Model):
+    """
+    Closing-rank summary of the allotments of a dataset version: one row per
+    institute/speciality/quota/category/year. Built by api.summary when an
+    upload is loaded; reads keep only the active year of each category.
+    """
+    dataset_version = models.ForeignKey(DatasetVersion, on_delete=models.CASCADE, related_name="summaries")
+    allotment_category = models.CharField(max_length=255)
+    allotment_year = models.PositiveIntegerField()
+    allotted_institute = models.CharField(max_length=255)
+    state = models.CharField(max_length=255)
+    qualifying_group_or_course = models.CharField(max_length=255)
+    speciality = models.CharField(max_length=255)
     allotted_quota = models.CharField(max_length=255)
+    allotted_category = models.CharField(max_length=255)
+    opening_rank = models.PositiveIntegerField()
+    closing_rank = models.PositiveIntegerField()
+    seat_count = models.PositiveIntegerField()
+
+    class Meta:
+        db_table = "neet_counselling_allotment_summary"
+        indexes = [
+            models.Index(fields=["dataset_version", "closing_rank"], name="allot_summary_rank_idx"),
+            models.Index(
+                F("dataset_version"),
+                Lower("qualifying_group_or_course"),
+                Lower("state"),
+                F("closing_rank"),
+                name="allot_summary_course_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.allotted_institute} - {self.speciality} ({self.allotment_year}): {self.closing_rank}"
+
+
+class AllotmentChance(models.Model):
+    """
+    Closing ranks of one institute/speciality/quota/category across every
+    loaded year of an allotment_category, with statistics over them. Built
+    by api.chances from the summaries when an upload is loaded.
+    """
+    dataset_version = models.ForeignKey(DatasetVersion, on_delete=models.CASCADE, related_name="chances")
+    allotment_category = models.CharField(max_length=255)
     allotted_institute = models.CharField(max_length=255)
     state = models.CharField(max_length=255)
     qualifying_group_or_course = models.CharField(max_length=255)
     speciality = models.CharField(max_length=255)
+    allotted_quota = models.CharField(max_length=255)
     allotted_category = models.CharField(max_length=255)
-    candidate_category = models.CharField(max_length=255)
-    remarks = models.TextField(blank=True, null=True)
-    
-    is_active = models.BooleanField(default=False)
+    closing_ranks = models.JSONField()  # {"<allotment_year>": closing rank}
+    first_year = models.PositiveIntegerField()
+    last_year = models.PositiveIntegerField()
+    year_count = models.PositiveIntegerField()
+    min_closing_rank = models.PositiveIntegerField()
+    max_closing_rank = models.PositiveIntegerField()
+    latest_closing_rank = models.PositiveIntegerField()
+    closing_rank_trend = models.FloatField()  # least-squares slope, ranks per year
+
+    class Meta:
+        db_table = "neet_counselling_allotment_chance"
+        indexes = [
+            models.Index(fields=["dataset_version", "allotment_category"], name="allot_chance_category_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.allotted_institute} - {self.speciality}: {self.min_closing_rank}-{self.max_closing_rank}"
+
+
+class TrackerDailyStat(models.Model):
+    """
+    Lead counts per created_at day for one value of one tracker field
+    (allotment_category, state or category). Maintained by api.tracker_stats
+    as tracker rows are written and deleted; value "" stands for NULL.
+    """
+    day = models.DateField()
+    dimension = models.CharField(max_length=32)
+    value = models.CharField(max_length=255, default="", blank=True)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "neet_counselling_tracker_daily_stat"
+        constraints = [
+            models.UniqueConstraint(fields=["dimension", "day", "value"], name="tracker_stat_key"),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.dimension}={self.value}: {self.count}"
+
+
+class QueuedEmail(models.Model):
+    """Outbox row; delivered in batches by the send_queued_mail command."""
+    STATUS_PENDING = "pending"
+    STATUS_SENDING = "sending"  # claimed by a worker until next_attempt_at (its lease)
+    STATUS_SENT = "sent"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_PENDING, "Pending"),
+        (STATUS_SENDING, "Sending"),
+        (STATUS_SENT, "Sent"),
+        (STATUS_FAILED, "Failed"),
+    ]
+
+    to_email = models.EmailField()
+    from_email = models.CharField(max_length=255, blank=True, null=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, null=True)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    updated_at = models.DateTimeField(auto_now=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
 
     class Meta:
-        db_table = "neet_counselling_seat_allotment"
+        db_table = "queued_email"
+        indexes = [
+            models.Index(fields=["status", "next_attempt_at"], name="queued_email_due_idx"),
+        ]
 
     def __str__(self):
-        return f"{self.rank_no} - {self.allotted_institute}"
-    
+        return f"{self.to_email}: {self.subject} ({self.status})"
+
+
+class UploadJob(models.Model):
+    """
+    An uploaded allotment sheet, loaded in the background by the
+    process_upload_jobs command (see api/upload_jobs.py).
+    """
+    STATUS_QUEUED = "queued"
+    STATUS_RUNNING = "running"
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, "Queued"),
+        (STATUS_RUNNING, "Running"),
+        (STATUS_DONE, "Done"),
+        (STATUS_FAILED, "Failed"),
+    ]
+    MODE_FULL = "full"
+    MODE_DELTA = "delta"
+    MODE_CHOICES = [
+        (MODE_FULL, "Full"),
+        (MODE_DELTA, "Delta"),
+    ]
+
+    file = models.FileField(upload_to="allotment-uploads/%Y/%m/%d/", blank=True)
+    source_name = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES, default=MODE_FULL)
+    rows_done = models.PositiveIntegerField(default=0)
+    error_rows = models.PositiveIntegerField(default=0)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, null=True)
+    dataset_version = models.ForeignKey(
+        DatasetVersion, on_delete=models.SET_NULL, blank=True, null=True, related_name="+"
+    )
+    stats = models.JSONField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)  # heartbeat while running
+
+    class Meta:
+        db_table = "allotment_upload_job"
+        indexes = [
+            models.Index(fields=["status", "created_at"], name="upload_job_queue_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.source_name} ({self.status})"
+
+
+class GroupCategoryState(models.Model):
+    """
+    Single-row generation counter for the group-categories list, bumped on
+    every write so each worker's cached payload, keyed on it, goes stale at
+    once (see api.group_categories). changed_at, set with every bump, is the
+    list's Last-Modified.
+    """
+    STATE_ID = 1
+
+    id = models.PositiveSmallIntegerField(primary_key=True, default=STATE_ID)
+    generation = models.PositiveBigIntegerField(default=0)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        db_table = "group_category_state"
 
 
 class GroupCategory(models.Model):
@@ -53,3 +368,7 @@ class GroupCategory(models.Model):
 
     class Meta:
         db_table = "group_category_dropdown"
+        constraints = [
+            # Case-insensitive, matching the duplicate check of the upload endpoint
+            models.UniqueConstraint(Lower("group_name"), Lower("category_type"), name="group_category_unique_key"),
+        ]
@@ -0,0 +1,244 @@
+import logging
+import os
+
+from django.conf import settings
+from django.db.models.functions import Lower
+
+from .datasets import active_allotments, published_state
+from .dimensions import DIMENSION_FIELDS, dimension_names, get_dimensions
+from .engine import PredictionEngine, RankIndex
+from .prediction_cache import get_prediction_cache
+from .results import QueryResult, decode_cursor, paginate
+from .snapshots import open_snapshot, snapshot_dir, snapshot_path, write_snapshot
+
+
+logger = logging.getLogger(__name__)
+
+
+# Columns returned to the client for every matching allotment
+RESULT_FIELDS = (
+    "allotment_category",
+    "allotment_year",
+    "rank_no",
+    "allotted_quota",
+    "allotted_institute",
+    "state",
+    "qualifying_group_or_course",
+    "speciality",
+    "allotted_category",
+    "candidate_category",
+    "remarks",
+)
+# Result columns plus the primary key, which breaks rank_no ties for keyset paging
+ROW_FIELDS = ("id",) + RESULT_FIELDS
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+# (request key, model field) pairs for the case-insensitive filters.
+# allotment_category is compared as LOWER(field), which has a functional
+# index; the dictionary-encoded fields compare dimension ids (see
+# apply_lookups and NeetCounsellingSeatAllotment.Meta.indexes).
+LOOKUP_FIELDS = (
+    ("allotment_category", "allotment_category"),
+    ("qualifying_group_or_course", "qualifying_group_or_course"),
+    ("state", "state"),
+    ("specialization", "speciality"),
+    ("category", "allotted_category"),
+)
+
+
+def prediction_lookups(data):
+    """
+    Normalize a prediction payload into {model_field: lowercased value}.
+    Empty values and "All India" (for state) mean "no filter".
+    """
+    lookups = {}
+    for key, field in LOOKUP_FIELDS:
+        value = data.get(key)
+        if not value:
+            continue
+        value = str(value).strip().lower()
+        if not value or (key == "state" and value == "all india"):
+            continue
+        lookups[field] = value
+    return lookups
+
+
+def parse_rank(value):
+    """
+    rank_no from a payload as an int, or None if absent. Integral floats
+    (1500.0, "1500.0") are accepted; raises ValueError for anything else.
+    """
+    if value in (None, ""):
+        return None
+    text = str(value).strip()
+    try:
+        return int(text)
+    except ValueError:
+        pass
+    try:
+        number = float(text)
+    except ValueError:
+        number = None
+    if number is None or not number.is_integer():
+        raise ValueError("rank_no must be an integer")
+    return int(number)
+
+
+def parse_page_size(value):
+    """Requested page size, clamped to settings.PREDICTION_MAX_PAGE_SIZE."""
+    max_size = getattr(settings, "PREDICTION_MAX_PAGE_SIZE", MAX_PAGE_SIZE)
+    if value in (None, ""):
+        return min(getattr(settings, "PREDICTION_PAGE_SIZE", DEFAULT_PAGE_SIZE), max_size)
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("page_size must be an integer")
+    return max(1, min(size, max_size))
+
+
+def apply_lookups(queryset, lookups, dimensions=None):
+    """
+    Filter on LOWER(field) = value for each normalized lookup. Given a
+    DimensionMap, the dictionary-encoded fields are filtered on the ids of
+    the names that match instead.
+    """
+    if not lookups:
+        return queryset
+    text = dict(lookups)
+    if dimensions is not None:
+        for field in DIMENSION_FIELDS:
+            if field in text:
+                ids = dimensions.matching_ids(field, text.pop(field))
+                if not ids:
+                    return queryset.none()
+                queryset = queryset.filter(**{f"{field}_id__in": ids} if len(ids) > 1 else {f"{field}_id": ids[0]})
+    if not text:
+        return queryset
+    return queryset.alias(
+        **{f"{field}_lower": Lower(field) for field in text}
+    ).filter(
+        **{f"{field}_lower": value for field, value in text.items()}
+    )
+
+
+def filter_allotments(queryset, lookups, rank_no=None, dimensions=None):
+    """Apply the rank floor and normalized lookups to an allotment queryset."""
+    if rank_no is not None:
+        queryset = queryset.filter(rank_no__gte=rank_no)
+    return apply_lookups(queryset, lookups, dimensions or get_dimensions())
+
+
+def prediction_queryset(data, version_id=None):
+    """
+    Active allotments of the published dataset matching the filters posted to
+    allotment_tracker/. The dictionary-encoded fields are dimension ids; see
+    api.dimensions.decode_rows().
+    """
+    lookups = prediction_lookups(data)
+    queryset = filter_allotments(
+        active_allotments(version_id, lookups.get("allotment_category")), lookups, parse_rank(data.get("rank_no"))
+    )
+    return queryset.values(*RESULT_FIELDS)
+
+
+def load_engine_rows(version_id):
+    """Active rows of a dataset version as ROW_FIELDS tuples (with dimension ids), for the in-memory engine."""
+    queryset = active_allotments(version_id).values_list(*ROW_FIELDS)
+    return queryset.iterator(chunk_size=10000)
+
+
+engine = PredictionEngine(ROW_FIELDS, load_engine_rows, dimension_names, open_snapshot)
+
+
+def export_snapshot():
+    """
+    Write the engine index of the published dataset as a memory-mapped
+    snapshot for the workers (see api.snapshots). Call after an upload or
+    year switch; an existing snapshot of the published generation is kept.
+    Returns the snapshot path, or None if snapshots are off, nothing is
+    published or the export failed; workers then build from the database.
+    """
+    directory = snapshot_dir()
+    version_id, generation = published_state()
+    if directory is None or version_id is None:
+        return None
+    path = snapshot_path(directory, version_id, generation)
+    if os.path.isdir(path):
+        return path
+    try:
+        index = RankIndex.build(version_id, generation, ROW_FIELDS, load_engine_rows(version_id), dimension_names)
+        return write_snapshot(index, directory)
+    except Exception:
+        logger.exception("Could not export the prediction snapshot of version %s", version_id)
+        return None
+
+
+def orm_result(version_id, lookups, rank_no, dimensions=None):
+    queryset = filter_allotments(
+        active_allotments(version_id, lookups.get("allotment_category")), lookups, rank_no, dimensions
+    )
+    return QueryResult(queryset.values(*ROW_FIELDS), decode=True)
+
+
+def search(version_id, generation, lookups, rank_no):
+    """
+    Uncached result set (see api.results) for normalized filters. Uses the
+    in-memory engine when settings.PREDICTION_ENGINE_ENABLED is on and it is
+    ready, else the ORM.
+    """
+    if getattr(settings, "PREDICTION_ENGINE_ENABLED", False):
+        index = engine.get_index(version_id, generation)
+        if index is not None:
+            return index.search(lookups, rank_no)
+    return orm_result(version_id, lookups, rank_no, get_dimensions(generation))
+
+
+def predict_page(data, cursor=None, page_size=None, include_count=True, columnar=False):
+    """
+    One page of results for an allotment_tracker/ payload, ordered by
+    (rank_no, id) and served through the prediction cache.
+
+    Returns {"count", "rows", "next_cursor", "page_size"}; count is None when
+    include_count is false, and rows are RESULT_FIELDS tuples instead of dicts
+    when columnar is true. Raises ValueError for a malformed rank_no,
+    page_size or cursor, or a cursor issued before the published data changed.
+    """
+    rank_no = parse_rank(data.get("rank_no"))
+    page_size = parse_page_size(page_size)
+
+    state = published_state()
+    after = decode_cursor(cursor, state)
+    version_id, generation = state
+    if version_id is None:
+        return {"count": 0 if include_count else None, "rows": [], "next_cursor": None, "page_size": page_size}
+
+    lookups = prediction_lookups(data)
+    cache = get_prediction_cache()
+    result = cache.fetch(
+        version_id, generation, lookups, rank_no,
+        lambda lookups, floor: search(version_id, generation, lookups, floor),
+    )
+
+    rows, next_cursor = paginate(result, after, page_size, RESULT_FIELDS, columnar, state)
+    return {
+        "count": cache.count(version_id, generation, lookups, rank_no, result) if include_count else None,
+        "rows": rows,
+        "next_cursor": next_cursor,
+        "page_size": page_size,
+    }
+
+
+def predict_rows(data, limit):
+    """Up to `limit` result rows for a payload, walking pages, plus the total match count."""
+    rows, cursor, total = [], None, None
+    while len(rows) < limit:
+        page = predict_page(data, cursor=cursor, page_size=limit - len(rows), include_count=total is None)
+        if total is None:
+            total = page["count"]
+        rows.extend(page["rows"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    return rows, total
@@ -0,0 +1,202 @@
+"""
+Read-through cache for allotment_tracker/ results.
+
+Entries are keyed on the published dataset (version, generation) plus the
+normalized filter tuple and a rank bucket. The generation lives on the
+PublishedDataset row and is bumped by every admin write path, so a change
+is picked up by all workers on their next request and stale entries simply
+age out of the LRU. Buckets with more than MAX_ROWS rows are not stored;
+those are paged straight from the engine or database.
+
+Configure with settings.PREDICTION_CACHE:
+
+    PREDICTION_CACHE = {
+        "BACKEND": "api.prediction_cache.LocalMemoryBackend",
+        "OPTIONS": {"max_entries": 512},
+        "RANK_BUCKET": 1000,
+        "MAX_ROWS": 5000,
+    }
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from .results import ListResult, QueryResult
+
+
+DEFAULT_BACKEND = "api.prediction_cache.LocalMemoryBackend"
+DEFAULT_RANK_BUCKET = 1000
+DEFAULT_MAX_ROWS = 5000
+
+# Stored instead of rows for buckets larger than max_rows
+OVERSIZE = "oversize"
+
+
+class LocalMemoryBackend:
+    """Per-process, size-bounded LRU."""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            try:
+                self._entries.move_to_end(key)
+            except KeyError:
+                return None
+            return self._entries[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DjangoCacheBackend:
+    """
+    Stores entries in one of settings.CACHES; eviction is left to that backend.
+    clear() only stops this process from reading the entries it can see, by
+    moving to a new key version; the rest of the cache is left alone.
+    """
+
+    def __init__(self, alias="default", timeout=None, key_prefix="prediction"):
+        self.alias = alias
+        self.timeout = timeout
+        self.key_prefix = key_prefix
+        self.evictions = None  # not reported by Django cache backends
+        self._version = 0
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _key(self, key):
+        digest = hashlib.md5(repr(key).encode("utf-8")).hexdigest()
+        return f"{self.key_prefix}:{self._version}:{digest}"
+
+    def get(self, key):
+        return self.cache.get(self._key(key))
+
+    def set(self, key, value):
+        self.cache.set(self._key(key), value, self.timeout)
+
+    def clear(self):
+        self._version += 1
+
+    def __len__(self):
+        return 0  # unknown
+
+
+class PredictionCache:
+    def __init__(self, backend, rank_bucket=DEFAULT_RANK_BUCKET, max_rows=DEFAULT_MAX_ROWS):
+        self.backend = backend
+        self.rank_bucket = max(int(rank_bucket), 1)
+        self.max_rows = max_rows
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def bucket(self, rank_no):
+        return (rank_no or 0) // self.rank_bucket * self.rank_bucket
+
+    def fetch(self, version_id, generation, lookups, rank_no, compute):
+        """
+        Result set (see api.results) for (lookups, rank_no). On a miss,
+        compute(lookups, bucket_floor) is called and, if the bucket has at most
+        max_rows rows, they are stored for the whole bucket. Rows below
+        rank_no are then dropped.
+        """
+        floor = self.bucket(rank_no)
+        key = (version_id, generation, tuple(sorted(lookups.items())), floor)
+
+        rows = self.backend.get(key)
+        if rows is not None and rows != OVERSIZE:
+            with self._lock:
+                self.hits += 1
+            return ListResult(rows).from_rank(rank_no)
+
+        with self._lock:
+            self.misses += 1
+        result = compute(lookups, floor)
+        if rows is None:
+            rows = result.materialize(self.max_rows)
+            self.backend.set(key, OVERSIZE if rows is None else rows)
+            if rows is not None:
+                result = ListResult(rows)
+        return result.from_rank(rank_no)
+
+    def count(self, version_id, generation, lookups, rank_no, result):
+        """
+        result.count(), cached when it costs a database query. The count of
+        the whole bucket is stored; rows of the bucket below rank_no are then
+        counted over that narrow rank range.
+        """
+        if not isinstance(result, QueryResult):
+            return result.count()
+        floor = self.bucket(rank_no)
+        key = (version_id, generation, tuple(sorted(lookups.items())), floor, "count")
+        count = self.backend.get(key)
+        if count is None:
+            count = result.count_range(floor)
+            self.backend.set(key, count)
+        if rank_no is not None and rank_no > floor:
+            count -= result.count_range(floor, rank_no)
+        return count
+
+    def stats(self):
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.backend.evictions,
+            "rank_bucket": self.rank_bucket,
+            "max_rows": self.max_rows,
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_prediction_cache():
+    """The process-wide PredictionCache built from settings.PREDICTION_CACHE."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                config = getattr(settings, "PREDICTION_CACHE", {})
+                backend_class = import_string(config.get("BACKEND", DEFAULT_BACKEND))
+                backend = backend_class(**config.get("OPTIONS", {}))
+                _cache = PredictionCache(
+                    backend,
+                    config.get("RANK_BUCKET", DEFAULT_RANK_BUCKET),
+                    config.get("MAX_ROWS", DEFAULT_MAX_ROWS),
+                )
+    return _cache
+
+
+@receiver(setting_changed)
+def _reset_prediction_cache(setting, **kwargs):
+    global _cache
+    if setting == "PREDICTION_CACHE":
+        _cache = None
@@ -0,0 +1,94 @@
+"""
+Fast JSON rendering for the large listing responses.
+
+dumps() serializes with orjson when it is installed and falls back to the
+standard library otherwise; both produce compact UTF-8 and handle the
+types DRF's encoder does. FastJSONRenderer plugs it into DRF in place of
+JSONRenderer (see REST_FRAMEWORK in settings), and json_response() into
+plain Django views. Both, and the JsonResponse here, count their encoding
+as serialization time in the request metrics (see api/metrics.py).
+
+Listing endpoints can also answer in a columnar format, where rows are
+arrays in the order given by "columns" instead of objects:
+
+    {"columns": ["rank_no", "state", ...], "filtered_results": [[1200, "Kerala", ...], ...], ...}
+
+Those rows are built straight from value tuples, with no per-row dict.
+Clients opt in with `Accept: application/vnd.seatpredictor.columnar+json`
+or `?format=columnar`.
+"""
+import json
+
+from django import http
+from django.http import Http404, HttpResponse
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.renderers import BaseRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+from .metrics import serializing
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+
+COLUMNAR_MEDIA_TYPE = "application/vnd.seatpredictor.columnar+json"
+COLUMNAR_FORMAT = "columnar"
+
+_encoder = JSONEncoder()
+
+
+def dumps(data):
+    """Compact UTF-8 JSON bytes for `data`."""
+    with serializing():
+        if orjson is not None:
+            # Dates go through the DRF encoder too, so both backends format them alike
+            return orjson.dumps(
+                data, default=_encoder.default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME,
+            )
+        return json.dumps(data, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def wants_columnar(request):
+    """True if DRF content negotiation picks the columnar format for a plain Django request."""
+    negotiator = api_settings.DEFAULT_CONTENT_NEGOTIATION_CLASS()
+    try:
+        renderer, _ = negotiator.select_renderer(Request(request), [FastJSONRenderer(), ColumnarJSONRenderer()])
+    except (Http404, NotAcceptable):
+        # Unknown ?format= values are the caller's to handle (user-data/ exports)
+        return False
+    return renderer.format == COLUMNAR_FORMAT
+
+
+def json_response(data, status=200, columnar=False):
+    """HttpResponse with `data` rendered by dumps()."""
+    content_type = COLUMNAR_MEDIA_TYPE if columnar else "application/json"
+    return HttpResponse(dumps(data), content_type=content_type, status=status)
+
+
+class JsonResponse(http.JsonResponse):
+    """django.http.JsonResponse whose encoding counts as serialization time."""
+
+    def __init__(self, *args, **kwargs):
+        with serializing():
+            super().__init__(*args, **kwargs)
+
+
+class FastJSONRenderer(BaseRenderer):
+    media_type = "application/json"
+    format = "json"
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return dumps(data)
+
+
+class ColumnarJSONRenderer(FastJSONRenderer):
+    """Selected by the columnar media type or ?format=columnar; the view builds the columnar data."""
+    media_type = COLUMNAR_MEDIA_TYPE
+    format = COLUMNAR_FORMAT
@@ -0,0 +1,181 @@
+"""
+Result sets for allotment_tracker/ predictions.
+
+Every result set is ordered by (rank, id), where rank is its rank_field
+(rank_no for allotments, closing_rank for summaries), and exposes the same
+small interface, so the view can page through cached rows, the in-memory
+engine or a database query alike:
+
+    from_rank(rank_no)   -> result set restricted to rank >= rank_no
+    count()              -> number of rows
+    page(after, limit)   -> up to `limit` row dicts after the (rank, id) key
+    page_values(after, limit, fields)
+                         -> the same rows as tuples of (id, rank, *fields)
+    materialize(limit)   -> all row dicts, or None if there are more than `limit`
+"""
+import base64
+import binascii
+import json
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+
+from django.db.models import Q
+
+from .dimensions import decode_rows, decode_values
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class StaleCursor(InvalidCursor):
+    """The cursor was issued for another published dataset (version, generation)."""
+
+
+def encode_cursor(row, rank_field="rank_no", state=()):
+    """Opaque keyset cursor pointing just after `row`."""
+    return encode_key(row[rank_field], row["id"], state)
+
+
+def encode_key(rank, pk, state=()):
+    """
+    Opaque keyset cursor pointing just after the (rank, id) key of the
+    dataset `state`, the (version_id, generation) the page was read from.
+    """
+    raw = json.dumps([rank, pk, *state], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor, state=()):
+    """
+    (rank_no, id) from a cursor made by encode_cursor, or None for an empty
+    cursor. Raises StaleCursor if it was issued for another `state`: its key
+    means nothing in the current results.
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        rank_no, pk, *issued = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        key = int(rank_no), int(pk)
+    except (ValueError, TypeError, binascii.Error) as e:
+        raise InvalidCursor("Invalid cursor") from e
+    if tuple(issued) != tuple(state):
+        raise StaleCursor("The results changed since this cursor was issued; restart paging without a cursor")
+    return key
+
+
+def paginate(result, after, page_size, fields, columnar=False, state=()):
+    """
+    (rows, next_cursor) for one page of `result` after the decoded cursor.
+    Rows are trimmed to `fields`, as dicts or, if columnar, as tuples in
+    `fields` order; next_cursor, tied to the dataset `state`, is None on the
+    last page.
+    """
+    if columnar:
+        return _values_page(result.page_values(after, page_size + 1, fields), page_size, state)
+    return _dict_page(result.page(after, page_size + 1), page_size, fields, result.rank_field, state)
+
+
+def _dict_page(rows, page_size, fields, rank_field, state):
+    next_cursor = None
+    if len(rows) > page_size:
+        next_cursor = encode_cursor(rows[page_size - 1], rank_field, state)
+    return [{field: row[field] for field in fields} for row in rows[:page_size]], next_cursor
+
+
+def _values_page(rows, page_size, state):
+    next_cursor = None
+    if len(rows) > page_size:
+        pk, rank = rows[page_size - 1][:2]
+        next_cursor = encode_key(rank, pk, state)
+    return [row[2:] for row in rows[:page_size]], next_cursor
+
+
+class ListResult:
+    """Rows already in memory, sorted by (rank_no, id)."""
+    rank_field = "rank_no"
+
+    def __init__(self, rows):
+        self.rows = rows
+        self._keys = None
+
+    @property
+    def keys(self):
+        if self._keys is None:
+            self._keys = [(row["rank_no"], row["id"]) for row in self.rows]
+        return self._keys
+
+    def from_rank(self, rank_no):
+        if rank_no is None or not self.rows or self.rows[0]["rank_no"] >= rank_no:
+            return self
+        return ListResult(self.rows[bisect_left(self.keys, (rank_no,)):])
+
+    def count(self):
+        return len(self.rows)
+
+    def page(self, after, limit):
+        start = bisect_right(self.keys, after) if after else 0
+        return self.rows[start:start + limit]
+
+    def page_values(self, after, limit, fields):
+        values = itemgetter("id", self.rank_field, *fields)
+        return [values(row) for row in self.page(after, limit)]
+
+    def materialize(self, limit):
+        return self.rows if len(self.rows) <= limit else None
+
+
+class QueryResult:
+    """
+    A lazy .values() queryset, ordered by (rank_field, id). With decode, its
+    rows carry dimension ids (see api.dimensions), which are turned into names.
+    """
+
+    def __init__(self, queryset, rank_field="rank_no", decode=False, rank_no=None):
+        self.rank_field = rank_field
+        self.base = queryset.order_by(rank_field, "id")
+        self.queryset = self.base if rank_no is None else self.base.filter(**{f"{rank_field}__gte": rank_no})
+        self.rank_no = rank_no
+        self.decode = decode
+
+    def from_rank(self, rank_no):
+        if rank_no is None:
+            return self
+        return QueryResult(self.base, self.rank_field, self.decode, max(rank_no, self.rank_no or rank_no))
+
+    def count(self):
+        return self.queryset.count()
+
+    def count_range(self, low=None, high=None):
+        """Rows with low <= rank < high, whatever from_rank() was applied."""
+        queryset = self.base
+        if low is not None:
+            queryset = queryset.filter(**{f"{self.rank_field}__gte": low})
+        if high is not None:
+            queryset = queryset.filter(**{f"{self.rank_field}__lt": high})
+        return queryset.count()
+
+    def _after(self, after):
+        if not after:
+            return self.queryset
+        rank_no, pk = after
+        return self.queryset.filter(
+            Q(**{f"{self.rank_field}__gt": rank_no}) | Q(**{self.rank_field: rank_no, "id__gt": pk})
+        )
+
+    def _rows(self, rows):
+        return decode_rows(rows) if self.decode else rows
+
+    def _values(self, rows, fields):
+        return decode_values(rows, ("id", self.rank_field, *fields)) if self.decode else rows
+
+    def page(self, after, limit):
+        return self._rows(list(self._after(after)[:limit]))
+
+    def page_values(self, after, limit, fields):
+        return self._values(list(self._after(after).values_list("id", self.rank_field, *fields)[:limit]), fields)
+
+    def materialize(self, limit):
+        rows = list(self.queryset[:limit + 1])
+        return self._rows(rows) if len(rows) <= limit else None
@@ -0,0 +1,94 @@
+"""
+Memory-mapped snapshots of the prediction engine's index.
+
+After every upload and year switch, api.prediction.export_snapshot() builds
+the RankIndex of the published dataset once and writes it under
+settings.PREDICTION_SNAPSHOT_DIR:
+
+    v<version>-g<generation>/
+        meta.json           fields, categories and group keys
+        int.<field>.npy     id, allotment_year and rank_no columns
+        code.<field>.npy    dictionary codes of the text columns
+        group_bounds.npy
+
+A worker whose index is stale opens the snapshot of the published
+(version, generation) memory-mapped instead of loading the rows from the
+database, so every worker on the host shares one copy of the columns in
+the page cache. With no snapshot for that generation (the export is still
+running, failed, or snapshots are off) it builds from the database as before.
+
+Snapshots are written to a temporary directory and renamed into place, so
+readers never see a partial one. Only the newest PREDICTION_SNAPSHOT_KEEP
+are kept; deleting the files does not disturb workers that still map them.
+"""
+import logging
+import os
+import re
+import shutil
+import tempfile
+
+from django.conf import settings
+
+from .engine import RankIndex
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_KEEP = 2
+NAME_PATTERN = re.compile(r"^v(\d+)-g(\d+)$")
+
+
+def snapshot_dir():
+    """settings.PREDICTION_SNAPSHOT_DIR, or None if snapshots are off."""
+    directory = getattr(settings, "PREDICTION_SNAPSHOT_DIR", None)
+    return str(directory) if directory else None
+
+
+def snapshot_path(directory, version_id, generation):
+    return os.path.join(directory, f"v{version_id}-g{generation}")
+
+
+def write_snapshot(index, directory):
+    """Save `index` as the snapshot of its (version, generation) and prune old ones. Returns its path."""
+    os.makedirs(directory, exist_ok=True)
+    path = snapshot_path(directory, index.version_id, index.generation)
+    partial = tempfile.mkdtemp(prefix=".partial-", dir=directory)
+    try:
+        index.save(partial)
+        os.rename(partial, path)
+    except OSError:
+        shutil.rmtree(partial, ignore_errors=True)
+        if not os.path.isdir(path):
+            raise
+        # Another process exported the same generation first
+    prune_snapshots(directory, getattr(settings, "PREDICTION_SNAPSHOT_KEEP", DEFAULT_KEEP))
+    return path
+
+
+def open_snapshot(version_id, generation):
+    """The saved RankIndex of (version_id, generation), memory-mapped, or None if there is none."""
+    directory = snapshot_dir()
+    if directory is None:
+        return None
+    path = snapshot_path(directory, version_id, generation)
+    if not os.path.isdir(path):
+        return None
+    try:
+        return RankIndex.open(path)
+    except (OSError, ValueError):
+        logger.exception("Could not open prediction snapshot %s", path)
+        return None
+
+
+def prune_snapshots(directory, keep):
+    """Delete all but the `keep` newest snapshots in `directory`. Returns the number deleted."""
+    snapshots = []
+    for name in os.listdir(directory):
+        match = NAME_PATTERN.match(name)
+        if match:
+            snapshots.append((int(match.group(2)), int(match.group(1)), name))
+    # The generation grows with every publish and year switch, whatever the version
+    snapshots.sort(reverse=True)
+    for *_, name in snapshots[keep:]:
+        shutil.rmtree(os.path.join(directory, name), ignore_errors=True)
+    return max(len(snapshots) - keep, 0)
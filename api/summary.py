@@ -0,0 +1,91 @@
+"""
+Closing-rank summaries ("summary" mode of allotment_tracker/).
+
+AllotmentSummary holds one row per institute/speciality/quota/category/year
+of a dataset version, with the opening rank, closing rank and seat count.
+rebuild_summary() builds it from the allotment rows after an upload. It
+covers every year, so a year switch only changes which rows summary_page()
+keeps, through the same active-year filter as the allotments. Summaries
+store names rather than dimension ids (see api.dimensions), so they are
+read without decoding.
+"""
+from django.db import transaction
+from django.db.models import Count, Max, Min
+
+from .datasets import active_year_filter, published_allotments, published_state
+from .dimensions import decode_rows
+from .models import AllotmentSummary
+from .prediction import apply_lookups, parse_page_size, parse_rank, prediction_lookups
+from .results import QueryResult, decode_cursor, paginate
+
+
+SUMMARY_GROUP_FIELDS = (
+    "allotment_category",
+    "allotment_year",
+    "allotted_institute",
+    "state",
+    "qualifying_group_or_course",
+    "speciality",
+    "allotted_quota",
+    "allotted_category",
+)
+SUMMARY_FIELDS = SUMMARY_GROUP_FIELDS + ("opening_rank", "closing_rank", "seat_count")
+
+BATCH_SIZE = 1000
+
+
+def rebuild_summary(version_id, allotment_category=None):
+    """
+    Recompute the summary rows of a dataset version from its allotments,
+    optionally only for one allotment_category. Returns the number of rows written.
+    """
+    with transaction.atomic():
+        existing = AllotmentSummary.objects.filter(dataset_version_id=version_id)
+        allotments = published_allotments(version_id)
+        if allotment_category is not None:
+            existing = existing.filter(allotment_category=allotment_category)
+            allotments = allotments.filter(allotment_category=allotment_category)
+        existing.delete()
+
+        groups = decode_rows(list(
+            allotments.values(*SUMMARY_GROUP_FIELDS)
+            .annotate(opening_rank=Min("rank_no"), closing_rank=Max("rank_no"), seat_count=Count("id"))
+            .order_by()
+        ))
+        created = AllotmentSummary.objects.bulk_create(
+            [AllotmentSummary(dataset_version_id=version_id, **group) for group in groups],
+            batch_size=BATCH_SIZE,
+        )
+    return len(created)
+
+
+def summary_page(data, cursor=None, page_size=None, include_count=True, columnar=False):
+    """
+    One page of closing-rank summaries for an allotment_tracker/ payload:
+    groups whose closing rank is at or above rank_no, ordered by
+    (closing_rank, id). Same return shape as api.prediction.predict_page.
+    """
+    rank_no = parse_rank(data.get("rank_no"))
+    page_size = parse_page_size(page_size)
+
+    state = published_state()
+    after = decode_cursor(cursor, state)
+    version_id = state[0]
+    if version_id is None:
+        return {"count": 0 if include_count else None, "rows": [], "next_cursor": None, "page_size": page_size}
+
+    lookups = prediction_lookups(data)
+    condition = active_year_filter(version_id, lookups.get("allotment_category"))
+    if condition is None:
+        return {"count": 0 if include_count else None, "rows": [], "next_cursor": None, "page_size": page_size}
+    queryset = apply_lookups(AllotmentSummary.objects.filter(condition, dataset_version_id=version_id), lookups)
+    result = QueryResult(queryset.values("id", *SUMMARY_FIELDS), rank_field="closing_rank").from_rank(rank_no)
+
+    rows, next_cursor = paginate(result, after, page_size, SUMMARY_FIELDS, columnar, state)
+    return {
+        "count": result.count() if include_count else None,
+        "rows": rows,
+        "next_cursor": next_cursor,
+        "page_size": page_size,
+    }
+
@@ -1,3 +1,1625 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core import mail
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.core.mail.backends.locmem import EmailBackend as LocmemEmailBackend
+from django.db import IntegrityError, OperationalError, connection, transaction
+from django.db.models import F
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+import numpy as np
+from openpyxl import Workbook
+from seatpredictor.db.sqlite3.base import DatabaseWrapper as PooledSQLiteWrapper
+from django.contrib.auth.models import User
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .admin.ingest import UPLOAD_LOCK, SheetError, ingest_allotments, ingest_delta
+from .admin.user_data import keyset_rows, search_filter
+from .chances import CHANCE_FIELDS, ChanceIndex, chance_page, invalidate_chances, rebuild_chances
+from .async_views import AsyncAllotmentTrackerView, AsyncGroupCategoryListView
+from .datasets import (
+    active_years, bump_generation, collect_versions, create_version, publish_version, published_allotments,
+    published_state, published_version_id, set_active_year,
+)
+from .dimensions import DIMENSION_FIELDS, decode_rows, get_dimensions, invalidate_dimensions, load_dimensions
+from .engine import RankIndex
+from .group_categories import invalidate_group_categories
+from .leads import LeadBuffer, build_lead, flush_leads, get_lead_buffer
+from .locks import LockTimeout, advisory_lock
+from .mail import send_queued_batch
+from .metrics import get_histogram
+from .models import (
+    ActiveAllotmentYear, AllotmentChance, AllotmentDimension, DatasetVersion, GroupCategory, GroupCategoryState, NeetCounsellingSeatAllotment, NeetCounsellingSeatAllotmentTracker, PublishedDataset,
+    QueuedEmail, TrackerDailyStat, UploadJob,
+)
+from . import chances, leads, prediction, renderers
+from .prediction import RESULT_FIELDS, orm_result, predict_page, prediction_queryset
+from .prediction_cache import LocalMemoryBackend, get_prediction_cache
+from .summary import rebuild_summary, summary_page
+from .tracker_stats import rebuild_tracker_stats
+from .upload_jobs import claim_job, process_next_job, requeue_stale_jobs
+
+
+SHEET_HEADER = [
+    "ALLOTMENT_CATEGORY", "ALLOTMENT_YEAR", "RANK_NO", "ALLOTTED_QUOTA", "ALLOTTED_INSTITUTE",
+    "STATE", "QUALIFYING_GROUP_OR_COURSE", "SPECIALITY", "ALLOTTED_CATEGORY",
+    "CANDIDATE_CATEGORY", "REMARKS", "IS_SHOW_YEAR",
+]
+
+
+def make_sheet(rows, name="allotments.xlsx"):
+    """Build an in-memory upload with SHEET_HEADER and the given rows."""
+    if name.endswith(".csv"):
+        lines = [",".join(SHEET_HEADER)] + [",".join(str(v) for v in row) for row in rows]
+        return SimpleUploadedFile(name, "\n".join(lines).encode())
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(SHEET_HEADER)
+    for row in rows:
+        sheet.append(list(row))
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return SimpleUploadedFile(name, buffer.getvalue())
+
+
+def sheet_row(rank_no, year=2024, show=1, **overrides):
+    values = {
+        "ALLOTMENT_CATEGORY": "NEET_PG", "ALLOTMENT_YEAR": year, "RANK_NO": rank_no,
+        "ALLOTTED_QUOTA": "All India", "ALLOTTED_INSTITUTE": "Test Medical College",
+        "STATE": "Kerala", "QUALIFYING_GROUP_OR_COURSE": "MD/MS",
+        "SPECIALITY": "General Medicine", "ALLOTTED_CATEGORY": "GN",
+        "CANDIDATE_CATEGORY": "GN", "REMARKS": "", "IS_SHOW_YEAR": show,
+    }
+    values.update(overrides)
+    return [values[column] for column in SHEET_HEADER]
+
+
+def predict(data):
+    """All result rows for a payload, following next_cursor page by page."""
+    rows, cursor = [], None
+    while True:
+        page = predict_page(data, cursor=cursor, page_size=500)
+        rows.extend(page["rows"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return rows
+
+
+def reset_prediction_state():
+    """Drop cached results and the in-memory index; test databases reuse version ids."""
+    get_prediction_cache().backend.clear()
+    prediction.engine.index = None
+    invalidate_dimensions()
+    invalidate_chances()
+
+
+def published_version():
+    """The published DatasetVersion, creating one if nothing is published yet."""
+    version_id = published_version_id()
+    if version_id is not None:
+        return DatasetVersion.objects.get(pk=version_id)
+    return publish_version(create_version("tests"))
+
+
+def make_allotment(**overrides):
+    values = {
+        "dataset_version": published_version(),
+        "allotment_category": "NEET_PG",
+        "allotment_year": 2024,
+        "rank_no": 1000,
+        "allotted_quota": "All India",
+        "allotted_institute": "Test Medical College",
+        "state": "Kerala",
+        "qualifying_group_or_course": "MD/MS",
+        "speciality": "General Medicine",
+        "allotted_category": "GN",
+        "candidate_category": "GN",
+    }
+    active = overrides.pop("active", True)
+    values.update(overrides)
+    # Rolled-back tests leave stale ids in the cached map, so encode with a fresh one
+    dimensions = load_dimensions()
+    for field in DIMENSION_FIELDS:
+        name = values.pop(field)
+        values[f"{field}_id"] = dimensions.encode(field, [name])[name]
+    allotment = NeetCounsellingSeatAllotment.objects.create(**values)
+    if active:
+        # Written directly: like the row insert itself, this does not bump the generation
+        ActiveAllotmentYear.objects.update_or_create(
+            dataset_version=values["dataset_version"], allotment_category=values["allotment_category"],
+            defaults={"allotment_year": values["allotment_year"]},
+        )
+    return allotment
+
+
+class PredictionQueryPlanTests(TestCase):
+    """The common allotment_tracker/ filter combinations must not scan the table."""
+
+    COMBINATIONS = [
+        {"rank_no": 500},
+        {"rank_no": 500, "allotment_category": "neet_pg"},
+        {"rank_no": 500, "allotment_category": "NEET_PG", "qualifying_group_or_course": "md/ms"},
+        {"rank_no": 500, "allotment_category": "NEET_PG", "qualifying_group_or_course": "MD/MS",
+         "state": "kerala"},
+        {"rank_no": 500, "allotment_category": "NEET_PG", "qualifying_group_or_course": "MD/MS",
+         "state": "Kerala", "specialization": "general medicine", "category": "gn"},
+        {"rank_no": 500, "allotment_category": "NEET_PG", "state": "All India",
+         "specialization": "General Medicine"},
+        {"rank_no": 500, "allotment_category": "NEET_PG", "specialization": "General Medicine",
+         "category": "GN"},
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(50):
+            active = i % 5 != 0
+            make_allotment(rank_no=i * 100, state="Kerala" if i % 2 else "Delhi",
+                           allotment_year=2024 if active else 2023, active=active)
+
+    def assertUsesIndex(self, data):
+        queryset = prediction_queryset(data)
+        vendor = connection.vendor
+        if vendor == "sqlite":
+            plan = queryset.explain()
+            self.assertIn("USING", plan, plan)
+            self.assertNotRegex(plan, r"SCAN neet_counselling_seat_allotment\s*$", plan)
+        elif vendor == "mysql":
+            plan = json.loads(queryset.explain(format="json"))
+            table = plan["query_block"]["table"]
+            self.assertNotEqual(table["access_type"], "ALL", plan)
+            self.assertIn("key", table, plan)
+        else:
+            self.skipTest(f"No plan assertions for {vendor}")
+
+    def test_filter_combinations_use_index(self):
+        for data in self.COMBINATIONS:
+            with self.subTest(data=data):
+                self.assertUsesIndex(data)
+
+    def test_lookups_are_case_insensitive(self):
+        results = decode_rows(list(prediction_queryset({
+            "rank_no": 0,
+            "allotment_category": "neet_pg",
+            "state": "KERALA",
+            "specialization": "general MEDICINE",
+        })))
+        self.assertEqual(len(results), 20)
+        self.assertTrue(all(r["state"] == "Kerala" for r in results))
+
+
+class ExcelIngestTests(TestCase):
+    def test_xlsx_is_loaded_in_chunks(self):
+        make_allotment(rank_no=1)
+        rows = [sheet_row(rank, year=2023 + rank % 2, show=rank % 2) for rank in range(1, 12)]
+        stats = ingest_allotments(make_sheet(rows), chunk_size=4, batch_size=3)
+
+        self.assertEqual(stats["rows"], 11)
+        self.assertEqual(NeetCounsellingSeatAllotment.objects.count(), 12)
+        self.assertEqual(len(prediction_queryset({"rank_no": 0})), 6)
+
+    def test_csv_upload(self):
+        rows = [sheet_row(rank, show="TRUE") for rank in (10, 20, 30)]
+        stats = ingest_allotments(make_sheet(rows, name="allotments.csv"))
+
+        self.assertEqual(stats["rows"], 3)
+        self.assertEqual(sorted(r["rank_no"] for r in prediction_queryset({"rank_no": 0})), [10, 20, 30])
+        self.assertEqual(active_years(stats["dataset_version"]), {"NEET_PG": 2024})
+
+
+class DatasetVersionTests(TestCase):
+    def test_unpublished_upload_is_invisible(self):
+        make_allotment(rank_no=5)
+        stats = ingest_allotments(make_sheet([sheet_row(10), sheet_row(20)]), publish=False)
+
+        self.assertEqual([r["rank_no"] for r in prediction_queryset({"rank_no": 0})], [5])
+        version = DatasetVersion.objects.get(pk=stats["dataset_version"])
+        self.assertEqual(version.status, DatasetVersion.STATUS_READY)
+
+        publish_version(version)
+        self.assertEqual(sorted(r["rank_no"] for r in prediction_queryset({"rank_no": 0})), [10, 20])
+
+    def test_failed_upload_keeps_published_data(self):
+        make_allotment(rank_no=5)
+        with self.assertRaises(SheetError):
+            ingest_allotments(SimpleUploadedFile("broken.xlsx", b"not a workbook"))
+
+        self.assertEqual(len(prediction_queryset({"rank_no": 0})), 1)
+        self.assertTrue(DatasetVersion.objects.filter(status=DatasetVersion.STATUS_FAILED).exists())
+
+    def test_collect_versions_keeps_recent_retired(self):
+        make_allotment(rank_no=5)
+        first = published_version_id()
+        ingest_allotments(make_sheet([sheet_row(10)]))
+        second = published_version_id()
+        ingest_allotments(make_sheet([sheet_row(20)]))
+
+        deleted = collect_versions(keep=1, batch_size=1)
+
+        self.assertEqual(deleted, 1)
+        self.assertFalse(DatasetVersion.objects.filter(pk=first).exists())
+        self.assertEqual(
+            DatasetVersion.objects.get(pk=second).status, DatasetVersion.STATUS_RETIRED
+        )
+
+
+class DeltaIngestTests(TestCase):
+    def setUp(self):
+        reset_prediction_state()
+        ingest_allotments(make_sheet([
+            sheet_row(10), sheet_row(20), sheet_row(30),
+            sheet_row(5, ALLOTMENT_CATEGORY="NEET_SS"),
+        ]))
+        self.version_id = published_version_id()
+        self.ids = dict(published_allotments().values_list("rank_no", "id"))
+
+    def test_only_changed_rows_are_written(self):
+        generation = published_state()[1]
+        stats = ingest_delta(make_sheet([
+            sheet_row(10), sheet_row(20, ALLOTTED_INSTITUTE="Other College"), sheet_row(40),
+        ]))
+
+        self.assertEqual(
+            {key: stats[key] for key in ("mode", "inserted", "updated", "retired", "unchanged")},
+            {"mode": "delta", "inserted": 1, "updated": 1, "retired": 1, "unchanged": 1},
+        )
+        self.assertEqual(published_version_id(), self.version_id)
+        self.assertGreater(published_state()[1], generation)
+        rows = dict(published_allotments().values_list("rank_no", "allotted_institute__name"))
+        # The NEET_SS row is outside the sheet's category and year, so it is kept
+        self.assertEqual(rows, {
+            5: "Test Medical College", 10: "Test Medical College", 20: "Other College", 40: "Test Medical College",
+        })
+        self.assertEqual(published_allotments().get(rank_no=20).pk, self.ids[20])
+        self.assertEqual(DatasetVersion.objects.get(pk=self.version_id).row_count, 4)
+
+    def test_unchanged_sheet_writes_nothing(self):
+        generation = published_state()[1]
+        with CaptureQueriesContext(connection) as queries:
+            stats = ingest_delta(make_sheet([sheet_row(10), sheet_row(20), sheet_row(30)]))
+
+        self.assertEqual((stats["unchanged"], stats["inserted"], stats["updated"], stats["retired"]), (3, 0, 0, 0))
+        self.assertEqual(published_state()[1], generation)
+        self.assertFalse([q for q in queries if q["sql"].startswith(("INSERT", "UPDATE", "DELETE"))])
+
+    def test_rows_loaded_before_hashing_are_backfilled(self):
+        published_allotments().update(row_hash="")
+        stats = ingest_delta(make_sheet([sheet_row(10), sheet_row(20), sheet_row(30)]))
+
+        self.assertEqual(stats["unchanged"], 3)
+        self.assertFalse(published_allotments().filter(row_hash="").exists())
+
+    def test_first_delta_loads_in_full(self):
+        DatasetVersion.objects.all().update(status=DatasetVersion.STATUS_RETIRED)
+        PublishedDataset.objects.all().delete()
+        stats = ingest_delta(make_sheet([sheet_row(10)]))
+
+        self.assertEqual((stats["mode"], stats["inserted"]), ("full", 1))
+        self.assertEqual(published_version_id(), stats["dataset_version"])
+
+
+class DimensionTests(TestCase):
+    def setUp(self):
+        reset_prediction_state()
+
+    def test_upload_stores_each_name_once(self):
+        rows = [sheet_row(rank, STATE=("Kerala", "Delhi", "DELHI")[rank % 3]) for rank in range(1, 31)]
+        ingest_allotments(make_sheet(rows), chunk_size=7)
+
+        states = AllotmentDimension.objects.filter(field="state")
+        self.assertEqual(sorted(states.values_list("name", flat=True)), ["DELHI", "Delhi", "Kerala"])
+        self.assertEqual(AllotmentDimension.objects.filter(field="allotted_institute").count(), 1)
+        states = {row["state"] for row in decode_rows(list(published_allotments().values("state")))}
+        self.assertEqual(states, {"Kerala", "Delhi", "DELHI"})
+
+    def test_filters_compare_ids(self):
+        make_allotment(rank_no=10, state="Delhi")
+        make_allotment(rank_no=20, state="DELHI")
+        make_allotment(rank_no=30, state="Kerala")
+        version_id, generation = published_state()
+
+        with CaptureQueriesContext(connection) as queries:
+            rows = orm_result(version_id, {"state": "delhi"}, None).materialize(10)
+
+        self.assertEqual([(row["rank_no"], row["state"]) for row in rows], [(10, "Delhi"), (20, "DELHI")])
+        where = queries[-1]["sql"].split("WHERE")[1]
+        self.assertIn('"state_id" IN', where)
+        self.assertNotIn('LOWER("neet_counselling_seat_allotment"."state")', where)
+
+    def test_unknown_name_matches_nothing(self):
+        make_allotment(rank_no=10)
+        self.assertEqual(predict({"rank_no": 0, "state": "goa"}), [])
+
+    def test_new_names_from_another_worker_are_decoded(self):
+        make_allotment(rank_no=10)
+        get_dimensions()
+        # Added behind this worker's cached map, as an upload in another process would
+        AllotmentDimension.objects.create(field="state", name="Goa")
+        goa = AllotmentDimension.objects.get(field="state", name="Goa")
+        published_allotments().update(state=goa)
+        bump_generation()
+
+        self.assertEqual([row["state"] for row in predict({"rank_no": 0})], ["Goa"])
+        self.assertEqual(len(predict({"rank_no": 0, "state": "goa"})), 1)
+
+
+class PredictionCacheTests(TestCase):
+    def setUp(self):
+        reset_prediction_state()
+        make_allotment(rank_no=1500)
+        make_allotment(rank_no=2500, state="Delhi")
+
+    def test_rank_bucket_is_shared_and_filtered(self):
+        cache = get_prediction_cache()
+        hits, misses = cache.hits, cache.misses
+
+        self.assertEqual(len(predict({"rank_no": 1200})), 2)
+        self.assertEqual(len(predict({"rank_no": 1800})), 1)
+        self.assertEqual(len(predict({"rank_no": "1800", "state": "All India"})), 1)
+
+        self.assertEqual(cache.misses - misses, 1)
+        self.assertEqual(cache.hits - hits, 2)
+
+    def test_generation_bump_invalidates(self):
+        self.assertEqual(len(predict({"rank_no": 0, "state": "delhi"})), 1)
+        make_allotment(rank_no=3000, state="Delhi")
+        self.assertEqual(len(predict({"rank_no": 0, "state": "delhi"})), 1)
+
+        bump_generation()
+        self.assertEqual(len(predict({"rank_no": 0, "state": "delhi"})), 2)
+
+    def test_publish_invalidates(self):
+        self.assertEqual(len(predict({"rank_no": 0})), 2)
+        ingest_allotments(make_sheet([sheet_row(10)]))
+        self.assertEqual([r["rank_no"] for r in predict({"rank_no": 0})], [10])
+
+    @override_settings(PREDICTION_ENGINE_ENABLED=False, PREDICTION_CACHE={"MAX_ROWS": 0})
+    def test_count_is_cached_per_bucket(self):
+        make_allotment(rank_no=1700)
+        counts = [predict_page({"rank_no": rank_no})["count"] for rank_no in (1000, 1600, 1800)]
+        self.assertEqual(counts, [3, 2, 1])
+        entries = get_prediction_cache().backend._entries
+        self.assertEqual(len([key for key in entries if key[-1] == "count"]), 1)
+
+    def test_lru_eviction(self):
+        backend = LocalMemoryBackend(max_entries=2)
+        for key in "abc":
+            backend.set(key, [key])
+        self.assertIsNone(backend.get("a"))
+        self.assertEqual(backend.get("c"), ["c"])
+        self.assertEqual(backend.evictions, 1)
+
+    @override_settings(PREDICTION_CACHE={
+        "BACKEND": "api.prediction_cache.DjangoCacheBackend",
+        "OPTIONS": {"alias": "default"},
+        "RANK_BUCKET": 500,
+    })
+    def test_django_cache_backend(self):
+        caches["default"].set("unrelated", 1)
+        get_prediction_cache().backend.clear()
+        self.assertEqual(caches["default"].get("unrelated"), 1)
+        self.assertEqual(len(predict({"rank_no": 1600})), 1)
+        self.assertEqual(len(predict({"rank_no": 1600})), 1)
+        self.assertEqual(get_prediction_cache().stats()["hits"], 1)
+
+
+class AllotmentTrackerEndpointTests(TestCase):
+    def setUp(self):
+        reset_prediction_state()
+        self.client = APIClient()
+        make_allotment(rank_no=1500)
+
+    def test_returns_filtered_results(self):
+        response = self.client.post(reverse("allotment-tracker"), {"rank_no": 1000, "state": "kerala"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["filtered_results_count"], 1)
+        self.assertEqual(response.data["filtered_results"][0]["allotted_institute"], "Test Medical College")
+
+    def test_rejects_malformed_rank(self):
+        response = self.client.post(reverse("allotment-tracker"), {"rank_no": "abc"}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_columnar_format(self):
+        make_allotment(rank_no=1200, state="Delhi")
+        url = reverse("allotment-tracker")
+        payload = {"rank_no": 1000, "page_size": 1}
+        for engine_enabled in (True, False):
+            with self.subTest(engine_enabled=engine_enabled), self.settings(PREDICTION_ENGINE_ENABLED=engine_enabled):
+                reset_prediction_state()
+                rows = self.client.post(url, payload, format="json").json()
+                by_query = self.client.post(f"{url}?format=columnar", payload, format="json")
+                by_accept = self.client.post(url, payload, format="json", HTTP_ACCEPT=renderers.COLUMNAR_MEDIA_TYPE)
+
+                self.assertEqual(by_query["Content-Type"], renderers.COLUMNAR_MEDIA_TYPE)
+                self.assertEqual(by_query.content, by_accept.content)
+                columnar = by_query.json()
+                self.assertEqual(columnar["columns"], list(RESULT_FIELDS))
+                self.assertEqual(
+                    [dict(zip(columnar["columns"], row)) for row in columnar["filtered_results"]],
+                    rows["filtered_results"],
+                )
+                self.assertEqual(columnar["next_cursor"], rows["next_cursor"])
+
+                second = self.client.post(
+                    f"{url}?format=columnar", {**payload, "cursor": columnar["next_cursor"]}, format="json"
+                ).json()
+                self.assertEqual(second["filtered_results"][0][RESULT_FIELDS.index("rank_no")], 1500)
+
+
+class PredictionEngineTests(TestCase):
+    COMBINATIONS = [
+        {},
+        {"allotment_category": "neet_pg"},
+        {"allotment_category": "neet_pg", "qualifying_group_or_course": "md/ms"},
+        {"allotment_category": "neet_pg", "state": "kerala"},
+        {"speciality": "general medicine", "allotted_category": "obc"},
+        {"allotment_category": "neet_pg", "qualifying_group_or_course": "md/ms", "state": "delhi",
+         "speciality": "radiology", "allotted_category": "gn"},
+        {"state": "goa"},
+    ]
+
+    def setUp(self):
+        reset_prediction_state()
+        for i in range(60):
+            make_allotment(
+                rank_no=(i * 37) % 1000,
+                state=("Kerala", "Delhi", "DELHI")[i % 3],
+                speciality=("General Medicine", "Radiology")[i % 2],
+                allotted_category=("GN", "OBC", "Obc", "SC")[i % 4],
+                remarks=None if i % 5 else "note",
+                allotment_year=2023 if i % 7 == 0 else 2024,
+                active=i % 7 != 0,
+            )
+
+    def test_matches_orm_path(self):
+        version_id, generation = prediction.published_state()
+        index = prediction.engine.get_index(version_id, generation)
+        for lookups in self.COMBINATIONS:
+            for rank_no in (None, 0, 400, 999, 5000):
+                with self.subTest(lookups=lookups, rank_no=rank_no):
+                    expected = orm_result(version_id, lookups, rank_no).materialize(1000)
+                    actual = index.search(lookups, rank_no).materialize(1000)
+                    self.assertEqual(actual, expected)
+
+    def test_rebuilds_after_data_change(self):
+        first = prediction.engine.get_index(*prediction.published_state())
+        self.assertEqual(len(predict({"rank_no": 0, "state": "goa"})), 0)
+
+        make_allotment(rank_no=5, state="Goa")
+        bump_generation()
+
+        self.assertEqual(len(predict({"rank_no": 0, "state": "goa"})), 1)
+        self.assertIsNot(prediction.engine.index, first)
+
+
+class PredictionSnapshotTests(TestCase):
+    def setUp(self):
+        reset_prediction_state()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings = override_settings(PREDICTION_SNAPSHOT_DIR=self.directory, PREDICTION_SNAPSHOT_KEEP=2)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_opened_snapshot_matches_built_index(self):
+        for i in range(30):
+            make_allotment(rank_no=(i * 37) % 500, state=("Kerala", "Delhi", "DELHI")[i % 3],
+                           allotted_category=("GN", "OBC", "Obc")[i % 3])
+        version_id, generation = prediction.published_state()
+        built = prediction.engine.get_index(version_id, generation)
+        opened = RankIndex.open(prediction.export_snapshot())
+
+        self.assertIsInstance(opened.ints["rank_no"], np.memmap)
+        for lookups in PredictionEngineTests.COMBINATIONS:
+            for rank_no in (None, 0, 250, 5000):
+                with self.subTest(lookups=lookups, rank_no=rank_no):
+                    self.assertEqual(
+                        opened.search(lookups, rank_no).materialize(100),
+                        built.search(lookups, rank_no).materialize(100),
+                    )
+
+    def test_empty_index_round_trips(self):
+        published_version()
+        opened = RankIndex.open(prediction.export_snapshot())
+
+        self.assertEqual(opened.search({}, None).materialize(100), [])
+
+    def test_new_worker_answers_from_snapshot_without_allotment_queries(self):
+        make_allotment(rank_no=10)
+        prediction.export_snapshot()
+        reset_prediction_state()
+        state = prediction.published_state()
+
+        with CaptureQueriesContext(connection) as queries:
+            index = prediction.engine.get_index(*state)
+            rows = index.search({"state": "kerala"}, 0).materialize(10)
+
+        self.assertEqual([row["rank_no"] for row in rows], [10])
+        self.assertFalse([q for q in queries if "neet_counselling_seat_allotment" in q["sql"] or "allotment_dimension" in q["sql"]])
+
+    def test_uploads_and_year_switches_export_and_prune(self):
+        ingest_allotments(make_sheet([sheet_row(10)]))
+        ingest_allotments(make_sheet([sheet_row(20), sheet_row(30, year=2023, show=0)]))
+        version_id = published_version_id()
+        set_active_year(version_id, "NEET_PG", 2023)
+        prediction.export_snapshot()
+
+        names = sorted(os.listdir(self.directory))
+        self.assertEqual(len(names), 2)
+        self.assertIn(f"v{version_id}-g{published_state()[1]}", names)
+
+
+@override_settings(PREDICTION_MAX_PAGE_SIZE=4)
+class PredictionPaginationTests(TestCase):
+    def setUp(self):
+        reset_prediction_state()
+        for rank_no in (5, 5, 5, 7, 9, 9, 12, 15, 15, 20):
+            make_allotment(rank_no=rank_no)
+
+    def walk(self, data):
+        pages, cursor = [], None
+        while True:
+            page = predict_page(data, cursor=cursor, page_size=100)
+            pages.append(page)
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return pages
+
+    def assert_paths_agree(self, data):
+        pages = self.walk(data)
+        self.assertTrue(all(len(page["rows"]) <= 4 for page in pages))
+        ranks = [row["rank_no"] for page in pages for row in page["rows"]]
+        self.assertEqual(ranks, sorted(ranks))
+        self.assertEqual(len(ranks), pages[0]["count"])
+        return ranks
+
+    def test_engine_cache_and_orm_paths_page_identically(self):
+        data = {"rank_no": 6, "state": "kerala"}
+        with override_settings(PREDICTION_CACHE={"MAX_ROWS": 100}):
+            cached = self.assert_paths_agree(data)
+        with override_settings(PREDICTION_CACHE={"MAX_ROWS": 2}):
+            reset_prediction_state()
+            engine = self.assert_paths_agree(data)
+            with override_settings(PREDICTION_ENGINE_ENABLED=False):
+                orm = self.assert_paths_agree(data)
+        self.assertEqual(cached, [7, 9, 9, 12, 15, 15, 20])
+        self.assertEqual(engine, cached)
+        self.assertEqual(orm, cached)
+
+    def test_endpoint_cursor_round_trip(self):
+        client = APIClient()
+        url = reverse("allotment-tracker")
+        first = client.post(url, {"rank_no": 0, "page_size": 3}, format="json").data
+        second = client.post(url, {"rank_no": 0, "page_size": 3, "cursor": first["next_cursor"]}, format="json").data
+
+        self.assertEqual(first["filtered_results_count"], 10)
+        self.assertEqual([r["rank_no"] for r in first["filtered_results"]], [5, 5, 5])
+        self.assertEqual([r["rank_no"] for r in second["filtered_results"]], [7, 9, 9])
+        self.assertNotIn("id", first["filtered_results"][0])
+
+    def test_integral_float_rank(self):
+        url = reverse("allotment-tracker")
+        response = APIClient().post(url, {"rank_no": 12.0, "page_size": 3}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["rank_no"] for r in response.data["filtered_results"]], [12, 15, 15])
+        self.assertEqual(APIClient().post(url, {"rank_no": 12.5}, format="json").status_code, 400)
+
+    def test_invalid_cursor(self):
+        response = APIClient().post(reverse("allotment-tracker"), {"cursor": "%%%"}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_cursor_from_before_a_data_change_is_rejected(self):
+        client = APIClient()
+        url = reverse("allotment-tracker")
+        first = client.post(url, {"rank_no": 0, "page_size": 3}, format="json").data
+        bump_generation()
+
+        response = client.post(url, {"rank_no": 0, "page_size": 3, "cursor": first["next_cursor"]}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("restart paging", response.data["detail"])
+
+
+def staff_client():
+    """APIClient authenticated with a staff user's JWT access token."""
+    user = User.objects.create_user(username="staff", password="pw", is_staff=True)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {RefreshToken.for_user(user).access_token}")
+    return client
+
+
+class YearUpdateTests(TestCase):
+    def setUp(self):
+        reset_prediction_state()
+        ingest_allotments(make_sheet([sheet_row(10), sheet_row(20, year=2023, show=0)]))
+
+    def update(self, category, year):
+        return staff_client().post(
+            reverse("admin_set_active_allotment_year"),
+            {"allotment_category": category, "allotment_year": year}, format="json",
+        )
+
+    def test_category_is_matched_case_insensitively(self):
+        response = self.update("neet_pg", 2023)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["allotment_category"], "NEET_PG")
+        self.assertEqual(active_years(published_version_id()), {"NEET_PG": 2023})
+
+    def test_unknown_category_is_rejected(self):
+        response = self.update("NEET_PGG", 2023)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(active_years(published_version_id()), {"NEET_PG": 2024})
+
+
+class AllotmentSummaryTests(TestCase):
+    def setUp(self):
+        reset_prediction_state()
+        rows = [
+            sheet_row(100, year=2024), sheet_row(300, year=2024), sheet_row(200, year=2024),
+            sheet_row(150, year=2024, SPECIALITY="Radiology"),
+            sheet_row(400, year=2023, show=0), sheet_row(500, year=2023, show=0),
+        ]
+        ingest_allotments(make_sheet(rows))
+
+    def test_summary_rows_per_group(self):
+        page = summary_page({"rank_no": 0})
+        self.assertEqual(page["count"], 2)
+        radiology, medicine = page["rows"]
+        self.assertEqual((radiology["speciality"], radiology["closing_rank"]), ("Radiology", 150))
+        self.assertEqual(
+            (medicine["opening_rank"], medicine["closing_rank"], medicine["seat_count"]), (100, 300, 3)
+        )
+
+    def test_rank_filters_on_closing_rank(self):
+        page = summary_page({"rank_no": 160, "specialization": "general medicine"})
+        self.assertEqual([row["closing_rank"] for row in page["rows"]], [300])
+
+    def test_year_switch_filters_summary(self):
+        response = staff_client().post(
+            "/admin/year-update/", {"allotment_category": "NEET_PG", "allotment_year": 2023}, format="json"
+        )
+        self.assertEqual(response.status_code, 200)
+
+        page = summary_page({"rank_no": 0})
+        self.assertEqual([(r["allotment_year"], r["closing_rank"], r["seat_count"]) for r in page["rows"]],
+                         [(2023, 500, 2)])
+
+    def test_year_switch_is_a_single_row_write(self):
+        self.assertEqual(len(predict({"rank_no": 0})), 4)
+        with CaptureQueriesContext(connection) as queries:
+            response = staff_client().post(
+                "/admin/year-update/", {"allotment_category": "NEET_PG", "allotment_year": 2023}, format="json"
+            )
+        self.assertEqual(response.json()["counts"], {"deactivated_in_category": 6, "activated": 2})
+
+        writes = [q["sql"] for q in queries
+                  if not q["sql"].lstrip().upper().startswith(("SELECT", "SAVEPOINT", "RELEASE"))]
+        self.assertFalse([sql for sql in writes if "neet_counselling_seat_allotment" in sql], writes)
+        self.assertEqual([r["rank_no"] for r in predict({"rank_no": 0, "allotment_category": "neet_pg"})], [400, 500])
+
+    def test_endpoint_summary_mode(self):
+        response = APIClient().post(reverse("allotment-tracker"), {"rank_no": 0, "mode": "summary"}, format="json")
+        self.assertEqual(response.data["mode"], "summary")
+        self.assertEqual(response.data["filtered_results_count"], 2)
+
+
+class AllotmentChanceTests(TestCase):
+    def setUp(self):
+        reset_prediction_state()
+        rows = [
+            sheet_row(100, year=2022, show=0), sheet_row(300, year=2022, show=0),
+            sheet_row(400, year=2023, show=0),
+            sheet_row(200, year=2024), sheet_row(500, year=2024),
+            sheet_row(150, year=2024, SPECIALITY="Radiology"),
+        ]
+        ingest_allotments(make_sheet(rows))
+
+    def labels(self, data):
+        return [(row["speciality"], row["chance"]) for row in chance_page(data)["rows"]]
+
+    def test_statistics_across_years(self):
+        medicine = AllotmentChance.objects.get(speciality="General Medicine")
+        self.assertEqual(medicine.closing_ranks, {"2022": 300, "2023": 400, "2024": 500})
+        self.assertEqual(
+            (medicine.year_count, medicine.min_closing_rank, medicine.max_closing_rank,
+             medicine.latest_closing_rank, medicine.closing_rank_trend),
+            (3, 300, 500, 500, 100.0),
+        )
+        radiology = AllotmentChance.objects.get(speciality="Radiology")
+        self.assertEqual((radiology.year_count, radiology.closing_rank_trend), (1, 0.0))
+
+    def test_labels_for_rank(self):
+        self.assertEqual(self.labels({"rank_no": 160}), [("Radiology", "reach"), ("General Medicine", "safe")])
+        self.assertEqual(self.labels({"rank_no": 350}), [("General Medicine", "moderate")])
+        self.assertEqual(self.labels({"rank_no": 540}), [("General Medicine", "reach")])
+        self.assertEqual(self.labels({"rank_no": 560}), [])
+        self.assertEqual(self.labels({"rank_no": 100, "specialization": "radiology"}), [("Radiology", "safe")])
+
+    def test_rank_is_required(self):
+        with self.assertRaises(ValueError):
+            chance_page({})
+        response = APIClient().post(reverse("allotment-tracker"), {"mode": "chance"}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+    def test_endpoint_chance_mode_reads_no_allotments(self):
+        chance_page({"rank_no": 0})
+        with CaptureQueriesContext(connection) as queries:
+            response = APIClient().post(
+                reverse("allotment-tracker") + "?format=columnar", {"rank_no": 350, "mode": "chance"}, format="json"
+            )
+        body = json.loads(response.content)
+        self.assertEqual((body["mode"], body["columns"]), ("chance", list(CHANCE_FIELDS)))
+        self.assertEqual([row[-1] for row in body["filtered_results"]], ["moderate"])
+        self.assertFalse([q for q in queries if "allotment_chance" in q["sql"] or "seat_allotment" in q["sql"]])
+
+    def test_database_fallback_while_index_loads(self):
+        payloads = [{"rank_no": 160}, {"rank_no": 350}, {"rank_no": 100, "specialization": "radiology"}]
+        expected = [(chance_page(data), chance_page(data, columnar=True)) for data in payloads]
+        version_id, generation = published_state()
+        chances._index = ChanceIndex.build(version_id, generation - 1, [])
+        # Another thread is loading the current index
+        with chances._lock:
+            for data, (page, columnar_page) in zip(payloads, expected):
+                self.assertEqual(chance_page(data), page)
+                self.assertEqual(chance_page(data, columnar=True), columnar_page)
+        self.assertEqual(chances.current_chance_index(version_id, generation), None)
+
+    def test_delta_upload_updates_chances(self):
+        self.assertEqual(self.labels({"rank_no": 600}), [])
+        ingest_delta(make_sheet([
+            sheet_row(200, year=2024), sheet_row(700, year=2024),
+            sheet_row(150, year=2024, SPECIALITY="Radiology"),
+        ]))
+
+        self.assertEqual(self.labels({"rank_no": 600}), [("General Medicine", "moderate")])
+        medicine = AllotmentChance.objects.get(speciality="General Medicine")
+        self.assertEqual((medicine.latest_closing_rank, medicine.closing_rank_trend), (700, 200.0))
+
+
+class FlakyEmailBackend(LocmemEmailBackend):
+    """Rejects messages addressed to fail@example.com."""
+
+    def send_messages(self, messages):
+        if any("fail@example.com" in message.to for message in messages):
+            raise ConnectionError("rejected")
+        return super().send_messages(messages)
+
+
+class UnreachableEmailBackend(LocmemEmailBackend):
+    def open(self):
+        raise ConnectionRefusedError("smtp down")
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend")
+class MailQueueTests(TestCase):
+    def post_results(self, email):
+        return self.client.post(
+            reverse("send_results_email"),
+            json.dumps({"email": email, "results": [{"rank_no": 10, "allotted_institute": "AIIMS", "state": "Delhi"}]}),
+            content_type="application/json",
+        )
+
+    def test_endpoint_only_enqueues(self):
+        response = self.post_results("student@example.com")
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(len(mail.outbox), 0)
+        queued = QueuedEmail.objects.get()
+        self.assertEqual(queued.status, QueuedEmail.STATUS_PENDING)
+        self.assertIn("AIIMS", queued.html_body)
+
+    def test_missing_email(self):
+        self.assertEqual(self.post_results("").status_code, 400)
+
+    def test_batch_delivery(self):
+        for i in range(3):
+            self.post_results(f"student{i}@example.com")
+
+        self.assertEqual(send_queued_batch(), (3, 0))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(mail.outbox[0].alternatives[0][1], "text/html")
+        self.assertEqual(send_queued_batch(), (0, 0))
+        self.assertFalse(QueuedEmail.objects.exclude(status=QueuedEmail.STATUS_SENT).exists())
+
+    @override_settings(EMAIL_BACKEND="api.tests.FlakyEmailBackend")
+    def test_failures_back_off_then_give_up(self):
+        self.post_results("fail@example.com")
+        self.post_results("ok@example.com")
+
+        self.assertEqual(send_queued_batch(max_attempts=2), (1, 1))
+        failing = QueuedEmail.objects.get(to_email="fail@example.com")
+        self.assertEqual((failing.status, failing.attempts), (QueuedEmail.STATUS_PENDING, 1))
+        self.assertGreater(failing.next_attempt_at, failing.created_at)
+
+        self.assertEqual(send_queued_batch(max_attempts=2), (0, 0))  # not due yet
+        QueuedEmail.objects.filter(pk=failing.pk).update(next_attempt_at=failing.created_at)
+        self.assertEqual(send_queued_batch(max_attempts=2), (0, 1))
+        failing.refresh_from_db()
+        self.assertEqual((failing.status, failing.attempts), (QueuedEmail.STATUS_FAILED, 2))
+        self.assertEqual(failing.last_error, "rejected")
+
+    @override_settings(EMAIL_BACKEND="api.tests.UnreachableEmailBackend")
+    def test_failed_connection_backs_off(self):
+        self.post_results("student@example.com")
+
+        self.assertEqual(send_queued_batch(), (0, 1))
+        queued = QueuedEmail.objects.get()
+        self.assertEqual((queued.status, queued.attempts, queued.last_error),
+                         (QueuedEmail.STATUS_PENDING, 1, "smtp down"))
+        self.assertGreater(queued.next_attempt_at, timezone.now())
+        self.assertEqual(send_queued_batch(), (0, 0))  # not retried right away
+
+    def test_expired_lease_is_reclaimed(self):
+        self.post_results("student@example.com")
+        QueuedEmail.objects.update(status=QueuedEmail.STATUS_SENDING, attempts=1,
+                                   next_attempt_at=timezone.now() + timedelta(minutes=5))
+        self.assertEqual(send_queued_batch(), (0, 0))  # another worker holds the lease
+
+        QueuedEmail.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(send_queued_batch(), (1, 0))
+        self.assertEqual(QueuedEmail.objects.get().attempts, 2)
+
+    def test_file_backend_reuses_one_connection(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with override_settings(EMAIL_BACKEND="django.core.mail.backends.filebased.EmailBackend",
+                                   EMAIL_FILE_PATH=directory):
+                for i in range(4):
+                    self.post_results(f"student{i}@example.com")
+                self.assertEqual(send_queued_batch(), (4, 0))
+                # The file backend writes one file per opened connection
+                self.assertEqual(len(os.listdir(directory)), 1)
+
+
+class ResultsEmailTests(TestCase):
+    def setUp(self):
+        reset_prediction_state()
+        for rank_no in (100, 200, 300):
+            make_allotment(rank_no=rank_no, allotted_institute=f"College {rank_no}")
+        make_allotment(rank_no=400, allotted_institute="<b>Bold</b> College")
+
+    def post(self, payload):
+        return self.client.post(reverse("send_results_email"), json.dumps(payload), content_type="application/json")
+
+    def test_table_is_built_from_filters(self):
+        response = self.post({"email": "student@example.com", "rank_no": 150, "allotment_category": "neet_pg"})
+
+        self.assertEqual(response.status_code, 202)
+        html = QueuedEmail.objects.get().html_body
+        self.assertNotIn("College 100", html)
+        self.assertIn("College 200", html)
+        self.assertIn("&lt;b&gt;Bold&lt;/b&gt; College", html)
+        self.assertNotIn("Showing the first", html)
+
+    @override_settings(RESULTS_EMAIL_MAX_ROWS=2)
+    def test_table_is_capped(self):
+        self.post({"email": "student@example.com", "rank_no": 1})
+
+        html = QueuedEmail.objects.get().html_body
+        self.assertIn("Showing the first 2 of 4 matching allotments.", html)
+        self.assertIn("College 200", html)
+        self.assertNotIn("College 300", html)
+
+    def test_invalid_rank(self):
+        self.assertEqual(self.post({"email": "student@example.com", "rank_no": "abc"}).status_code, 400)
+        self.assertFalse(QueuedEmail.objects.exists())
+
+
+@override_settings(TRACKER_BUFFER={"MAX_SIZE": 3, "MAX_DELAY": 60, "BACKGROUND": False})
+class LeadBufferTests(TestCase):
+    def setUp(self):
+        reset_prediction_state()
+        self.client = APIClient()
+        make_allotment(rank_no=1500)
+
+    def track(self, **payload):
+        response = self.client.post(reverse("allotment-tracker"), {"rank_no": 1000, **payload}, format="json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_leads_are_written_in_batches(self):
+        self.track(name="A", email="a@example.com")
+        self.track(name="B")
+        self.assertEqual(NeetCounsellingSeatAllotmentTracker.objects.count(), 0)
+
+        self.track(name="C", rank_no="1200")
+        self.assertEqual(
+            list(NeetCounsellingSeatAllotmentTracker.objects.order_by("name").values_list("name", "rank_no")),
+            [("A", 1000), ("B", 1000), ("C", 1200)],
+        )
+
+    def test_flush_writes_the_remainder(self):
+        self.track(name="A")
+        self.assertEqual(len(get_lead_buffer()), 1)
+        self.assertEqual(flush_leads(), 1)
+        self.assertEqual(NeetCounsellingSeatAllotmentTracker.objects.get().name, "A")
+
+    def test_invalid_and_anonymous_requests_are_not_recorded(self):
+        self.track(name="A", email="not-an-email")
+        self.track(name="  ")
+        self.track(name="B", cursor="")
+        flush_leads()
+        self.assertEqual(list(NeetCounsellingSeatAllotmentTracker.objects.values_list("name", flat=True)), ["B"])
+
+    @override_settings(TRACKER_BUFFER={"ENABLED": False})
+    def test_disabled_buffer_writes_synchronously(self):
+        self.track(name="A")
+        self.assertEqual(NeetCounsellingSeatAllotmentTracker.objects.count(), 1)
+
+    def test_failing_write_does_not_fail_the_prediction(self):
+        self.addCleanup(setattr, leads, "_buffer", None)
+        failing = mock.patch.object(
+            NeetCounsellingSeatAllotmentTracker.objects, "bulk_create", side_effect=OperationalError("down")
+        )
+        with failing, self.assertLogs("api.leads", "ERROR"):
+            for name in "ABCD":
+                self.track(name=name)
+        # The failed batch waits MAX_DELAY before its retry instead of failing every request
+        self.assertEqual(get_lead_buffer().failures, 1)
+        self.assertEqual(len(get_lead_buffer()), 4)
+
+    def test_batch_is_parked_after_max_retries(self):
+        spool = os.path.join(tempfile.mkdtemp(), "leads.jsonl")
+        self.addCleanup(shutil.rmtree, os.path.dirname(spool))
+        buffer = LeadBuffer(max_size=10, max_delay=60, background=False, max_retries=2, spool_path=spool)
+        buffer.append(build_lead({"name": "A", "rank_no": 1000}))
+        with mock.patch.object(
+            NeetCounsellingSeatAllotmentTracker.objects, "bulk_create", side_effect=OperationalError("down")
+        ), self.assertLogs("api.leads", "ERROR"):
+            for _ in range(2):
+                with self.assertRaises(OperationalError):
+                    buffer.flush()
+
+        self.assertEqual((len(buffer), buffer.parked), (0, 1))
+        with open(spool) as f:
+            self.assertEqual(json.loads(f.readline())["name"], "A")
+
+    def test_overflow_is_parked(self):
+        buffer = LeadBuffer(max_size=1, max_delay=60, background=True, max_pending=2)
+        buffer._start = lambda: None  # no writer thread: the buffer only fills
+        with self.assertLogs("api.leads", "ERROR"):
+            for name in "ABC":
+                buffer.append(build_lead({"name": name}))
+        self.assertEqual([lead.name for lead in buffer._pending], ["B", "C"])
+        self.assertEqual(buffer.parked, 1)
+
+    def test_background_append_leaves_the_write_to_the_thread(self):
+        buffer = LeadBuffer(max_size=1, max_delay=60, background=True)
+        self.addCleanup(buffer._stopped.set)
+        flushed = threading.Event()
+        threads = []
+
+        def flush():
+            threads.append(threading.current_thread())
+            buffer._pending.clear()
+            flushed.set()
+
+        buffer.flush = flush
+        buffer.append(build_lead({"name": "A"}))
+        self.assertTrue(flushed.wait(5))
+        self.assertNotIn(threading.current_thread(), threads)
+
+
+class GroupCategoryListTests(TestCase):
+    def setUp(self):
+        # Rolled-back tests reuse generations, so drop payloads they cached
+        caches["default"].clear()
+        invalidate_group_categories()
+        GroupCategory.objects.create(group_name="MD/MS", category_type="GN")
+        GroupCategory.objects.create(group_name="MD/MS", category_type="OBC")
+        GroupCategory.objects.create(group_name="DNB", category_type="GN")
+
+    def test_grouped_payload_is_cached(self):
+        response = self.client.get(reverse("group-categories-list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), [
+            {"group_name": "DNB", "category_type": ["GN"]},
+            {"group_name": "MD/MS", "category_type": ["GN", "OBC"]},
+        ])
+        self.assertTrue(response["ETag"].startswith('"'))
+        self.assertIn("Last-Modified", response)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(reverse("group-categories-list")).content, response.content)
+
+    def test_last_modified_is_the_time_of_the_last_write(self):
+        GroupCategoryState.objects.update(changed_at=datetime(2025, 1, 2, 3, 4, 5, 600, tzinfo=dt_timezone.utc))
+        first = self.client.get(reverse("group-categories-list"))
+        self.assertEqual(first["Last-Modified"], "Thu, 02 Jan 2025 03:04:05 GMT")
+
+        # Another worker, or a restart, serves the same value
+        caches["default"].clear()
+        self.assertEqual(self.client.get(reverse("group-categories-list"))["Last-Modified"], first["Last-Modified"])
+        response = self.client.get(reverse("group-categories-list"), HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_write_from_another_worker_invalidates(self):
+        etag = self.client.get(reverse("group-categories-list"))["ETag"]
+        # bulk_create sends no signals and leaves this process's cache alone,
+        # like a write handled by another worker
+        GroupCategory.objects.bulk_create([GroupCategory(group_name="DNB", category_type="SC")])
+        GroupCategoryState.objects.update(generation=F("generation") + 1)
+
+        response = self.client.get(reverse("group-categories-list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn({"group_name": "DNB", "category_type": ["GN", "SC"]}, json.loads(response.content))
+
+    def test_if_none_match(self):
+        etag = self.client.get(reverse("group-categories-list"))["ETag"]
+
+        response = self.client.get(reverse("group-categories-list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+        self.assertEqual(response["ETag"], etag)
+
+    def test_upload_invalidates(self):
+        etag = self.client.get(reverse("group-categories-list"))["ETag"]
+        self.client.post(reverse("group-dropdown-upload"), {"group_name": "DNB", "category_type": "SC"}, content_type="application/json")
+
+        response = self.client.get(reverse("group-categories-list"), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn({"group_name": "DNB", "category_type": ["GN", "SC"]}, json.loads(response.content))
+
+
+class GroupDropdownUploadTests(TestCase):
+    def upload(self, payload):
+        return self.client.post(reverse("group-dropdown-upload"), payload, content_type="application/json")
+
+    def test_bulk_upsert_report(self):
+        GroupCategory.objects.create(group_name="MD/MS", category_type="GN")
+        response = self.upload([
+            {"group_name": "md/ms", "category_type": "gn"},
+            {"group_name": " MD/MS ", "category_type": "OBC"},
+            {"group_name": "MD/MS", "category_type": "obc"},
+            {"group_name": "DNB"},
+        ])
+
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual(report["created_count"], 1)
+        self.assertEqual(report["created"], [{
+            "id": GroupCategory.objects.get(category_type="OBC").id, "group_name": "MD/MS", "category_type": "OBC",
+        }])
+        self.assertEqual(report["skipped_count"], 2)
+        self.assertEqual(report["skipped"], [
+            {"group_name": "md/ms", "category_type": "gn"},
+            {"group_name": "MD/MS", "category_type": "obc"},
+        ])
+        self.assertEqual([error["index"] for error in report["errors"]], [3])
+
+    def test_query_count_does_not_grow_with_items(self):
+        items = [{"group_name": f"Group {i % 10}", "category_type": f"Type {i}"} for i in range(200)]
+        # Existing keys, the insert in a savepoint and the cache generation bump;
+        # MySQL adds a read-back of the new ids
+        with CaptureQueriesContext(connection) as queries:
+            response = self.upload(items)
+        statements = [q["sql"] for q in queries if not q["sql"].startswith(("SAVEPOINT", "RELEASE"))]
+        self.assertEqual(len(statements), 3 if connection.features.can_return_rows_from_bulk_insert else 4)
+        self.assertEqual(response.json()["created_count"], 200)
+        self.assertEqual(self.upload(items).json()["skipped_count"], 200)
+
+    def test_database_errors_keep_the_error_key(self):
+        with mock.patch.object(GroupCategory.objects, "bulk_create", side_effect=IntegrityError("batch")), \
+                mock.patch.object(GroupCategory.objects, "create", side_effect=IntegrityError("CHECK failed")):
+            report = self.upload([{"group_name": "DNB", "category_type": "GN"}]).json()
+        self.assertEqual(report["errors"], [{"index": 0, "error": "CHECK failed"}])
+
+    def test_rows_added_concurrently_are_not_reported_as_created(self):
+        GroupCategory.objects.create(group_name="DNB", category_type="GN")
+        GroupCategory.objects.create(group_name="Other", category_type="Upload")
+        # Another upload stored DNB/GN after this one read the existing keys
+        with mock.patch("api.admin.group_dropdown.existing_keys", return_value=set()):
+            report = self.upload([
+                {"group_name": "DNB", "category_type": "gn"},
+                {"group_name": "DNB", "category_type": "OBC"},
+            ]).json()
+
+        self.assertEqual([row["category_type"] for row in report["created"]], ["OBC"])
+        self.assertEqual(report["skipped"], [{"group_name": "DNB", "category_type": "gn"}])
+        self.assertEqual(report["errors"], [])
+
+    def test_unique_key_is_case_insensitive(self):
+        GroupCategory.objects.create(group_name="DNB", category_type="GN")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            GroupCategory.objects.create(group_name="dnb", category_type="gn")
+
+
+class TrackerDataTests(TestCase):
+    def setUp(self):
+        staff = User.objects.create_user("admin", password="pw", is_staff=True)
+        self.client.force_login(staff)
+        for name, email, phone in [
+            ("Anita Rao", "anita@example.com", "9800000001"),
+            ("Arun Kumar", "arun@example.com", "9800000002"),
+            ("Bindu", "bindu@example.com", "9700000003"),
+            ("Chandra Anil", None, None),
+        ]:
+            NeetCounsellingSeatAllotmentTracker.objects.create(name=name, email=email, phone_number=phone, rank_no=10)
+
+    def get(self, **params):
+        return self.client.get(reverse("admin_get_all_tracker_data"), params)
+
+    def test_keyset_pages(self):
+        first = self.get(after="", page_size=3).json()
+        self.assertEqual([r["name"] for r in first["data"]], ["Anita Rao", "Arun Kumar", "Bindu"])
+        self.assertTrue(first["pagination"]["has_next"])
+        self.assertNotIn("total_records", first["pagination"])
+
+        second = self.get(after=first["pagination"]["next_after"], page_size=3, include_count="true").json()
+        self.assertEqual([r["name"] for r in second["data"]], ["Chandra Anil"])
+        self.assertEqual(second["pagination"], {"page_size": 3, "has_next": False, "next_after": None,
+                                                "total_records": 4})
+
+    def names(self, **params):
+        return [r["name"] for r in self.get(**params).json()["data"]]
+
+    def test_columnar_listing(self):
+        for params in ({"after": "", "page_size": 3}, {"page": 1, "page_size": 3}):
+            with self.subTest(params=params):
+                rows = self.get(**params).json()
+                columnar = self.get(format="columnar", **params).json()
+                self.assertEqual(
+                    [dict(zip(columnar["columns"], row))["name"] for row in columnar["data"]],
+                    [row["name"] for row in rows["data"]],
+                )
+                self.assertEqual(columnar["pagination"], rows["pagination"])
+
+    def test_search_modes(self):
+        self.assertEqual(self.names(search="anil"), ["Chandra Anil"])
+        self.assertEqual(self.names(search="AR", match="prefix"), ["Arun Kumar"])
+        self.assertEqual(self.names(search="bindu@", match="prefix"), ["Bindu"])
+        self.assertEqual(self.names(search="98", match="prefix"), ["Anita Rao", "Arun Kumar"])
+        self.assertEqual(self.names(search="anil", match="prefix"), [])
+        self.assertEqual(self.get(search="a", match="fuzzy").status_code, 400)
+
+    def test_prefix_search_uses_indexes(self):
+        if connection.vendor != "sqlite":
+            self.skipTest(f"No plan assertions for {connection.vendor}")
+        plan = search_filter(NeetCounsellingSeatAllotmentTracker.objects.all(), "ar", "prefix").explain()
+        for index in ("tracker_name_idx", "tracker_email_idx", "tracker_phone_idx"):
+            self.assertIn(index, plan)
+
+    def test_export_reads_keyset_pages(self):
+        queryset = NeetCounsellingSeatAllotmentTracker.objects.order_by("seqno")
+        with CaptureQueriesContext(connection) as queries:
+            names = [row["name"] for row in keyset_rows(queryset, chunk_size=3)]
+        self.assertEqual(names, ["Anita Rao", "Arun Kumar", "Bindu", "Chandra Anil"])
+        self.assertEqual(len(queries), 2)
+        self.assertTrue(all("LIMIT 3" in query["sql"] for query in queries))
+
+    def test_streaming_exports(self):
+        response = self.get(format="csv", search="a", match="prefix")
+        self.assertTrue(response.streaming)
+        lines = b"".join(response.streaming_content).decode().splitlines()
+        self.assertTrue(lines[0].startswith("seqno,name,phone_number"))
+        self.assertEqual(len(lines), 3)
+
+        response = self.get(format="ndjson")
+        records = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual([r["name"] for r in records], ["Anita Rao", "Arun Kumar", "Bindu", "Chandra Anil"])
+        self.assertEqual(self.get(format="xml").status_code, 400)
+
+    def test_page_mode_is_unchanged(self):
+        response = self.get(page=2, page_size=3).json()
+        self.assertEqual(response["pagination"]["total_records"], 4)
+        self.assertEqual([r["name"] for r in response["data"]], ["Chandra Anil"])
+
+
+class TrackerStatsTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user("admin", password="pw", is_staff=True))
+        for state, category in [("Kerala", "GN"), ("Kerala", "OBC"), ("Delhi", "GN"), (None, None)]:
+            NeetCounsellingSeatAllotmentTracker.objects.create(
+                name="Lead", state=state, category=category, allotment_category="NEET_PG",
+            )
+
+    def stats(self, **params):
+        response = self.client.get(reverse("admin_get_tracker_stats"), params)
+        return response.json()["statistics"] if response.status_code == 200 else response
+
+    def test_counts_come_from_the_rollup(self):
+        with self.assertNumQueries(3):  # session + user, then one rollup query
+            stats = self.stats()
+        self.assertEqual(stats["total_records"], 4)
+        self.assertEqual(stats["by_allotment_category"], [{"allotment_category": "NEET_PG", "count": 4}])
+        self.assertEqual(stats["by_state"][0], {"state": "Kerala", "count": 2})
+        self.assertIn({"category": None, "count": 1}, stats["by_category"])
+
+    @override_settings(TRACKER_BUFFER={"MAX_SIZE": 10, "MAX_DELAY": 60, "BACKGROUND": False})
+    def test_buffered_leads_and_deletes_are_counted(self):
+        make_allotment()
+        reset_prediction_state()
+        self.client.post(reverse("allotment-tracker"), {"name": "New", "state": "Goa", "rank_no": 1},
+                         content_type="application/json")
+        flush_leads()
+        NeetCounsellingSeatAllotmentTracker.objects.filter(state="Delhi").delete()
+
+        stats = self.stats()
+        self.assertEqual(stats["total_records"], 4)
+        self.assertIn({"state": "Goa", "count": 1}, stats["by_state"])
+        self.assertNotIn("Delhi", [row["state"] for row in stats["by_state"]])
+
+    def test_rebuild_matches_incremental_counts(self):
+        before = sorted(TrackerDailyStat.objects.filter(count__gt=0).values_list("day", "dimension", "value", "count"))
+        rebuild_tracker_stats()
+        after = sorted(TrackerDailyStat.objects.values_list("day", "dimension", "value", "count"))
+        self.assertEqual(before, after)
+
+    def test_date_range_and_buckets(self):
+        today = timezone.localdate()
+        stats = self.stats(**{"from": today.isoformat(), "bucket": "month"})
+        self.assertEqual(stats["total_records"], 4)
+        self.assertEqual(stats["buckets"], [{"period": today.replace(day=1).isoformat(), "count": 4}])
+
+        self.assertEqual(self.stats(to=(today - timedelta(days=1)).isoformat())["total_records"], 0)
+        self.assertEqual(self.stats(bucket="year").status_code, 400)
+        self.assertEqual(self.stats(**{"from": "yesterday"}).status_code, 400)
+
+
+class BenchmarkCommandTests(TestCase):
+    def test_generate_and_benchmark(self):
+        reset_prediction_state()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = self.settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        call_command("generate_allotments", rows=3000, years=[2023, 2024], leads=40, stdout=io.StringIO())
+        self.assertEqual(active_years(published_version_id()), {"NEET_PG": 2024, "NEET_SS": 2024, "NEET_MDS": 2024})
+        self.assertEqual(NeetCounsellingSeatAllotmentTracker.objects.count(), 40)
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "results.json")
+            version_id = published_version_id()
+            call_command("benchmark_api", requests=5, uploads=1, upload_rows=200, output=output,
+                         stdout=io.StringIO())
+            with open(output) as f:
+                report = json.load(f)
+
+        self.assertEqual(published_version_id(), version_id)
+        self.assertEqual(set(report["endpoints"]), {
+            "allotment_tracker", "group_categories", "group_categories_304", "user_data", "upload",
+        })
+        for name, result in report["endpoints"].items():
+            with self.subTest(endpoint=name):
+                self.assertEqual(result["errors"], 0)
+                self.assertIn("p99_ms", result)
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        reset_prediction_state()
+        get_histogram().clear()
+        make_allotment(rank_no=1500)
+
+    def timing(self, response):
+        return dict(part.split(";dur=") for part in
+                    (entry.split(";desc=")[0].strip() for entry in response["Server-Timing"].split(",")))
+
+    def test_server_timing_and_log_line(self):
+        with self.assertLogs("api.metrics", "INFO") as logs:
+            response = self.client.post(reverse("allotment-tracker"), {"rank_no": 1000},
+                                        content_type="application/json")
+
+        self.assertEqual(set(self.timing(response)), {"db", "serialize", "total"})
+        self.assertGreater(float(self.timing(response)["serialize"]), 0)
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual((line["view"], line["status"]), ("AllotmentTrackerAPIView", 200))
+        self.assertGreater(line["queries"], 0)
+
+    def test_prometheus_endpoint(self):
+        self.client.post(reverse("allotment-tracker"), {"rank_no": 1000}, content_type="application/json")
+        self.assertEqual(self.client.get(reverse("admin_request_metrics")).status_code, 401)
+
+        self.client.force_login(User.objects.create_user("admin", password="pw", is_staff=True))
+        body = self.client.get(reverse("admin_request_metrics")).content.decode()
+        self.assertIn('api_request_duration_seconds_count{view="AllotmentTrackerAPIView"} 1', body)
+        self.assertIn('api_requests_total{view="AllotmentTrackerAPIView",status="200"} 1', body)
+        self.assertIn('api_request_duration_seconds_bucket{view="AllotmentTrackerAPIView",le="+Inf"} 1', body)
+
+    def test_json_response_encoding_is_timed(self):
+        encode = DjangoJSONEncoder.encode
+
+        def slow_encode(encoder, data):
+            time.sleep(0.01)
+            return encode(encoder, data)
+
+        with mock.patch.object(DjangoJSONEncoder, "encode", slow_encode):
+            response = self.client.get(reverse("admin_request_metrics"))
+        self.assertEqual(response.status_code, 401)
+        self.assertGreaterEqual(float(self.timing(response)["serialize"]), 10)
+
+
+class AsyncRequestMetricsTests(TransactionTestCase):
+    def setUp(self):
+        reset_prediction_state()
+        get_histogram().clear()
+        make_allotment(rank_no=1500)
+
+    async def test_asgi_requests_are_measured(self):
+        response = await self.async_client.post(
+            reverse("allotment-tracker"), {"rank_no": 1000}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertRegex(response["Server-Timing"], r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+        self.assertIn('view="AllotmentTrackerAPIView"', get_histogram().render())
+
+
+class AsyncViewTests(TransactionTestCase):
+    def setUp(self):
+        reset_prediction_state()
+        invalidate_group_categories()
+        self.factory = AsyncRequestFactory()
+        for rank_no in (900, 1500, 2500):
+            make_allotment(rank_no=rank_no)
+        make_allotment(rank_no=1800, state="Delhi", allotment_category="NEET_SS")
+        rebuild_summary(published_version_id())
+        rebuild_chances(published_version_id())
+        GroupCategory.objects.create(group_name="MD/MS", category_type="GN")
+        self.payloads = [
+            {"rank_no": 1000},
+            {"rank_no": 1000, "allotment_category": "neet_pg", "page_size": 1},
+            {"rank_no": 1000, "state": "Delhi", "mode": "summary"},
+            {"rank_no": 1000, "mode": "chance", "page_size": 1},
+        ]
+        self.expected = [
+            self.client.post(reverse("allotment-tracker"), payload, content_type="application/json").json()
+            for payload in self.payloads
+        ]
+
+    async def track(self, body, content_type="application/json"):
+        request = self.factory.post(reverse("allotment-tracker"), body, content_type=content_type)
+        return await AsyncAllotmentTrackerView.as_view()(request)
+
+    async def assert_matches_sync_view(self):
+        reset_prediction_state()
+        for payload, expected in zip(self.payloads, self.expected):
+            response = await self.track(payload)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.content), expected)
+
+    async def test_tracker_matches_sync_view(self):
+        await self.assert_matches_sync_view()
+
+    @override_settings(PREDICTION_ENGINE_ENABLED=False)
+    async def test_tracker_matches_sync_view_without_engine(self):
+        await self.assert_matches_sync_view()
+
+    @override_settings(TRACKER_BUFFER={"ENABLED": False})
+    async def test_lead_is_recorded_with_the_search(self):
+        response = await self.track({"rank_no": 1000, "name": "A", "email": "a@example.com"})
+        self.assertEqual(json.loads(response.content)["filtered_results_count"], 3)
+        self.assertEqual(await NeetCounsellingSeatAllotmentTracker.objects.filter(name="A").acount(), 1)
+
+    async def test_failed_lead_does_not_fail_the_search(self):
+        with mock.patch("api.async_views.arecord_lead", side_effect=RuntimeError("lead store down")), \
+                self.assertLogs("api.async_views", "ERROR"):
+            response = await self.track({"rank_no": 1000, "name": "A"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)["filtered_results_count"], 3)
+
+    async def test_columnar_format(self):
+        request = self.factory.post(
+            reverse("allotment-tracker") + "?format=columnar", {"rank_no": 1000}, content_type="application/json"
+        )
+        response = await AsyncAllotmentTrackerView.as_view()(request)
+        self.assertEqual(response["Content-Type"], renderers.COLUMNAR_MEDIA_TYPE)
+        body = json.loads(response.content)
+        self.assertEqual(
+            [dict(zip(body["columns"], row)) for row in body["filtered_results"]],
+            self.expected[0]["filtered_results"],
+        )
+
+    async def test_bad_requests(self):
+        self.assertEqual((await self.track({"rank_no": "abc"})).status_code, 400)
+        self.assertEqual((await self.track("{", content_type="application/json")).status_code, 400)
+
+    async def test_group_categories_conditional_get(self):
+        view = AsyncGroupCategoryListView.as_view()
+        response = await view(self.factory.get(reverse("group-categories-list")))
+        self.assertEqual(json.loads(response.content), [{"group_name": "MD/MS", "category_type": ["GN"]}])
+
+        etag = response["ETag"]
+        response = await view(self.factory.get(reverse("group-categories-list"), headers={"If-None-Match": etag}))
+        self.assertEqual(response.status_code, 304)
+
+
+class ConnectionPoolTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def wrapper(self, size):
+        settings_dict = {
+            **connection.settings_dict,
+            "ENGINE": "seatpredictor.db.sqlite3",
+            "NAME": os.path.join(self.directory.name, "pool.sqlite3"),
+            "POOL": {"SIZE": size, "TIMEOUT": 0.05},
+        }
+        return PooledSQLiteWrapper(settings_dict, alias=f"pool-test-{size}")
+
+    def test_connections_are_capped_per_process(self):
+        first, second = self.wrapper(1), self.wrapper(1)
+        first.ensure_connection()
+        with self.assertRaisesMessage(OperationalError, "All 1 connections"):
+            second.ensure_connection()
+
+        first.close()
+        second.ensure_connection()
+        second.close()
+
+    def test_capped_connection_is_released_at_request_end(self):
+        first, second = self.wrapper(1), self.wrapper(1)
+        first.ensure_connection()
+        first.close_if_unusable_or_obsolete()
+        self.assertIsNone(first.connection)
+
+        second.ensure_connection()
+        second.close()
+
+    def test_unbounded_pool(self):
+        wrappers = [self.wrapper(0) for _ in range(3)]
+        for wrapper in wrappers:
+            wrapper.ensure_connection()
+        for wrapper in wrappers:
+            wrapper.close()
+
+    def test_benchmark_command(self):
+        make_allotment(rank_no=1500)
+        output = os.path.join(self.directory.name, "connections.json")
+        call_command("benchmark_connections", requests=3, output=output, stdout=io.StringIO())
+        with open(output) as f:
+            report = json.load(f)
+        self.assertEqual(set(report["modes"]), {"per_request", "persistent"})
+        self.assertEqual(report["modes"]["persistent"]["requests"], 3)
+
+
+class JSONRendererTests(TestCase):
+    def test_stdlib_fallback_matches_orjson(self):
+        data = {"name": "Ānanya", 1: [Decimal("1.50"), timezone.now(), (1, None)]}
+        fast = renderers.dumps(data)
+        with mock.patch.object(renderers, "orjson", None):
+            self.assertEqual(renderers.dumps(data), fast)
+        self.assertEqual(json.loads(fast)["name"], "Ānanya")
+
+
+class UploadJobTests(TestCase):
+    def setUp(self):
+        reset_prediction_state()
+        media = tempfile.TemporaryDirectory()
+        self.addCleanup(media.cleanup)
+        media_root = self.settings(MEDIA_ROOT=media.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+        self.client = APIClient()
+
+    def upload(self, file):
+        response = self.client.post(reverse("neet-excel-upload"), {"file": file}, format="multipart")
+        self.assertEqual(response.status_code, 202)
+        return response.data["job_id"]
+
+    def status(self, job_id):
+        return self.client.get(reverse("upload-job-status", args=[job_id])).json()
+
+    def test_upload_is_loaded_by_the_worker(self):
+        job_id = self.upload(make_sheet([sheet_row(10), sheet_row("abc"), sheet_row(30)], name="round1.csv"))
+        self.assertEqual(self.status(job_id)["status"], "queued")
+        self.assertIsNone(published_version_id())
+
+        call_command("process_upload_jobs", once=True, stdout=io.StringIO())
+
+        status = self.status(job_id)
+        self.assertEqual(status["status"], "done")
+        self.assertEqual((status["rows_done"], status["error_rows"]), (3, 1))
+        self.assertEqual(status["dataset_version"], published_version_id())
+        self.assertEqual(DatasetVersion.objects.get(pk=published_version_id()).source_name, "round1.csv")
+        self.assertFalse(UploadJob.objects.get(pk=job_id).file)
+
+    def test_delta_job(self):
+        ingest_allotments(make_sheet([sheet_row(10), sheet_row(20)]))
+        response = self.client.post(
+            reverse("neet-excel-upload"), {"file": make_sheet([sheet_row(10), sheet_row(30)]), "mode": "delta"},
+            format="multipart",
+        )
+        self.assertEqual(response.status_code, 202)
+
+        call_command("process_upload_jobs", once=True, stdout=io.StringIO())
+
+        status = self.status(response.data["job_id"])
+        self.assertEqual((status["status"], status["mode"]), ("done", "delta"))
+        self.assertEqual((status["stats"]["inserted"], status["stats"]["retired"]), (1, 1))
+        self.assertEqual(sorted(r["rank_no"] for r in prediction_queryset({"rank_no": 0})), [10, 30])
+
+    def test_unknown_mode_is_rejected(self):
+        response = self.client.post(
+            reverse("neet-excel-upload"), {"file": make_sheet([sheet_row(10)]), "mode": "merge"}, format="multipart",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UploadJob.objects.exists())
+
+    def test_failed_job_keeps_published_data(self):
+        ingest_allotments(make_sheet([sheet_row(10)]))
+        version_id = published_version_id()
+        job_id = self.upload(SimpleUploadedFile("broken.xlsx", b"not a workbook"))
+
+        call_command("process_upload_jobs", once=True, stdout=io.StringIO())
+
+        status = self.status(job_id)
+        self.assertEqual(status["status"], "failed")
+        self.assertTrue(status["error"])
+        self.assertEqual(published_version_id(), version_id)
+
+    def test_failed_job_keeps_reported_progress(self):
+        def ingest(file, progress, source_name, started):
+            progress(2, 1)
+            raise SheetError("Row 3 is broken")
+
+        job_id = self.upload(make_sheet([sheet_row(10)]))
+        with mock.patch("api.upload_jobs.ingest_allotments", side_effect=ingest), self.assertLogs("api.upload_jobs"):
+            process_next_job()
+
+        status = self.status(job_id)
+        self.assertEqual((status["status"], status["rows_done"], status["error_rows"]), ("failed", 2, 1))
+
+    def test_stale_running_job_is_requeued(self):
+        job_id = self.upload(make_sheet([sheet_row(10)]))
+        self.assertEqual(claim_job().pk, job_id)
+        self.assertIsNone(claim_job())
+
+        stale = timezone.now() - timedelta(minutes=10)
+        UploadJob.objects.filter(pk=job_id).update(updated_at=stale)
+        with self.assertLogs("api.upload_jobs", "WARNING"):
+            self.assertEqual(claim_job().pk, job_id)
+        self.assertEqual(UploadJob.objects.get(pk=job_id).attempts, 2)
+
+    def test_rows_of_a_dead_worker_are_collected(self):
+        job_id = self.upload(make_sheet([sheet_row(10), sheet_row(20)]))
+        # The worker dies after loading the rows, before the version is ready
+        with mock.patch("api.admin.ingest.rebuild_summary", side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                process_next_job()
+        abandoned = UploadJob.objects.get(pk=job_id).dataset_version_id
+        self.assertEqual(NeetCounsellingSeatAllotment.objects.filter(dataset_version_id=abandoned).count(), 2)
+
+        UploadJob.objects.filter(pk=job_id).update(updated_at=timezone.now() - timedelta(minutes=10))
+        with self.assertLogs("api.upload_jobs", "WARNING"):
+            requeue_stale_jobs()
+        collect_versions()
+
+        self.assertFalse(NeetCounsellingSeatAllotment.objects.filter(dataset_version_id=abandoned).exists())
+        self.assertFalse(DatasetVersion.objects.filter(pk=abandoned).exists())
+        self.assertEqual(process_next_job().status, UploadJob.STATUS_DONE)
+        self.assertEqual(NeetCounsellingSeatAllotment.objects.count(), 2)
+
+    @override_settings(UPLOAD_JOB_MAX_ATTEMPTS=1)
+    def test_stale_job_fails_after_max_attempts(self):
+        job_id = self.upload(make_sheet([sheet_row(10)]))
+        claim_job()
+        UploadJob.objects.filter(pk=job_id).update(updated_at=timezone.now() - timedelta(minutes=10))
+
+        self.assertIsNone(claim_job())
+        self.assertEqual(self.status(job_id)["status"], "failed")
+
+    def test_progress_is_reported_per_chunk(self):
+        calls = []
+        ingest_allotments(make_sheet([sheet_row(rank) for rank in (10, 20, 30)]), chunk_size=2,
+                          progress=lambda rows, error_rows: calls.append(rows))
+        self.assertEqual(calls, [2, 3])
+
+    @override_settings(UPLOAD_LOCK_TIMEOUT=0.01)
+    def test_uploads_do_not_interleave(self):
+        with advisory_lock(UPLOAD_LOCK):
+            with self.assertRaises(LockTimeout):
+                ingest_allotments(make_sheet([sheet_row(10)]))
+        self.assertFalse(DatasetVersion.objects.exists())
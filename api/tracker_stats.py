@@ -0,0 +1,128 @@
+"""
+Rollup of tracker (lead) counts for admin/user-data/stats/.
+
+TrackerDailyStat keeps one counter per created_at day and value of each
+STAT_DIMENSIONS field. record_leads() adds a batch of tracker rows to the
+counters: api.leads calls it next to its bulk_create, and the signal
+receivers below cover single saves and deletes. Statistics are then summed
+from the rollup, so their cost depends on the number of days and distinct
+values, not on the number of leads. rebuild_tracker_stats() recomputes the
+rollup from the tracker table if it ever drifts (e.g. after raw SQL edits).
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate, TruncMonth, TruncWeek
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import NeetCounsellingSeatAllotmentTracker, TrackerDailyStat
+
+
+# Tracker field -> key of its breakdown in the stats response
+STAT_DIMENSIONS = {
+    "allotment_category": "by_allotment_category",
+    "state": "by_state",
+    "category": "by_category",
+}
+BUCKETS = {"day": None, "week": TruncWeek, "month": TruncMonth}
+
+
+def count_leads(leads):
+    """Counter of (day, dimension, value) for saved tracker instances."""
+    counts = Counter()
+    for lead in leads:
+        day = timezone.localdate(lead.created_at) if lead.created_at else timezone.localdate()
+        for dimension in STAT_DIMENSIONS:
+            counts[(day, dimension, getattr(lead, dimension) or "")] += 1
+    return counts
+
+
+def apply_counts(counts, sign=1):
+    """Add (or with sign=-1 subtract) counts to the rollup."""
+    if not counts:
+        return
+    with transaction.atomic():
+        # Make sure every counter row exists, then increment in place so
+        # concurrent writers never overwrite each other.
+        TrackerDailyStat.objects.bulk_create(
+            [TrackerDailyStat(day=day, dimension=dimension, value=value) for day, dimension, value in counts],
+            ignore_conflicts=True,
+        )
+        for (day, dimension, value), n in counts.items():
+            TrackerDailyStat.objects.filter(day=day, dimension=dimension, value=value).update(
+                count=F("count") + sign * n
+            )
+
+
+def record_leads(leads, sign=1):
+    apply_counts(count_leads(leads), sign)
+
+
+def rebuild_tracker_stats():
+    """Recompute the whole rollup from the tracker table. Returns the number of counter rows."""
+    counts = Counter()
+    leads = NeetCounsellingSeatAllotmentTracker.objects.annotate(day=TruncDate("created_at"))
+    for dimension in STAT_DIMENSIONS:
+        for row in leads.values("day", dimension).annotate(n=Count("seqno")).order_by():
+            counts[(row["day"], dimension, row[dimension] or "")] += row["n"]
+    with transaction.atomic():
+        TrackerDailyStat.objects.all().delete()
+        TrackerDailyStat.objects.bulk_create(
+            [TrackerDailyStat(day=day, dimension=dimension, value=value, count=n)
+             for (day, dimension, value), n in counts.items()],
+            batch_size=1000,
+        )
+    return len(counts)
+
+
+def tracker_stats(start=None, end=None, bucket=None):
+    """
+    Statistics for leads created between the start and end dates (inclusive,
+    either may be None). With bucket ("day", "week" or "month") the totals
+    per period are included as well.
+    """
+    if bucket is not None and bucket not in BUCKETS:
+        raise ValueError("bucket must be 'day', 'week' or 'month'")
+
+    stats = TrackerDailyStat.objects.all()
+    if start is not None:
+        stats = stats.filter(day__gte=start)
+    if end is not None:
+        stats = stats.filter(day__lte=end)
+
+    breakdowns = {key: [] for key in STAT_DIMENSIONS.values()}
+    rows = stats.values("dimension", "value").annotate(total=Sum("count")).filter(total__gt=0).order_by("-total")
+    for row in rows:
+        breakdowns[STAT_DIMENSIONS[row["dimension"]]].append(
+            {row["dimension"]: row["value"] or None, "count": row["total"]}
+        )
+
+    # Every lead is counted once per dimension; total it from one of them
+    first = next(iter(STAT_DIMENSIONS))
+    result = {"total_records": sum(item["count"] for item in breakdowns[STAT_DIMENSIONS[first]]), **breakdowns}
+
+    if bucket is not None:
+        trunc = BUCKETS[bucket]
+        period = trunc("day") if trunc else F("day")
+        periods = (
+            stats.filter(dimension=first).annotate(period=period)
+            .values("period").annotate(total=Sum("count")).order_by("period")
+        )
+        result["buckets"] = [
+            {"period": row["period"].isoformat()[:10], "count": row["total"]} for row in periods
+        ]
+    return result
+
+
+@receiver(post_save, sender=NeetCounsellingSeatAllotmentTracker)
+def _tracker_saved(instance, created, raw=False, **kwargs):
+    if created and not raw:
+        record_leads([instance])
+
+
+@receiver(post_delete, sender=NeetCounsellingSeatAllotmentTracker)
+def _tracker_deleted(instance, **kwargs):
+    record_leads([instance], sign=-1)
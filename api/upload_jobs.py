@@ -0,0 +1,184 @@
+"""
+Background loading of uploaded allotment sheets.
+
+upload-excel/ stores the file and creates an UploadJob, then returns at
+once. The process_upload_jobs command claims queued jobs one at a time
+(SKIP LOCKED, so several workers can run) and loads them through
+ingest_allotments(), saving rows done and error rows on the job after
+every chunk for upload-jobs/<id>/ to report. The stored file is deleted
+once the job has loaded; a failed job keeps it for inspection. Jobs in
+delta mode go through ingest_delta() instead and change only the rows of
+the published version that differ from the sheet.
+
+While a job runs, a heartbeat thread touches its updated_at every
+UPLOAD_JOB_HEARTBEAT seconds, also through the steps that report no
+progress (waiting for the upload lock, rebuilding summaries). A running
+job silent for UPLOAD_JOB_STALE_AFTER seconds lost its worker: claim_job()
+queues it again, or marks it failed once it has been claimed
+UPLOAD_JOB_MAX_ATTEMPTS times. Loads are all-or-nothing, so a rerun is safe:
+the job records the version it loads into, and that version is marked
+failed with it, for collect_versions() to delete its partial rows.
+"""
+import logging
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .admin.ingest import ingest_allotments, ingest_delta
+from .models import DatasetVersion, UploadJob
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEARTBEAT = 30
+DEFAULT_STALE_AFTER = 300
+DEFAULT_MAX_ATTEMPTS = 3
+
+
+def enqueue_upload(file, mode=UploadJob.MODE_FULL):
+    """Store an uploaded sheet and queue it for a full or delta load. Returns the UploadJob."""
+    return UploadJob.objects.create(file=file, source_name=(file.name or "")[:255], mode=mode)
+
+
+def requeue_stale_jobs():
+    """
+    Queue again the running jobs whose heartbeat stopped, or fail those
+    claimed UPLOAD_JOB_MAX_ATTEMPTS times. Returns the number requeued.
+    """
+    now = timezone.now()
+    stale = UploadJob.objects.filter(
+        status=UploadJob.STATUS_RUNNING,
+        updated_at__lt=now - timedelta(seconds=getattr(settings, "UPLOAD_JOB_STALE_AFTER", DEFAULT_STALE_AFTER)),
+    )
+    # The versions they were loading are abandoned; collect_versions() deletes failed ones
+    DatasetVersion.objects.filter(
+        pk__in=list(stale.exclude(dataset_version=None).values_list("dataset_version_id", flat=True)),
+        status=DatasetVersion.STATUS_LOADING,
+    ).update(status=DatasetVersion.STATUS_FAILED)
+    max_attempts = getattr(settings, "UPLOAD_JOB_MAX_ATTEMPTS", DEFAULT_MAX_ATTEMPTS)
+    stale.filter(attempts__gte=max_attempts).update(
+        status=UploadJob.STATUS_FAILED, error=f"Worker stopped responding ({max_attempts} attempts)",
+        dataset_version=None, finished_at=now, updated_at=now,
+    )
+    requeued = stale.filter(attempts__lt=max_attempts).update(
+        status=UploadJob.STATUS_QUEUED, rows_done=0, error_rows=0, dataset_version=None, updated_at=now,
+    )
+    if requeued:
+        logger.warning("Requeued %d upload jobs whose worker stopped responding", requeued)
+    return requeued
+
+
+def claim_job():
+    """The oldest queued job, marked running, or None if there is none. Requeues stale jobs first."""
+    requeue_stale_jobs()
+    with transaction.atomic():
+        job = (
+            UploadJob.objects.select_for_update(skip_locked=True)
+            .filter(status=UploadJob.STATUS_QUEUED)
+            .order_by("created_at", "pk")
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = UploadJob.STATUS_RUNNING
+        job.started_at = timezone.now()
+        job.attempts = F("attempts") + 1
+        job.save(update_fields=["status", "started_at", "attempts", "updated_at"])
+    job.refresh_from_db(fields=["attempts"])
+    return job
+
+
+@contextmanager
+def heartbeat(job):
+    """Touch the job's updated_at every UPLOAD_JOB_HEARTBEAT seconds from a thread while the block runs."""
+    stopped = threading.Event()
+    interval = getattr(settings, "UPLOAD_JOB_HEARTBEAT", DEFAULT_HEARTBEAT)
+
+    def beat():
+        try:
+            while not stopped.wait(interval):
+                try:
+                    UploadJob.objects.filter(pk=job.pk, status=UploadJob.STATUS_RUNNING).update(
+                        updated_at=timezone.now()
+                    )
+                except Exception:
+                    logger.exception("Heartbeat of upload job %s failed", job.pk)
+        finally:
+            connection.close()
+
+    thread = threading.Thread(target=beat, name=f"upload-job-{job.pk}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def run_job(job):
+    """Load a claimed job's sheet, recording progress and the outcome on the job."""
+    def progress(rows, error_rows):
+        UploadJob.objects.filter(pk=job.pk).update(
+            rows_done=rows, error_rows=error_rows, updated_at=timezone.now()
+        )
+
+    def started(version_id):
+        UploadJob.objects.filter(pk=job.pk).update(dataset_version_id=version_id)
+
+    ingest = ingest_delta if job.mode == UploadJob.MODE_DELTA else ingest_allotments
+    try:
+        with heartbeat(job), job.file.open("rb") as file:
+            stats = ingest(file, progress=progress, source_name=job.source_name, started=started)
+    except Exception as e:
+        logger.exception("Upload job %s failed", job.pk)
+        job.status = UploadJob.STATUS_FAILED
+        job.error = str(e)
+        # rows_done and error_rows keep what progress() stored
+        fields = ["status", "error"]
+    else:
+        job.status = UploadJob.STATUS_DONE
+        job.stats = stats
+        job.rows_done = stats["rows"]
+        job.error_rows = stats["error_rows"]
+        job.dataset_version_id = stats["dataset_version"]
+        job.file.delete(save=False)
+        fields = ["status", "stats", "rows_done", "error_rows", "dataset_version", "file"]
+    job.finished_at = timezone.now()
+    job.save(update_fields=[*fields, "finished_at", "updated_at"])
+    job.refresh_from_db(fields=["rows_done", "error_rows"])
+    return job
+
+
+def process_next_job():
+    """Claim and run the oldest queued job. Returns it, or None if the queue is empty."""
+    job = claim_job()
+    return run_job(job) if job is not None else None
+
+
+def job_status(job):
+    """Status payload of upload-jobs/<id>/."""
+    rows_per_second = None
+    if job.started_at is not None:
+        seconds = ((job.finished_at or timezone.now()) - job.started_at).total_seconds()
+        rows_per_second = round(job.rows_done / seconds, 1) if seconds > 0 else None
+    return {
+        "job_id": job.pk,
+        "status": job.status,
+        "mode": job.mode,
+        "source_name": job.source_name,
+        "rows_done": job.rows_done,
+        "rows_per_second": rows_per_second,
+        "error_rows": job.error_rows,
+        "attempts": job.attempts,
+        "error": job.error,
+        "dataset_version": job.dataset_version_id,
+        "stats": job.stats,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+    }
@@ -1,16 +1,27 @@
+from django.conf import settings
 from django.urls import path
+from .async_views import AsyncAllotmentTrackerView, AsyncGroupCategoryListView
 from .views import AllotmentTrackerAPIView, GroupCategoryListAPIView, admin_register, AdminLoginView, AdminRefreshView
-from api.admin.excel_upload import NeetExcelUploadAPIView
+from api.admin.excel_upload import NeetExcelUploadAPIView, UploadJobStatusAPIView
 from api.admin.group_dropdown import GroupDropdownUploadAPIView
 from . import views
 
 
+# Async versions of the public read endpoints for ASGI deployments (see api/async_views.py)
+if getattr(settings, "ASYNC_VIEWS", False):
+    allotment_tracker_view = AsyncAllotmentTrackerView.as_view()
+    group_categories_view = AsyncGroupCategoryListView.as_view()
+else:
+    allotment_tracker_view = AllotmentTrackerAPIView.as_view()
+    group_categories_view = GroupCategoryListAPIView.as_view()
+
 
 urlpatterns = [
-    path("allotment_tracker/", AllotmentTrackerAPIView.as_view(), name="allotment-tracker"),
+    path("allotment_tracker/", allotment_tracker_view, name="allotment-tracker"),
     path('upload-excel/', NeetExcelUploadAPIView.as_view(), name='neet-excel-upload'),
+    path('upload-jobs/<int:job_id>/', UploadJobStatusAPIView.as_view(), name='upload-job-status'),
     path('admin/group-dropdown/', GroupDropdownUploadAPIView.as_view(), name='group-dropdown-upload'),
-    path('group-categories/', GroupCategoryListAPIView.as_view(), name='group-categories-list'),
+    path('group-categories/', group_categories_view, name='group-categories-list'),
     path("send-results-email/", views.send_results_email, name="send_results_email"),
     
     
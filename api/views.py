@@ -1,16 +1,21 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework import status
-from .models import NeetCounsellingSeatAllotmentTracker, NeetCounsellingSeatAllotment
+from .models import NeetCounsellingSeatAllotmentTracker
 from .serializers import NeetCounsellingSeatAllotmentTrackerSerializer
+from .chances import CHANCE_FIELDS, chance_page
+from .group_categories import group_categories_payload
+from .leads import record_lead
+from .prediction import RESULT_FIELDS, predict_page, predict_rows
+from .renderers import COLUMNAR_FORMAT, ColumnarJSONRenderer, JsonResponse
+from .summary import SUMMARY_FIELDS, summary_page
+from rest_framework.settings import api_settings
 from rest_framework.views import APIView
-from itertools import groupby
-from operator import itemgetter
 
-from .models import GroupCategory
-
-from django.core.mail import EmailMultiAlternatives
-from django.http import JsonResponse
+from .mail import enqueue_email, render_results_email, results_email_max_rows
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 import json
@@ -38,67 +43,61 @@ def create_allotment(request):
 
 
 
+# allotment_tracker/ modes: (page function, result columns)
+TRACKER_MODES = {
+    "allotments": (predict_page, RESULT_FIELDS),
+    "summary": (summary_page, SUMMARY_FIELDS),
+    "chance": (chance_page, CHANCE_FIELDS),
+}
+
+
 class AllotmentTrackerAPIView(APIView):
     permission_classes = []  # Public endpoint (no authentication)
+    # Columnar rows on request (see api/renderers.py)
+    renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, ColumnarJSONRenderer]
 
     def post(self, request):
         data = request.data
 
+        cursor = data.get("cursor") or request.query_params.get("cursor")
+
         # Conditionally save tracker record ONLY if a non-empty name is provided
+        # (first page only; follow-up pages carry a cursor)
         name = (data.get("name") or "").strip()
-        if name:
-            tracker_serializer = NeetCounsellingSeatAllotmentTrackerSerializer(data=data)
-            if tracker_serializer.is_valid():
-                tracker_serializer.save()  # Save for record-keeping
-            # If invalid for other reasons, ignore and continue to filtering
-
-        # Build filter dictionary for NeetCounsellingSeatAllotment
-        filters = {"is_active": True}  # Only active records
-
-        rank_no = data.get("rank_no")
-        if rank_no not in (None, ""):
-            filters["rank_no__gte"] = rank_no
-
-        state = data.get("state")
-        if state and str(state).lower() != "all india":
-            filters["state__iexact"] = state
-
-        allotment_category = data.get("allotment_category")
-        if allotment_category:
-            filters["allotment_category__iexact"] = allotment_category
-
-        qualifying_group_or_course = data.get("qualifying_group_or_course")
-        if qualifying_group_or_course:
-            filters["qualifying_group_or_course__iexact"] = qualifying_group_or_course
-
-        specialization = data.get("specialization")
-        if specialization:
-            filters["speciality__iexact"] = specialization
-
-        category = data.get("category")
-        if category:
-            filters["allotted_category__iexact"] = category
-
-        # Fetch filtered results
-        results = NeetCounsellingSeatAllotment.objects.filter(**filters).values(
-            "allotment_category",
-            "allotment_year",
-            "rank_no",
-            "allotted_quota",
-            "allotted_institute",
-            "state",
-            "qualifying_group_or_course",
-            "speciality",
-            "allotted_category",
-            "candidate_category",
-            "remarks"
-        )
+        # Buffered and written in batches (see api/leads.py), off the request path
+        if name and not cursor:
+            record_lead(data)  # If invalid, ignore and continue to filtering
+
+        # Fetch one page of filtered results (keyset pagination on rank_no, id), of
+        # closing-rank summaries when mode=summary, or of admission chances when mode=chance
+        mode = data.get("mode") or request.query_params.get("mode") or "allotments"
+        if not isinstance(mode, str) or mode not in TRACKER_MODES:
+            mode = "allotments"
+        fetch_page, columns = TRACKER_MODES[mode]
+        include_count = str(data.get("include_count", True)).lower() not in ("0", "false", "no")
+        columnar = request.accepted_renderer.format == COLUMNAR_FORMAT
+        try:
+            page = fetch_page(
+                data,
+                cursor=cursor,
+                page_size=data.get("page_size") or request.query_params.get("page_size"),
+                include_count=include_count,
+                columnar=columnar,
+            )
+        except ValueError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         # Return only filtered results
-        return Response({
-            "filtered_results_count": results.count(),
-            "filtered_results": list(results)
-        }, status=status.HTTP_200_OK)
+        body = {
+            "mode": mode,
+            "filtered_results_count": page["count"],
+            "filtered_results": page["rows"],
+            "next_cursor": page["next_cursor"],
+            "page_size": page["page_size"],
+        }
+        if columnar:
+            body["columns"] = columns
+        return Response(body, status=status.HTTP_200_OK)
 
 
 
@@ -112,58 +111,68 @@ class GroupCategoryListAPIView(APIView):
           {"group_name": "...", "category_type": ["a","b", ...]},
           ...
         ]
+        Served from pre-serialized bytes (see api/group_categories.py) with a
+        strong ETag and Last-Modified; conditional requests get a 304.
         """
-        # Query only the fields we need, ordered by group_name then category_type
-        qs = GroupCategory.objects.all().values("group_name", "category_type").order_by("group_name", "category_type")
+        body, etag, last_modified = group_categories_payload()
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified.timestamp())
+        response = not_modified or HttpResponse(body, content_type="application/json")
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+        response["Cache-Control"] = "no-cache"  # always revalidate; a 304 is cheap
+        return response
 
-        # Transform queryset values() into a list of dicts
-        rows = list(qs)  # each row: {'group_name': '...', 'category_type': '...'}
 
-        # Group by group_name (qs is already ordered)
-        grouped = []
-        for group_name, items in groupby(rows, key=itemgetter("group_name")):
-            types = [item["category_type"] for item in items]
-            grouped.append({"group_name": group_name, "category_type": types})
 
-        return Response(grouped, status=status.HTTP_200_OK)
-    
-    
-    
 
 @csrf_exempt
 def send_results_email(request):
+    """
+    Queue an email with the prediction results table.
+
+    POST JSON: {"email": "...", <the allotment_tracker/ filters>}
+    The table is built on the server from the prediction path, capped at
+    settings.RESULTS_EMAIL_MAX_ROWS rows. Older clients may still post a
+    "results" list instead of filters; it is capped the same way.
+    """
     if request.method == "POST":
         try:
             data = json.loads(request.body.decode("utf-8"))
             recipient = data.get("email")
-            results = data.get("results", [])
-
-            # Build HTML table
-            body = "<h3>NEET Results</h3><table border='1' cellspacing='0' cellpadding='5'>"
-            body += "<tr><th>Sr. No</th><th>Rank</th><th>College</th><th>State</th><th>Category</th></tr>"
-            for i, r in enumerate(results, 1):
-                body += f"""
-                <tr>
-                  <td>{i}</td>
-                  <td>{r.get('rank_no') or r.get('rank')}</td>
-                  <td>{r.get('allotted_institute') or r.get('name')}</td>
-                  <td>{r.get('state')}</td>
-                  <td>{r.get('candidate_category') or r.get('category')}</td>
-                </tr>
-                """
-            body += "</table>"
-
-            # Create email
-            msg = EmailMultiAlternatives(
+            if not recipient:
+                return JsonResponse({"status": "error", "message": "email is required"}, status=400)
+
+            max_rows = results_email_max_rows()
+            if "results" in data:
+                results = data.get("results") or []
+                total = len(results)
+                rows = [{
+                    "rank": r.get("rank_no") or r.get("rank"),
+                    "college": r.get("allotted_institute") or r.get("name"),
+                    "state": r.get("state"),
+                    "category": r.get("candidate_category") or r.get("category"),
+                } for r in results[:max_rows]]
+            else:
+                try:
+                    results, total = predict_rows(data, max_rows)
+                except ValueError as e:
+                    return JsonResponse({"status": "error", "message": str(e)}, status=400)
+                rows = [{
+                    "rank": r["rank_no"],
+                    "college": r["allotted_institute"],
+                    "state": r["state"],
+                    "category": r["candidate_category"],
+                } for r in results]
+
+            # Queue email; delivered by the send_queued_mail worker
+            enqueue_email(
+                to_email=recipient,
                 subject="Your NEET Seat Predictor Results",
                 body="Please view your results below.",  # fallback text
-                from_email=None,
-                to=[recipient],
+                html_body=render_results_email(rows, total),
             )
-            msg.attach_alternative(body, "text/html")
-            msg.send()
 
-            return JsonResponse({"status": "success", "message": "Email sent!"}, status=200)
+            return JsonResponse({"status": "success", "message": "Email queued for delivery."}, status=202)
         except Exception as e:
             return JsonResponse({"status": "error", "message": str(e)}, status=500)
     return JsonResponse({"status": "error", "message": "Invalid request method"}, status=405)
@@ -0,0 +1,8 @@
+"""MySQL backend with a bounded per-process connection pool (see seatpredictor.db.pool)."""
+from django.db.backends.mysql import base
+
+from seatpredictor.db.pool import BoundedPoolMixin
+
+
+class DatabaseWrapper(BoundedPoolMixin, base.DatabaseWrapper):
+    pass
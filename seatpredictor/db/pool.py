@@ -0,0 +1,80 @@
+"""
+Per-process cap on open database connections.
+
+Django keeps one connection per thread and database alias, and with
+CONN_MAX_AGE > 0 it reuses that connection across requests instead of
+connecting for each one. BoundedPoolMixin adds an upper bound on how many
+of those connections a worker process holds, so that threads * workers
+cannot exceed the server's max_connections:
+
+    DATABASES = {"default": {..., "POOL": {"SIZE": 10, "TIMEOUT": 5}}}
+
+A thread that needs a connection past SIZE waits up to TIMEOUT seconds for
+another thread to close one, then fails with OperationalError. SIZE 0
+(the default) means no cap.
+
+This is a cap, not a pool: connections are not shared between threads. A
+thread keeps its slot for as long as its connection is open, which with
+CONN_MAX_AGE > 0 includes the idle time between requests, and background
+threads that query (the lead buffer, upload job heartbeats, the
+sync_to_async executor) hold slots like request threads do. So that idle
+request threads do not starve busy ones, a capped connection is closed at
+the end of each request instead of being kept for CONN_MAX_AGE. Background
+threads still keep theirs: set SIZE above the number of such threads per
+process, or leave it at 0 and bound connections with the server thread
+count.
+"""
+import threading
+
+
+_semaphores = {}
+_semaphores_lock = threading.Lock()
+
+
+def pool_semaphore(alias, settings_dict):
+    """The process-wide semaphore for an alias, or None if its pool is unbounded."""
+    size = (settings_dict.get("POOL") or {}).get("SIZE") or 0
+    if size <= 0:
+        return None
+    with _semaphores_lock:
+        semaphore = _semaphores.get(alias)
+        if semaphore is None or semaphore.size != size:
+            semaphore = _semaphores[alias] = threading.BoundedSemaphore(size)
+            semaphore.size = size
+        return semaphore
+
+
+class BoundedPoolMixin:
+    """Mix into a backend DatabaseWrapper; see the module docstring."""
+    _pool_slot = None
+
+    def get_new_connection(self, conn_params):
+        semaphore = pool_semaphore(self.alias, self.settings_dict)
+        if semaphore is not None:
+            timeout = self.settings_dict["POOL"].get("TIMEOUT", 5)
+            if not semaphore.acquire(timeout=timeout):
+                raise self.Database.OperationalError(
+                    f"All {semaphore.size} connections of database {self.alias!r} are in use "
+                    f"(waited {timeout}s); raise POOL SIZE or lower the worker thread count."
+                )
+        try:
+            connection = super().get_new_connection(conn_params)
+        except BaseException:
+            if semaphore is not None:
+                semaphore.release()
+            raise
+        self._pool_slot = semaphore
+        return connection
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        if self._pool_slot is not None and self.connection is not None and not self.in_atomic_block:
+            self.close()
+
+    def _close(self):
+        try:
+            super()._close()
+        finally:
+            slot, self._pool_slot = self._pool_slot, None
+            if slot is not None:
+                slot.release()
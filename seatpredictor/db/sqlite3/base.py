@@ -0,0 +1,8 @@
+"""SQLite backend with the same pool cap, for running locally against a stand-in database."""
+from django.db.backends.sqlite3 import base
+
+from seatpredictor.db.pool import BoundedPoolMixin
+
+
+class DatabaseWrapper(BoundedPoolMixin, base.DatabaseWrapper):
+    pass
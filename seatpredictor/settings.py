@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -45,6 +46,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.metrics.RequestMetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -76,17 +78,37 @@ TEMPLATES = [
 WSGI_APPLICATION = "seatpredictor.wsgi.application"
 
 
+# Route allotment_tracker/ and group-categories/ to the async views (see
+# api/async_views.py). Turn on when serving with an ASGI server such as uvicorn.
+ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS", "").lower() in ("1", "true", "yes")
+
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
+#
+# Configured from the environment. Connections are kept open for
+# DB_CONN_MAX_AGE seconds and pinged before reuse (DB_CONN_HEALTH_CHECKS).
+# DB_POOL_SIZE, if set, caps the connections each worker process holds,
+# waiting up to DB_POOL_TIMEOUT seconds for a free one; capped connections
+# are closed at request end and background threads hold slots too (see
+# seatpredictor/db/pool.py). The default 0 is no cap.
+# Persistent connections are not reused across requests under ASGI, so the
+# default max age is 0 there. DB_ENGINE=seatpredictor.db.sqlite3 with a file
+# path in DB_NAME runs against a local stand-in database.
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.mysql',
-        'NAME': 'seatpredictor',
-        'USER': 'root',
-        'PASSWORD': '',
-        'HOST': '127.0.0.1',
-        'PORT': '3306',
+        'ENGINE': os.environ.get('DB_ENGINE', 'seatpredictor.db.mysql'),
+        'NAME': os.environ.get('DB_NAME', 'seatpredictor'),
+        'USER': os.environ.get('DB_USER', 'root'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', '127.0.0.1'),
+        'PORT': os.environ.get('DB_PORT', '3306'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 0 if ASYNC_VIEWS else 60)),
+        'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', 'true').lower() in ('1', 'true', 'yes'),
+        'POOL': {
+            'SIZE': int(os.environ.get('DB_POOL_SIZE', 0)),
+            'TIMEOUT': float(os.environ.get('DB_POOL_TIMEOUT', 5)),
+        },
     }
 }
 
@@ -146,10 +168,109 @@ EMAIL_HOST_USER = "naveenmv.freelance@gmail.com"
 EMAIL_HOST_PASSWORD = "qtii nszn elmq wysx"
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+# Uploaded sheets wait here for the process_upload_jobs worker (see
+# api/upload_jobs.py); with several hosts this must be shared storage.
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT", BASE_DIR / "media")
+
+# Seconds an upload waits for another one to finish loading before failing
+UPLOAD_LOCK_TIMEOUT = 600
+
+# A running upload job touches its row every HEARTBEAT seconds; one silent for
+# STALE_AFTER seconds lost its worker and is queued again, or failed after
+# MAX_ATTEMPTS claims (see api/upload_jobs.py)
+UPLOAD_JOB_HEARTBEAT = 30
+UPLOAD_JOB_STALE_AFTER = 300
+UPLOAD_JOB_MAX_ATTEMPTS = 3
+
+# Largest results table send-results-email/ will render
+RESULTS_EMAIL_MAX_ROWS = 500
+
 
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
         "rest_framework_simplejwt.authentication.JWTAuthentication",
-    )
+    ),
+    # orjson-backed JSON (see api/renderers.py); same output as JSONRenderer
+    "DEFAULT_RENDERER_CLASSES": (
+        "api.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+}
+
+
+# Read-through cache for allotment_tracker/ results (see api/prediction_cache.py).
+# Use "api.prediction_cache.DjangoCacheBackend" with OPTIONS {"alias": ...} to
+# store entries in one of CACHES instead of per-process memory.
+PREDICTION_CACHE = {
+    "BACKEND": "api.prediction_cache.LocalMemoryBackend",
+    "OPTIONS": {"max_entries": 512},
+    "RANK_BUCKET": 1000,
+    "MAX_ROWS": 5000,
+}
+
+# allotment_tracker/ page size; clients may ask for less than the maximum
+PREDICTION_PAGE_SIZE = 100
+PREDICTION_MAX_PAGE_SIZE = 500
+
+# Serve predictions from an in-memory NumPy index of the published dataset
+# (see api/engine.py) instead of querying the allotment table per request.
+PREDICTION_ENGINE_ENABLED = True
+
+# allotment_tracker/ chance mode (see api/chances.py): a seat is a "reach" for
+# ranks up to this fraction past its highest closing rank across the years.
+CHANCE_REACH_MARGIN = 0.1
+
+# Directory for memory-mapped snapshots of that index (see api/snapshots.py),
+# written after every upload and year switch. Workers on the host open the
+# snapshot instead of loading the rows, sharing one copy in the page cache.
+# Unset, each worker builds its index from the database.
+PREDICTION_SNAPSHOT_DIR = os.environ.get('PREDICTION_SNAPSHOT_DIR') or None
+PREDICTION_SNAPSHOT_KEEP = 2
+
+# allotment_tracker/ leads are buffered per worker and written with bulk_create
+# (see api/leads.py); set ENABLED to False to write each one synchronously.
+TRACKER_BUFFER = {
+    "ENABLED": True,
+    "MAX_SIZE": 100,
+    "MAX_DELAY": 2.0,
+    "BACKGROUND": True,
+    # Batches that keep failing, and records past MAX_PENDING, are appended
+    # as JSON lines to SPOOL_PATH (or logged when unset) instead of retried
+    "MAX_RETRIES": 3,
+    "MAX_PENDING": 10000,
+    "SPOOL_PATH": os.environ.get('TRACKER_SPOOL_PATH') or None,
+}
+
+# Pre-serialized group-categories/ payload (see api/group_categories.py).
+# Entries are keyed on a generation stored in the database and bumped on
+# every dropdown write, so a per-process cache is safe across workers.
+GROUP_CATEGORY_CACHE = {
+    "ALIAS": "default",
+    "TIMEOUT": 300,
+}
+
+# Per-request query counts and timings (see api/metrics.py): Server-Timing
+# headers, a JSON line per request on the "api.metrics" logger and a
+# histogram served at admin/metrics/ in Prometheus text format. The log lines
+# are INFO; set REQUEST_METRICS_LOG_LEVEL=INFO to print them.
+REQUEST_METRICS = {
+    "SERVER_TIMING": True,
+    "LOG": True,
+    "HISTOGRAM": True,
+}
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {"class": "logging.StreamHandler"},
+    },
+    "loggers": {
+        "api.metrics": {
+            "handlers": ["console"],
+            "level": os.environ.get("REQUEST_METRICS_LOG_LEVEL", "WARNING"),
+            "propagate": False,
+        },
+    },
 }
@@ -21,6 +21,8 @@ from django.urls import include, path
 # Admin-only API for updating active year
 from api.admin.year_update import set_active_allotment_year
 from api.admin.user_data import get_all_tracker_data, get_tracker_stats
+from api.admin.cache_stats import get_prediction_cache_stats
+from api.admin.metrics import get_request_metrics
 
 
 urlpatterns = [
@@ -28,6 +30,8 @@ urlpatterns = [
     path("admin/year-update/", set_active_allotment_year, name="admin_set_active_allotment_year"),
     path("admin/user-data/", get_all_tracker_data, name="admin_get_all_tracker_data"),
     path("admin/user-data/stats/", get_tracker_stats, name="admin_get_tracker_stats"),
+    path("admin/prediction-cache/stats/", get_prediction_cache_stats, name="admin_prediction_cache_stats"),
+    path("admin/metrics/", get_request_metrics, name="admin_request_metrics"),
 
     path("admin/", admin.site.urls),
     path('api/', include('api.urls')),